@@ -0,0 +1,6 @@
+"""Benchmark entry point — run with ``python main_benchmark.py [--sizes 4 8 16]``."""
+
+from src.benchmark import cli
+
+if __name__ == "__main__":
+    cli()
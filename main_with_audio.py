@@ -1,6 +1,8 @@
 """Convenience entry point — always renders with audio enabled."""
 
+from src.config import init
 from src.pipeline import run_pipeline
 
 if __name__ == "__main__":
+    init()
     run_pipeline(use_audio=True)
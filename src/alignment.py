@@ -0,0 +1,112 @@
+"""Local word alignment for narration that arrives without timings.
+
+Some providers (or cached entries from before they offered timestamps)
+return audio but no word boundaries.  :func:`align_words` estimates them
+from the audio itself: the narration is decoded with ffmpeg, short-time
+energy separates speech from pauses, and words are laid over the voiced
+time in proportion to their length, never straddling a pause.  The result
+has the same ``{word, start, duration}`` (milliseconds) shape as Azure's
+word-boundary events, so karaoke subtitles work with any provider.
+"""
+
+import bisect
+import logging
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+from src.encoder import ffmpeg_binary
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_RATE = 16_000
+_FRAME_SECONDS = 0.01       # energy window
+_SILENCE_RATIO = 0.08       # frames below this fraction of loud speech are silent
+_MIN_PAUSE_SECONDS = 0.15   # shorter silences are treated as part of speech
+
+
+def decode_pcm(path: str | Path, sample_rate: int = _SAMPLE_RATE) -> np.ndarray:
+    """Decode any audio file to mono float32 samples in ``[-1, 1]``.
+
+    Raises:
+        RuntimeError: If ffmpeg cannot decode *path*.
+    """
+    proc = subprocess.run(
+        [
+            ffmpeg_binary(), "-v", "error", "-i", str(path),
+            "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-",
+        ],
+        capture_output=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg could not decode {path}: {proc.stderr.decode(errors='replace').strip()}"
+        )
+    return np.frombuffer(proc.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def voiced_spans(samples: np.ndarray, sample_rate: int = _SAMPLE_RATE) -> list[tuple[float, float]]:
+    """Return ``(start, end)`` seconds of speech, split at pauses."""
+    hop = int(sample_rate * _FRAME_SECONDS)
+    frames = len(samples) // hop
+    if frames == 0:
+        return []
+    energy = np.sqrt(np.mean(samples[:frames * hop].reshape(frames, hop) ** 2, axis=1))
+    threshold = max(np.percentile(energy, 95) * _SILENCE_RATIO, 1e-4)
+    voiced = np.flatnonzero(energy > threshold)
+    if voiced.size == 0:
+        return []
+
+    # Split wherever consecutive voiced frames are a pause apart.
+    min_gap = int(_MIN_PAUSE_SECONDS / _FRAME_SECONDS)
+    breaks = np.flatnonzero(np.diff(voiced) > min_gap)
+    starts = np.concatenate(([voiced[0]], voiced[breaks + 1]))
+    ends = np.concatenate((voiced[breaks], [voiced[-1]])) + 1
+    return [(s * _FRAME_SECONDS, e * _FRAME_SECONDS) for s, e in zip(starts, ends)]
+
+
+def align_words(text: str, audio_path: str | Path) -> list[dict]:
+    """Estimate per-word timings for *text* spoken in *audio_path*.
+
+    Returns ``{word, start, duration}`` dicts in milliseconds, or an empty
+    list if *text* has no words.
+    """
+    words = text.split()
+    if not words:
+        return []
+    samples = decode_pcm(audio_path)
+    spans = voiced_spans(samples) or [(0.0, len(samples) / _SAMPLE_RATE)]
+
+    # Cumulative voiced time at the start of each span.
+    offsets = [0.0]
+    for start, end in spans:
+        offsets.append(offsets[-1] + end - start)
+    voiced_total = offsets[-1]
+
+    def to_time(voiced: float, is_end: bool) -> tuple[float, int]:
+        # A position on a span boundary ends the earlier span / starts the later one.
+        search = bisect.bisect_left if is_end else bisect.bisect_right
+        i = min(max(search(offsets, voiced) - 1, 0), len(spans) - 1)
+        return spans[i][0] + voiced - offsets[i], i
+
+    weights = np.array([len(word) + 1 for word in words], dtype=np.float64)
+    bounds = np.concatenate(([0.0], np.cumsum(weights))) / weights.sum() * voiced_total
+
+    timings = []
+    for i, word in enumerate(words):
+        start, first = to_time(bounds[i], is_end=False)
+        end, last = to_time(bounds[i + 1], is_end=True)
+        if first != last:
+            # Keep the word on whichever side of the pause holds most of it.
+            if spans[first][1] - start >= end - spans[last][0]:
+                end = spans[first][1]
+            else:
+                start = spans[last][0]
+        timings.append({
+            "word": word,
+            "start": float(start) * 1000,
+            "duration": max(float(end - start), 0.0) * 1000,
+        })
+    logger.debug("Aligned %d words over %d voiced spans in %s", len(words), len(spans), audio_path)
+    return timings
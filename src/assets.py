@@ -0,0 +1,197 @@
+"""Concurrent per-segment asset acquisition.
+
+Fetches every segment's image and synthesizes every narration line in
+parallel before MoviePy composition starts.  Each provider's calls are
+admitted by its limiter in :mod:`src.rate_limit` (concurrency cap, rate,
+daily quota), so a large worker pool cannot flood a single API; worker
+threads inherit the submitting thread's admission priority.  Results are
+always returned in segment order.
+
+With ``whole_script_tts`` the narration is instead synthesized in a single
+request once every segment is known (images are still fetched as segments
+arrive), and each segment references its span of the shared track.
+
+With ``offline`` (preview renders) nothing is fetched: assets come from the
+persistent caches, and segments missing from them get placeholders (see
+:mod:`src.placeholders`).
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable
+
+from src.audio_generator import cached_tts, generate_tts, narration_suffix
+from src.audio_track import synthesize_track
+from src.config import ASSET_WORKERS, WHOLE_SCRIPT_TTS
+from src.image_handler import cached_image, fetch_image, is_valid_image, prepare_image
+from src.placeholders import placeholder_image, placeholder_narration
+from src.rate_limit import current_priority, priority
+from src.workspace import DEFAULT_WORKSPACE, Workspace
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SegmentAssets:
+    """Everything the renderer needs to compose one segment."""
+
+    idx: int
+    prompt: str
+    narration: str
+    image_path: Path
+    audio_path: Path | None = None
+    word_timings: list[dict] = field(default_factory=list)
+    # Seconds of audio_path this segment covers; None means the whole file.
+    audio_span: tuple[float, float] | None = None
+
+
+# ---------------------------------------------------------------------------
+# Per-asset tasks
+# ---------------------------------------------------------------------------
+
+def _fetch_image(prompt: str, image_path: Path) -> None:
+    """Ensure a valid, render-ready image for *prompt* exists at *image_path*."""
+    if not (image_path.exists() and is_valid_image(image_path)):
+        fetch_image(prompt, image_path)
+    prepare_image(image_path)
+
+
+def _fetch_audio(narration: str, audio_path: Path) -> list[dict]:
+    """Synthesize *narration* to *audio_path* and return its word timings."""
+    return generate_tts(narration, str(audio_path)) or []
+
+
+def _offline_image(prompt: str, image_path: Path) -> None:
+    """Use the cached image for *prompt*, or a placeholder card."""
+    if not cached_image(prompt, image_path):
+        placeholder_image(prompt, image_path)
+    prepare_image(image_path)
+
+
+def _offline_audio(narration: str, audio_path: Path) -> list[dict]:
+    """Use cached narration for *narration*, or paced silence."""
+    timings = cached_tts(narration, audio_path)
+    if timings is None:
+        timings = placeholder_narration(narration, audio_path)
+    return timings
+
+
+def _fetch_track(assets: list[SegmentAssets], audio_path: Path) -> None:
+    """Voice every segment's narration in one request and assign the spans."""
+    track = synthesize_track([item.narration for item in assets], audio_path)
+    for item, span, timings in zip(assets, track.spans, track.timings):
+        item.audio_path = track.path
+        item.audio_span = span
+        item.word_timings = timings
+
+
+# ---------------------------------------------------------------------------
+# Fetcher
+# ---------------------------------------------------------------------------
+
+@dataclass
+class PendingSegment:
+    """Handle for a segment whose assets are still being fetched."""
+
+    assets: SegmentAssets
+    image: Future
+    audio: Future | None = None
+
+    def result(self) -> SegmentAssets:
+        """Block until both assets are ready, re-raising any fetch error."""
+        self.image.result()
+        if self.audio is not None:
+            self.assets.word_timings = self.audio.result()
+        return self.assets
+
+
+class AssetFetcher:
+    """Thread pool that fetches segment assets concurrently.
+
+    Use as a context manager; :meth:`submit` may be called as soon as a
+    segment is known, so callers can start fetching before the whole script
+    is available.
+    """
+
+    def __init__(
+        self,
+        use_audio: bool = True,
+        max_workers: int = ASSET_WORKERS,
+        workspace: Workspace = DEFAULT_WORKSPACE,
+        offline: bool = False,
+    ) -> None:
+        self.use_audio = use_audio
+        self.workspace = workspace
+        self._image_task = _offline_image if offline else _fetch_image
+        self._audio_task = _offline_audio if offline else _fetch_audio
+        self._priority = current_priority()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="assets"
+        )
+
+    def submit(self, idx: int, prompt: str, narration: str) -> PendingSegment:
+        """Schedule image and narration fetching for segment *idx*."""
+        assets = SegmentAssets(
+            idx=idx,
+            prompt=prompt,
+            narration=narration,
+            image_path=self.workspace.image_dir / f"step{idx}.jpg",
+        )
+        image = self._executor.submit(self._run, self._image_task, prompt, assets.image_path)
+        audio = None
+        if self.use_audio:
+            assets.audio_path = self.workspace.audio_dir / f"step{idx}{narration_suffix()}"
+            audio = self._executor.submit(self._run, self._audio_task, narration, assets.audio_path)
+        return PendingSegment(assets=assets, image=image, audio=audio)
+
+    def _run(self, task: Callable, *args):
+        with priority(self._priority):
+            return task(*args)
+
+    def close(self, cancel: bool = False) -> None:
+        """Shut down the pool, optionally cancelling queued work."""
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def __enter__(self) -> "AssetFetcher":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(cancel=exc_type is not None)
+
+
+def fetch_all_assets(
+    segments: Iterable[tuple[str, str]],
+    use_audio: bool = True,
+    max_workers: int = ASSET_WORKERS,
+    workspace: Workspace = DEFAULT_WORKSPACE,
+    whole_script_tts: bool = WHOLE_SCRIPT_TTS,
+    offline: bool = False,
+) -> list[SegmentAssets]:
+    """Fetch images and narration for all *segments* concurrently.
+
+    *segments* may be a lazy iterator (e.g. a streamed script); each
+    segment is submitted as soon as it is produced.  With
+    *whole_script_tts* the narration is one TTS request made after the last
+    segment arrives.  With *offline* only cached assets and placeholders
+    are used, always per segment.  Returns one :class:`SegmentAssets` per
+    segment, in script order.  The first failing segment (in order) raises
+    and cancels outstanding work.
+    """
+    track = use_audio and whole_script_tts and not offline
+    logger.info(
+        "Fetching assets (%d workers, audio=%s, whole-script TTS=%s, offline=%s)",
+        max_workers, use_audio, track, offline,
+    )
+    with AssetFetcher(use_audio and not track, max_workers, workspace, offline) as fetcher:
+        pending = [
+            fetcher.submit(idx, prompt, narration)
+            for idx, (prompt, narration) in enumerate(segments, 1)
+        ]
+        if track and pending:
+            track_path = workspace.audio_dir / f"narration{narration_suffix()}"
+            _fetch_track([item.assets for item in pending], track_path)
+        assets = [item.result() for item in pending]
+    logger.info("Fetched assets for %d segments", len(assets))
+    return assets
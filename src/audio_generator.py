@@ -1,26 +1,79 @@
 """Text-to-speech generation via Azure Speech or ElevenLabs.
 
 Provides a unified ``generate_tts`` entry point that dispatches to the
-provider configured by the ``TTS_PROVIDER`` environment variable.  Azure TTS
-returns per-word timing data used for dynamic subtitle rendering.
+provider configured by the ``TTS_PROVIDER`` environment variable.  Both
+providers return per-word timing data used for dynamic subtitle rendering:
+Azure through word-boundary events, ElevenLabs through its timestamps
+endpoint.  When a provider returns none, timings are estimated locally by
+:func:`src.alignment.align_words`.
+
+Providers are listed in a registry and each lives in its own module
+(:mod:`src.tts_azure`, :mod:`src.tts_elevenlabs`), imported on the first
+synthesis that misses the cache, so silent and fully cached runs never load
+a speech SDK.
+
+``generate_tts_track`` synthesizes a whole script's narration in one
+request (Azure SSML with a bookmark between lines) so prosody carries across
+segments; :mod:`src.audio_track` splits the result per segment.
+
+Synthesized audio and word timings are stored in a persistent
+content-addressed cache keyed on provider, voice, model, output format and
+narration text, so re-renders of an unchanged script make no TTS calls.
 """
 
+import importlib
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from types import ModuleType
 
-import azure.cognitiveservices.speech as speechsdk
-from elevenlabs.client import ElevenLabs
-
+from src.alignment import align_words
+from src.cache import DiskCache, make_key
 from src.config import (
-    AZURE_TTS_KEY,
-    AZURE_TTS_REGION,
-    ELEVENLABS_API_KEY,
+    AZURE_TTS_OUTPUT_FORMAT,
+    AZURE_TTS_VOICE,
+    ELEVENLABS_MODEL,
+    ELEVENLABS_OUTPUT_FORMAT,
     ELEVENLABS_VOICE_ID,
+    TTS_CACHE_MAX_MB,
     TTS_PROVIDER,
 )
+from src.instrumentation import count, stage
+from src.rate_limit import call
 
 logger = logging.getLogger(__name__)
 
+_cache = DiskCache("tts", TTS_CACHE_MAX_MB * 1024 * 1024)
+
+
+@dataclass(frozen=True)
+class TTSProvider:
+    """A registered TTS backend.
+
+    *module* is imported on first use and must define
+    ``synthesize(text, path) -> word timings`` and
+    ``synthesize_lines(texts, path) -> (word timings, line offsets)``.
+    """
+
+    module: str
+    # Everything besides the text that determines the audio (cache key).
+    identity: tuple
+    # Extension matching the container the provider writes.
+    suffix: str = ".wav"
+
+
+_providers: dict[str, TTSProvider] = {
+    "azure": TTSProvider(
+        "src.tts_azure", ("azure", AZURE_TTS_VOICE, None, AZURE_TTS_OUTPUT_FORMAT)
+    ),
+    "elevenlabs": TTSProvider(
+        "src.tts_elevenlabs",
+        ("elevenlabs", ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL, ELEVENLABS_OUTPUT_FORMAT),
+        "." + ELEVENLABS_OUTPUT_FORMAT.split("_", 1)[0],
+    ),
+}
+
 
 # ---------------------------------------------------------------------------
 # Public API
@@ -30,89 +83,127 @@ def generate_tts(text: str, path: str | Path) -> list[dict]:
     """Generate a TTS audio file for *text* at *path*.
 
     Returns a list of word-timing dicts (``{word, start, duration}`` in ms)
-    when available (Azure), or an empty list (ElevenLabs).
+    from the provider, or aligned locally when it returned none.  Cached
+    results are copied to *path* without contacting the provider.
     """
     Path(path).parent.mkdir(parents=True, exist_ok=True)
 
-    if TTS_PROVIDER == "elevenlabs":
-        return _generate_elevenlabs(text, str(path))
-    return _generate_azure(text, str(path))
+    with stage("tts", provider=TTS_PROVIDER, chars=len(text)) as attrs:
+        timings = cached_tts(text, path)
+        if timings is not None:
+            attrs["cached"] = True
+            return timings
+
+        attrs["cached"] = False
+        key = _cache_key(text)
+        count(f"api.{TTS_PROVIDER}_tts")
+        timings = call(
+            f"{TTS_PROVIDER}_tts", _provider_module(TTS_PROVIDER).synthesize, text, str(path)
+        )
+        count("bytes_downloaded", Path(path).stat().st_size)
 
+        if not timings:
+            logger.info("No word timings from %s; aligning locally", TTS_PROVIDER)
+            timings = align_words(text, path)
+            attrs["aligned"] = True
 
-# ---------------------------------------------------------------------------
-# Azure Speech
-# ---------------------------------------------------------------------------
+        _cache.put_file(key, path)
+        _cache.put_json(key, timings)
+        return timings
 
-def _generate_azure(text: str, path: str) -> list[dict]:
-    """Synthesize speech with Azure Cognitive Services.
 
-    Raises:
-        EnvironmentError: If Azure TTS credentials are missing.
-        RuntimeError: If synthesis fails.
+def cached_tts(text: str, path: str | Path) -> list[dict] | None:
+    """Copy cached narration for *text* to *path* and return its word timings.
+
+    Returns None, without contacting the provider, if *text* has not been
+    synthesized with the current voice before.
+    """
+    key = _cache_key(text)
+    timings = _cache.get_json(key)
+    if timings is None or not _cache.copy_to(key, path, record=False):
+        return None
+    if not timings and text.strip():
+        # Cached before this provider returned timings.
+        timings = align_words(text, path)
+        _cache.put_json(key, timings)
+    logger.info("TTS cache hit (%d words) → %s", len(timings), path)
+    return timings
+
+
+def generate_tts_track(texts: list[str], path: str | Path) -> tuple[list[dict], list[float]]:
+    """Synthesize all of *texts* as one narration at *path*.
+
+    Returns the word timings of the whole track and, when the provider
+    reports them (Azure bookmarks), the offsets in ms at which each text
+    after the first begins; otherwise the offsets list is empty and callers
+    split the track by word count.
     """
-    if not AZURE_TTS_KEY or not AZURE_TTS_REGION:
-        raise EnvironmentError(
-            "AZURE_TTS_KEY and AZURE_TTS_REGION must be set for Azure TTS."
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    joined = " ".join(texts)
+
+    with stage("tts", provider=TTS_PROVIDER, chars=len(joined), segments=len(texts)) as attrs:
+        key = _cache_key(texts)
+        entry = _cache.get_json(key)
+        if entry is not None and _cache.copy_to(key, path, record=False):
+            attrs["cached"] = True
+            logger.info("TTS cache hit (%d lines) → %s", len(texts), path)
+            return entry["timings"], entry["marks"]
+
+        attrs["cached"] = False
+        count(f"api.{TTS_PROVIDER}_tts")
+        timings, marks = call(
+            f"{TTS_PROVIDER}_tts", _provider_module(TTS_PROVIDER).synthesize_lines, texts, str(path)
         )
+        count("bytes_downloaded", Path(path).stat().st_size)
 
-    speech_config = speechsdk.SpeechConfig(
-        subscription=AZURE_TTS_KEY, region=AZURE_TTS_REGION
-    )
-    speech_config.speech_synthesis_voice_name = "en-US-BrianMultilingualNeural"
+        if not timings:
+            logger.info("No word timings from %s; aligning locally", TTS_PROVIDER)
+            timings = align_words(joined, path)
+            attrs["aligned"] = True
 
-    audio_config = speechsdk.audio.AudioOutputConfig(filename=path)
-    synthesizer = speechsdk.SpeechSynthesizer(
-        speech_config=speech_config, audio_config=audio_config
-    )
+        _cache.put_file(key, path)
+        _cache.put_json(key, {"timings": timings, "marks": marks})
+        return timings, marks
 
-    word_timings: list[dict] = []
 
-    def _on_word_boundary(evt):
-        word_timings.append({
-            "word": evt.text,
-            "start": evt.audio_offset / 10_000,  # ticks → milliseconds
-            "duration": (
-                evt.duration.total_seconds() * 1000 if evt.duration else 0
-            ),
-        })
+def narration_suffix() -> str:
+    """File extension for audio written by the configured TTS provider."""
+    return _provider(TTS_PROVIDER).suffix
 
-    synthesizer.synthesis_word_boundary.connect(_on_word_boundary)
 
-    result = synthesizer.speak_text_async(text).get()
-    if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
-        raise RuntimeError(f"Azure TTS failed: {result.reason}")
+def tts_cache_stats() -> dict:
+    """Return hit/miss/eviction counters for the TTS cache."""
+    return _cache.stats()
 
-    logger.info("Azure TTS complete (%d words) → %s", len(word_timings), path)
-    return word_timings
 
+def register_provider(name: str, provider: TTSProvider) -> None:
+    """Add (or replace) the TTS provider selectable as *name*."""
+    _providers[name] = provider
+    _provider_module.cache_clear()
 
-# ---------------------------------------------------------------------------
-# ElevenLabs
-# ---------------------------------------------------------------------------
 
-def _generate_elevenlabs(text: str, path: str) -> list[dict]:
-    """Synthesize speech with ElevenLabs.
+def _provider(name: str) -> TTSProvider:
+    """Return the registered provider *name*.
 
     Raises:
-        EnvironmentError: If the ElevenLabs API key is missing.
-        RuntimeError: If the API call fails.
+        ValueError: If no provider is registered under *name*.
     """
-    if not ELEVENLABS_API_KEY:
-        raise EnvironmentError("ELEVENLABS_API_KEY must be set.")
-
-    client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
     try:
-        audio_stream = client.text_to_speech.convert(
-            voice_id=ELEVENLABS_VOICE_ID,
-            output_format="mp3_44100_128",
-            text=text,
-            model_id="eleven_multilingual_v2",
-        )
-        with open(path, "wb") as f:
-            for chunk in audio_stream:
-                f.write(chunk)
-    except Exception as exc:
-        raise RuntimeError(f"ElevenLabs TTS failed: {exc}") from exc
-
-    logger.info("ElevenLabs TTS complete → %s", path)
-    return []  # ElevenLabs does not provide word-level timings
+        return _providers[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown TTS provider '{name}' (expected one of: {', '.join(_providers)})"
+        ) from None
+
+
+@lru_cache(maxsize=None)
+def _provider_module(name: str) -> ModuleType:
+    """Import provider *name*'s module (and so its SDK) on first use."""
+    provider = _provider(name)
+    with stage("import", module=provider.module):
+        return importlib.import_module(provider.module)
+
+
+def _cache_key(text: str | list[str]) -> str:
+    """Key narration (a line, or a track's lines) on what determines its audio."""
+    return make_key(*_provider(TTS_PROVIDER).identity, text)
@@ -0,0 +1,272 @@
+"""Narration tracks: whole-script synthesis, spans, and assembly for encoding.
+
+Synthesizing every narration line separately costs a round trip and a
+synthesis warm-up per segment, and resets prosody at each boundary.
+:func:`synthesize_track` instead voices the whole script in one request and
+cuts the result at the pauses between lines — Azure bookmarks mark where
+each line starts, other providers are split by word count.  Segments then
+reference a ``(start, end)`` span of the shared track rather than a file of
+their own.
+
+Before encoding, :func:`assemble_narration` turns every segment's narration
+(a file of its own or a span of a shared track) into one PCM buffer: each
+file is decoded once per render (see :func:`decode_cache`),
+loudness-normalized, placed at its segment's exact sample range and faded
+at the cuts, all as array operations.  The encoder receives that single
+buffer (or a WAV written from it) instead of opening an audio reader per
+segment.
+"""
+
+import logging
+import threading
+import wave
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from moviepy.audio.AudioClip import AudioArrayClip
+
+from src.alignment import decode_pcm
+from src.audio_generator import generate_tts_track
+from src.config import AUDIO_FADE_DURATION, NARRATION_LOUDNESS_DBFS, NARRATION_PEAK_DBFS
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_RATE = 44_100  # MoviePy's audio rate
+
+
+@dataclass
+class NarrationTrack:
+    """One synthesized narration and where each segment sits in it."""
+
+    path: Path
+    spans: list[tuple[float, float]]  # seconds; consecutive, covering the track
+    timings: list[list[dict]]         # per segment, relative to its span start
+
+
+# ---------------------------------------------------------------------------
+# Synthesis and splitting
+# ---------------------------------------------------------------------------
+
+def synthesize_track(narrations: list[str], path: str | Path) -> NarrationTrack:
+    """Voice all *narrations* in one TTS request at *path* and split it."""
+    timings, marks = generate_tts_track(narrations, path)
+    duration = len(track_samples(path)) / _SAMPLE_RATE
+    spans, per_segment = split_timings(narrations, timings, marks, duration)
+    logger.info(
+        "Narration track %.1fs split into %d segments → %s", duration, len(spans), path
+    )
+    return NarrationTrack(Path(path), spans, per_segment)
+
+
+def split_timings(
+    narrations: list[str],
+    timings: list[dict],
+    marks: list[float],
+    duration: float,
+) -> tuple[list[tuple[float, float]], list[list[dict]]]:
+    """Split a track's word *timings* (ms) into one span per narration line.
+
+    Words are grouped by the bookmark offsets in *marks* when there is one
+    per line boundary, otherwise by each line's word count.  Each cut falls
+    midway through the pause between two lines.  Returns the spans (seconds)
+    and every segment's timings rebased to its own start.
+    """
+    groups: list[list[dict]] = [[] for _ in narrations]
+    if marks and len(marks) == len(narrations) - 1:
+        line = 0
+        for word in sorted(timings, key=lambda w: w["start"]):
+            while line < len(marks) and word["start"] >= marks[line]:
+                line += 1
+            groups[line].append(word)
+    else:
+        first = 0
+        for line, text in enumerate(narrations):
+            last = len(timings) if line == len(narrations) - 1 else first + len(text.split())
+            groups[line] = timings[first:last]
+            first = last
+
+    cuts = [0.0]
+    for line in range(1, len(narrations)):
+        prev_end = max((w["start"] + w["duration"] for w in groups[line - 1]), default=None)
+        next_start = min((w["start"] for w in groups[line]), default=None)
+        if prev_end is not None and next_start is not None:
+            cut = (prev_end + next_start) / 2 / 1000
+        elif marks and len(marks) == len(narrations) - 1:
+            cut = marks[line - 1] / 1000
+        else:
+            cut = (prev_end if prev_end is not None else next_start or 0.0) / 1000
+        cuts.append(min(max(cut, cuts[-1]), duration))
+
+    spans = list(zip(cuts, [*cuts[1:], duration]))
+    rebased = [
+        [{**word, "start": word["start"] - start * 1000} for word in group]
+        for group, (start, _) in zip(groups, spans)
+    ]
+    return spans, rebased
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+_decode_lock = threading.Lock()
+_decode_scopes = 0
+_decode_cache: dict[tuple[str, int], np.ndarray] = {}
+
+
+@contextmanager
+def decode_cache() -> Iterator[None]:
+    """Reuse every narration file decoded inside the block until it exits.
+
+    Durations, subtitle planning, fingerprints and assembly all read the same
+    files; a render holds them for its whole length, however many segments
+    it has, so each is decoded once.  Outside any block nothing is kept.
+    """
+    global _decode_scopes
+    with _decode_lock:
+        _decode_scopes += 1
+    try:
+        yield
+    finally:
+        with _decode_lock:
+            _decode_scopes -= 1
+            if not _decode_scopes:
+                _decode_cache.clear()
+
+
+def _decoded(path: str, mtime_ns: int) -> np.ndarray:
+    key = (path, mtime_ns)
+    samples = _decode_cache.get(key)
+    if samples is None:
+        samples = decode_pcm(path, _SAMPLE_RATE)
+        samples.flags.writeable = False
+        with _decode_lock:
+            if _decode_scopes:
+                _decode_cache[key] = samples
+    return samples
+
+
+def track_samples(path: str | Path, span: tuple[float, float] | None = None) -> np.ndarray:
+    """Return *path*'s mono samples, or only those inside *span* (seconds)."""
+    path = Path(path)
+    samples = _decoded(str(path), path.stat().st_mtime_ns)
+    if span is None:
+        return samples
+    start, end = (round(t * _SAMPLE_RATE) for t in span)
+    return samples[start:end]
+
+
+def audio_duration(path: str | Path, span: tuple[float, float] | None = None) -> float:
+    """Return the length in seconds of *path*, or of its *span*."""
+    if span is not None:
+        return span[1] - span[0]
+    return len(track_samples(path)) / _SAMPLE_RATE
+
+
+# ---------------------------------------------------------------------------
+# Assembly
+# ---------------------------------------------------------------------------
+
+_GATE_WINDOW = 0.05   # seconds per loudness window
+_GATE_DBFS = -50.0    # quieter windows (pauses) do not count towards loudness
+
+
+def _db_to_gain(db: float) -> float:
+    return 10 ** (db / 20)
+
+
+def loudness_gain(
+    path: str | Path,
+    target_dbfs: float = NARRATION_LOUDNESS_DBFS,
+    peak_dbfs: float = NARRATION_PEAK_DBFS,
+) -> float:
+    """Gain bringing the whole file at *path* to *target_dbfs* gated RMS.
+
+    The gain is capped so the loudest sample stays under *peak_dbfs*.  It is
+    computed over the full file, so every span of a shared track gets the same
+    gain and incremental and full renders agree.
+    """
+    path = Path(path)
+    return _loudness_gain(str(path), path.stat().st_mtime_ns, target_dbfs, peak_dbfs)
+
+
+@lru_cache(maxsize=32)
+def _loudness_gain(path: str, mtime_ns: int, target_dbfs: float, peak_dbfs: float) -> float:
+    samples = _decoded(path, mtime_ns)
+    hop = int(_SAMPLE_RATE * _GATE_WINDOW)
+    windows = len(samples) // hop
+    if windows == 0:
+        return 1.0
+    energy = np.mean(samples[:windows * hop].reshape(windows, hop) ** 2, axis=1)
+    voiced = energy[energy > _db_to_gain(_GATE_DBFS) ** 2]
+    peak = float(np.max(np.abs(samples)))
+    if voiced.size == 0 or peak == 0.0:
+        return 1.0
+    gain = _db_to_gain(target_dbfs) / float(np.sqrt(np.mean(voiced)))
+    return min(gain, _db_to_gain(peak_dbfs) / peak)
+
+
+def segment_bounds(durations: list[float]) -> list[int]:
+    """Sample offsets where each segment starts, plus the end of the last.
+
+    Offsets are rounded from cumulative time so rounding never drifts the
+    audio away from the video's segment boundaries.
+    """
+    bounds, total = [0], 0.0
+    for duration in durations:
+        total += duration
+        bounds.append(round(total * _SAMPLE_RATE))
+    return bounds
+
+
+def assemble_narration(
+    sources: list[tuple[Path | None, tuple[float, float] | None]],
+    durations: list[float],
+    target_dbfs: float = NARRATION_LOUDNESS_DBFS,
+    peak_dbfs: float = NARRATION_PEAK_DBFS,
+    fade: float = AUDIO_FADE_DURATION,
+) -> np.ndarray:
+    """Build one mono float32 track from every segment's narration.
+
+    ``sources[i]`` is segment *i*'s ``(audio_path, audio_span)`` (a None path
+    is silence) and ``durations[i]`` its length in seconds.  Each file is
+    decoded once, scaled by its loudness gain, trimmed or zero-padded to its
+    segment's exact sample range, and ramped in and out over *fade* seconds.
+    """
+    bounds = segment_bounds(durations)
+    track = np.zeros(bounds[-1], dtype=np.float32)
+    ramp_len = round(fade * _SAMPLE_RATE)
+    for (path, span), start, end in zip(sources, bounds, bounds[1:]):
+        if path is None:
+            continue
+        samples = track_samples(path, span)[:end - start]
+        gain = loudness_gain(path, target_dbfs, peak_dbfs)
+        piece = track[start:start + len(samples)]
+        np.multiply(samples, gain, out=piece)
+        k = min(ramp_len, len(piece) // 2)
+        if k:
+            ramp = np.linspace(0.0, 1.0, k, endpoint=False, dtype=np.float32)
+            piece[:k] *= ramp
+            piece[len(piece) - k:] *= ramp[::-1]
+    return track
+
+
+def narration_clip(samples: np.ndarray) -> AudioArrayClip:
+    """Return a MoviePy audio clip playing the mono *samples*."""
+    # AudioArrayClip assumes two channels when mixing, so duplicate mono.
+    return AudioArrayClip(np.column_stack((samples, samples)), fps=_SAMPLE_RATE)
+
+
+def write_pcm(samples: np.ndarray, dest: str | Path) -> Path:
+    """Write the mono *samples* to *dest* as 16-bit WAV."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(str(dest), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(_SAMPLE_RATE)
+        out.writeframes(pcm.tobytes())
+    return Path(dest)
@@ -0,0 +1,783 @@
+"""Offline benchmark harness with local stand-ins for every external service.
+
+:class:`FakeServices` serves Google CSE, image downloads, Azure OpenAI chat
+completions and ElevenLabs TTS from a local threaded HTTP server, with
+synthetic JPEGs and WAV narration plus configurable latency and failure
+rates.  Azure TTS speaks a proprietary websocket protocol through the Speech
+SDK, so it is replaced in-process by a synthesizer with the same latency
+and failure behaviour.
+
+:func:`run_benchmark` runs the real :func:`src.pipeline.run_pipeline` once
+per script size and repeat, each in a fresh process with cold caches and
+its own scratch directories, and collects per-stage and end-to-end
+timings, encode frames/second and peak memory from
+:mod:`src.instrumentation`.
+
+Settings are read from the environment when ``src.config`` is first
+imported, so pipeline modules are only imported inside the worker process,
+after the fake endpoints have been configured.
+
+:func:`import_benchmark` times importing the entry-point modules in fresh
+interpreters and reports any SDK that was loaded eagerly instead of on
+first use.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_RATE = 24_000
+_SECONDS_PER_WORD = 0.32
+_SUBJECTS = ("naruto", "one piece", "attack on titan")
+_WORDS = (
+    "did you know the ninja village hid a secret scroll beneath the old "
+    "academy where young heroes trained every morning before sunrise while "
+    "their rivals watched from the rooftops"
+).split()
+
+
+@dataclass(frozen=True)
+class FakeServiceSettings:
+    """Behaviour of the local service stand-ins."""
+
+    latency: float = 0.05           # mean seconds added to every call
+    failure_rate: float = 0.0       # probability a call fails (HTTP 503 / error)
+    throttle_rate: float = 0.0      # probability a call is rate limited (429)
+    llm_tokens_per_second: float = 50.0  # script generation speed (words/s)
+    image_size: tuple[int, int] = (1280, 720)
+    seed: int = 0
+
+    def delay(self, rng: random.Random) -> float:
+        return self.latency * rng.uniform(0.5, 1.5)
+
+
+# ---------------------------------------------------------------------------
+# Synthetic payloads
+# ---------------------------------------------------------------------------
+
+def synthetic_script(segments: int, seed: int = 0) -> str:
+    """Return an alternating [prompt] / narration script with *segments* pairs."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(1, segments + 1):
+        subject = _SUBJECTS[i % len(_SUBJECTS)]
+        lines.append(f"[{subject} {' '.join(rng.sample(_WORDS, 3))} {i}]")
+        words = rng.sample(_WORDS, rng.randint(8, 14))
+        lines.append(" ".join(words).capitalize() + ".")
+    return "\n".join(lines)
+
+
+def synthetic_image(name: str, size: tuple[int, int]) -> bytes:
+    """Return a deterministic noisy gradient JPEG (realistic compressed size)."""
+    seed = int.from_bytes(hashlib.sha256(name.encode()).digest()[:4], "big")
+    rng = np.random.default_rng(seed)
+    w, h = size
+    gradient = np.linspace(0, 255, w, dtype=np.float32)[None, :, None]
+    tint = rng.uniform(0.3, 1.0, size=(1, 1, 3)).astype(np.float32)
+    noise = rng.normal(0, 24, size=(h, w, 3)).astype(np.float32)
+    pixels = np.clip(gradient * tint + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def synthetic_speech(text: str) -> tuple[bytes, list[dict]]:
+    """Return WAV bytes sized to *text* and evenly spaced word timings (ms)."""
+    words = text.split()
+    duration = len(words) * _SECONDS_PER_WORD + 0.3
+    t = np.arange(int(duration * _SAMPLE_RATE)) / _SAMPLE_RATE
+    samples = (np.sin(2 * math.pi * 220 * t) * 3000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(_SAMPLE_RATE)
+        out.writeframes(samples.tobytes())
+    timings = [
+        {
+            "word": word,
+            "start": (0.15 + i * _SECONDS_PER_WORD) * 1000,
+            "duration": _SECONDS_PER_WORD * 900,
+        }
+        for i, word in enumerate(words)
+    ]
+    return buffer.getvalue(), timings
+
+
+# ---------------------------------------------------------------------------
+# Local HTTP stand-ins
+# ---------------------------------------------------------------------------
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    """Routes CSE, image, Azure OpenAI and ElevenLabs requests."""
+
+    server: "_FakeServer"
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def log_message(self, format, *args) -> None:  # noqa: A002
+        logger.debug("fake %s - %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload: dict) -> None:
+        self._send(200, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_completion(self, model: str, script: str, stream: bool) -> None:
+        """Reply like Azure OpenAI, paced at ``llm_tokens_per_second``."""
+        tokens = re.findall(r"\S+\s*", script)
+        pause = 1 / self.server.settings.llm_tokens_per_second
+        chunk = {"id": "chatcmpl-fake", "created": int(time.time()), "model": model}
+        if not stream:
+            time.sleep(pause * len(tokens))
+            self._send_json({
+                **chunk,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": script},
+                }],
+                "usage": {
+                    "prompt_tokens": 300,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": 300 + len(tokens),
+                },
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [{**chunk, "object": "chat.completion.chunk", "choices": []}]
+        events += [
+            {**chunk, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"content": token}, "finish_reason": None}
+            ]}
+            for token in tokens
+        ]
+        events.append({**chunk, "object": "chat.completion.chunk", "choices": [
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ]})
+        for event in events:
+            time.sleep(pause)
+            self._send_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_speech_with_timestamps(self, text: str, parts: int = 3) -> None:
+        """Reply like ElevenLabs' streamed NDJSON audio + character alignment."""
+        audio, timings = synthetic_speech(text)
+        characters, starts, ends = [], [], []
+        for i, info in enumerate(timings):
+            start, duration = info["start"] / 1000, info["duration"] / 1000
+            if i:
+                characters.append(" ")
+                starts.append(ends[-1])
+                ends.append(start)
+            step = duration / len(info["word"])
+            for j, char in enumerate(info["word"]):
+                characters.append(char)
+                starts.append(start + j * step)
+                ends.append(start + (j + 1) * step)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        audio_step = -(-len(audio) // parts)
+        char_step = -(-len(characters) // parts)
+        for k in range(parts):
+            chars = slice(k * char_step, (k + 1) * char_step)
+            line = {
+                "audio_base64": base64.b64encode(
+                    audio[k * audio_step:(k + 1) * audio_step]
+                ).decode("ascii"),
+                "alignment": {
+                    "characters": characters[chars],
+                    "character_start_times_seconds": starts[chars],
+                    "character_end_times_seconds": ends[chars],
+                } if characters[chars] else None,
+            }
+            self._send_chunk(json.dumps(line).encode("utf-8") + b"\n")
+        self._send_chunk(b"")
+
+    def _simulate(self) -> bool:
+        """Apply latency; return False (after replying 503 or 429) to fail the call."""
+        rng = self.server.rng()
+        time.sleep(self.server.settings.delay(rng))
+        if rng.random() < self.server.settings.failure_rate:
+            self._send(503, b'{"error": "injected failure"}', "application/json")
+            return False
+        if rng.random() < self.server.settings.throttle_rate:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+        return True
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlparse(self.path)
+        if not self._simulate():
+            return
+        if url.path == "/customsearch/v1":
+            query = parse_qs(url.query)
+            slug = re.sub(r"\W+", "-", query.get("q", ["image"])[0]).strip("-")
+            num = int(query.get("num", ["5"])[0])
+            base = self.server.base_url
+            self._send_json({
+                "items": [{"link": f"{base}/images/{slug}-{i}.jpg"} for i in range(num)]
+            })
+        elif url.path.startswith("/images/"):
+            self._send(200, self.server.image(url.path), "image/jpeg")
+        else:
+            self._send(404, b"", "text/plain")
+
+    def do_POST(self) -> None:  # noqa: N802
+        url = urlparse(self.path)
+        body = self._body()
+        if not self._simulate():
+            return
+        match = re.fullmatch(r"/openai/deployments/([^/]+)/chat/completions", url.path)
+        if match:
+            # The deployment name carries the script size: "fake-<segments>";
+            # batch requests ask for several scripts in the user prompt.
+            segments = int(match.group(1).rsplit("-", 1)[-1])
+            seed = self.server.settings.seed + body.get("seed", 0)
+            wanted = re.search(r"Write (\d+) such scripts", body["messages"][-1]["content"])
+            if wanted:
+                script = "\n".join(
+                    f"=== SCRIPT {n} ===\n{synthetic_script(segments, seed * 1000 + n)}"
+                    for n in range(1, int(wanted.group(1)) + 1)
+                )
+            else:
+                script = synthetic_script(segments, seed)
+            self._send_completion(match.group(1), script, bool(body.get("stream")))
+        elif url.path.endswith("/stream/with-timestamps"):
+            self._send_speech_with_timestamps(body.get("text", ""))
+        elif url.path.startswith("/v1/text-to-speech/"):
+            audio, _ = synthetic_speech(body.get("text", ""))
+            self._send(200, audio, "audio/wav")
+        else:
+            self._send(404, b"", "text/plain")
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, settings: FakeServiceSettings) -> None:
+        super().__init__(("127.0.0.1", 0), _FakeHandler)
+        self.settings = settings
+        self._images: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(settings.seed)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address) -> None:
+        # Losing image probes hang up mid-body by design.
+        logger.debug("Fake services: client %s disconnected", client_address)
+
+    def rng(self) -> random.Random:
+        # Derive per-request generators from one seeded stream.
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def image(self, name: str) -> bytes:
+        with self._lock:
+            data = self._images.get(name)
+        if data is None:
+            data = synthetic_image(name, self.settings.image_size)
+            with self._lock:
+                self._images[name] = data
+        return data
+
+
+class FakeServices:
+    """Context manager running the local service stand-ins on a free port."""
+
+    def __init__(self, settings: FakeServiceSettings | None = None) -> None:
+        self.settings = settings or FakeServiceSettings()
+        self._server: _FakeServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "FakeServices is not running"
+        return self._server.base_url
+
+    def environment(self, segments: int, tts_provider: str = "azure") -> dict[str, str]:
+        """Environment that points the pipeline at these stand-ins."""
+        return {
+            "GOOGLE_API_KEY": "fake",
+            "GOOGLE_CSE_ID": "fake",
+            "GOOGLE_CSE_URL": f"{self.url}/customsearch/v1",
+            "AZURE_OPENAI_API_KEY": "fake",
+            "AZURE_OPENAI_API_VERSION": "2024-02-01",
+            "AZURE_OPENAI_ENDPOINT": self.url,
+            "AZURE_OPENAI_DEPLOYMENT": f"fake-{segments}",
+            "AZURE_TTS_KEY": "fake",
+            "AZURE_TTS_REGION": "local",
+            "ELEVENLABS_API_KEY": "fake",
+            "ELEVENLABS_BASE_URL": self.url,
+            "TTS_PROVIDER": tts_provider,
+        }
+
+    def __enter__(self) -> "FakeServices":
+        self._server = _FakeServer(self.settings)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-services", daemon=True
+        )
+        self._thread.start()
+        logger.info("Fake services listening on %s (%s)", self.url, self.settings)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark runs
+# ---------------------------------------------------------------------------
+
+# This module doubles as the stand-in Azure TTS provider: _run_case
+# registers it with audio_generator, which calls the two functions below.
+_tts_settings: FakeServiceSettings | None = None
+
+
+def synthesize(text: str, path: str) -> list[dict]:
+    """Fake Azure provider: speak one narration line."""
+    return _fake_azure_tts(_tts_settings, [text], path)[0]
+
+
+def synthesize_lines(texts: list[str], path: str) -> tuple[list[dict], list[float]]:
+    """Fake Azure provider: speak a whole script, with bookmark offsets."""
+    return _fake_azure_tts(_tts_settings, texts, path)
+
+
+def _fake_azure_tts(
+    settings: FakeServiceSettings, lines: list[str], path: str
+) -> tuple[list[dict], list[float]]:
+    """In-process stand-in for Azure synthesis (the Speech SDK has no HTTP API)."""
+    rng = random.Random(f"{settings.seed}:{' '.join(lines)}")
+    time.sleep(settings.delay(rng))
+    if rng.random() < settings.failure_rate:
+        raise RuntimeError("Azure TTS failed: injected failure")
+    if random.random() < settings.throttle_rate:  # unseeded: retries may succeed
+        from src.rate_limit import RateLimited
+
+        raise RateLimited("Azure TTS failed: TooManyRequests (injected)", retry_after=1.0)
+    audio, timings = synthetic_speech(" ".join(lines))
+    Path(path).write_bytes(audio)
+    # Each bookmark is reached just before the first word of its line.
+    marks, first = [], 0
+    for line in lines[:-1]:
+        first += len(line.split())
+        marks.append(timings[first]["start"] - 50 if first < len(timings) else 0.0)
+    return timings, marks
+
+
+def _run_case(case: dict) -> dict:
+    """Worker process: run one pipeline against the fakes and measure it."""
+    # Imported here: src.config must see the environment set up for this case.
+    from src import audio_generator, config, instrumentation
+    from src.pipeline import run_pipeline
+    from src.video_renderer import RenderOptions
+
+    global _tts_settings
+    config.init()
+    _tts_settings = FakeServiceSettings(**case["settings"])
+    audio_generator.register_provider(
+        "azure", audio_generator.TTSProvider(__name__, ("benchmark-azure", _tts_settings.seed)),
+    )
+
+    instrumentation.start_run()
+    started = time.perf_counter()
+    error = None
+    try:
+        run_pipeline(
+            use_audio=case["use_audio"],
+            stream_script=case["stream_script"],
+            whole_script_tts=case["whole_script_tts"],
+            options=RenderOptions(**case["options"]),
+        )
+    except Exception as exc:  # a failed run is a data point, not a crash
+        error = f"{type(exc).__name__}: {exc}"
+    elapsed = time.perf_counter() - started
+
+    result = instrumentation.summary()
+    encodes = instrumentation.events("encode")
+    frames = sum(event["attrs"].get("frames", 0) for event in encodes)
+    encode_wall = sum(event["wall"] for event in encodes)
+    scripts = instrumentation.events("script.generate")
+    return {
+        "segments": case["segments"],
+        "repeat": case["repeat"],
+        "error": error,
+        "wall": elapsed,
+        "frames": frames,
+        "encode_fps": frames / encode_wall if encode_wall else 0.0,
+        # Seconds from the script request until the first segment was dispatched.
+        "first_segment_s": scripts[0]["attrs"].get("first_segment_s") if scripts else None,
+        "peak_rss_mb": result["peak_rss_mb"],
+        "stages": {
+            name: {"calls": agg["calls"], "wall": agg["wall"], "cpu": agg["cpu"]}
+            for name, agg in result["stages"].items()
+        },
+        "counters": result["counters"],
+    }
+
+
+def _case_environment(
+    services: FakeServices, case: dict, workdir: Path, log_level: str
+) -> dict[str, str]:
+    root = workdir / f"{case['segments']:03d}-{case['repeat']}"
+    return {
+        **services.environment(case["segments"], case["tts_provider"]),
+        "CACHE_DIR": str(root / "cache"),  # cold caches for every run
+        "SCRIPT_PATH": str(root / "input" / "script.txt"),
+        "IMAGE_DIR": str(root / "input" / "images"),
+        "AUDIO_DIR": str(root / "audio"),
+        "OUTPUT_PATH": str(root / "output" / "final_video.mp4"),
+        "RUN_REPORT_PATH": str(root / "output" / "run_report.json"),
+        "QUOTA_LEDGER_PATH": str(root / "output" / "quota_ledger.json"),
+        "GOOGLE_CSE_DAILY_QUOTA": "0",  # the fake search has no daily quota
+        "LOG_LEVEL": log_level,
+    }
+
+
+def _aggregate(runs: list[dict]) -> dict:
+    """Median timings (and max memory) over the successful repeats of one size."""
+    ok = [run for run in runs if run["error"] is None]
+    summary = {"runs": len(runs), "failed": len(runs) - len(ok)}
+    if not ok:
+        return summary
+    stage_names = sorted({name for run in ok for name in run["stages"]})
+    summary.update(
+        wall=statistics.median(run["wall"] for run in ok),
+        encode_fps=statistics.median(run["encode_fps"] for run in ok),
+        frames=ok[0]["frames"],
+        peak_rss_mb=max(run["peak_rss_mb"] or 0 for run in ok),
+        stages={
+            name: statistics.median(
+                run["stages"].get(name, {}).get("wall", 0.0) for run in ok
+            )
+            for name in stage_names
+        },
+    )
+    return summary
+
+
+def run_benchmark(
+    sizes: list[int],
+    *,
+    repeats: int = 1,
+    settings: FakeServiceSettings | None = None,
+    tts_provider: str = "azure",
+    use_audio: bool = True,
+    stream_script: bool = True,
+    whole_script_tts: bool = False,
+    options: dict | None = None,
+    workdir: Path | None = None,
+    log_level: str = "WARNING",
+) -> dict:
+    """Benchmark :func:`run_pipeline` for every script size in *sizes*.
+
+    *options* holds :class:`~src.video_renderer.RenderOptions` fields.
+    Every run happens in a new process so peak RSS and in-memory caches are
+    per run.  Returns ``{"settings", "runs", "sizes"}`` where ``sizes`` maps
+    each script size to median timings across its repeats.
+    """
+    settings = settings or FakeServiceSettings()
+    context = multiprocessing.get_context("spawn")
+    runs: list[dict] = []
+
+    with (
+        tempfile.TemporaryDirectory(prefix="benchmark-") as tmp,
+        FakeServices(settings) as services,
+    ):
+        root = Path(workdir or tmp)
+        for segments in sizes:
+            for repeat in range(repeats):
+                case = {
+                    "segments": segments,
+                    "repeat": repeat,
+                    "settings": asdict(settings),
+                    "tts_provider": tts_provider,
+                    "use_audio": use_audio,
+                    "stream_script": stream_script,
+                    "whole_script_tts": whole_script_tts,
+                    "options": options or {},
+                }
+                env = _case_environment(services, case, root, log_level)
+                saved = {key: os.environ.get(key) for key in env}
+                os.environ.update(env)  # inherited by the spawned worker
+                try:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(_run_case, case).result()
+                finally:
+                    for key, value in saved.items():
+                        if value is None:
+                            os.environ.pop(key, None)
+                        else:
+                            os.environ[key] = value
+                runs.append(result)
+                logger.info(
+                    "%2d segments #%d: %.2fs, %.1f encode fps, %.0f MB peak%s",
+                    segments, repeat + 1, result["wall"], result["encode_fps"],
+                    result["peak_rss_mb"] or 0,
+                    f" — FAILED: {result['error']}" if result["error"] else "",
+                )
+
+    return {
+        "settings": asdict(settings),
+        "runs": runs,
+        "sizes": {
+            segments: _aggregate([run for run in runs if run["segments"] == segments])
+            for segments in sizes
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Import time
+# ---------------------------------------------------------------------------
+
+# Modules that startup should not pay for; each is imported on first use.
+DEFERRED_MODULES = (
+    "moviepy.editor",
+    "openai",
+    "elevenlabs",
+    "azure.cognitiveservices.speech",
+)
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+wall = time.perf_counter() - start
+print(json.dumps({{"wall": wall, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def import_benchmark(
+    modules: tuple[str, ...] = ("src.pipeline", "src.render_farm", "src.benchmark"),
+    repeats: int = 5,
+) -> dict:
+    """Time a cold import of each of *modules* in a fresh interpreter.
+
+    Returns ``{module: {"wall", "runs", "eager"}}`` with the median wall
+    time in seconds and the :data:`DEFERRED_MODULES` the import pulled in.
+    """
+    root = Path(__file__).resolve().parent.parent
+    results = {}
+    for module in modules:
+        probe = _IMPORT_PROBE.format(module=module, deferred=DEFERRED_MODULES)
+        runs = []
+        for _ in range(repeats):
+            output = subprocess.run(
+                [sys.executable, "-c", probe],
+                cwd=root, capture_output=True, text=True, check=True,
+            ).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+        results[module] = {
+            "wall": statistics.median(run["wall"] for run in runs),
+            "runs": len(runs),
+            "eager": runs[-1]["loaded"],
+        }
+        logger.info(
+            "import %s: %.0f ms%s", module, results[module]["wall"] * 1000,
+            f" — eagerly loads {', '.join(runs[-1]['loaded'])}" if runs[-1]["loaded"] else "",
+        )
+    return results
+
+
+def format_table(results: dict) -> str:
+    """Render the per-size medians of *results* as a plain-text table."""
+    stage_names = sorted({
+        name for summary in results["sizes"].values() for name in summary.get("stages", {})
+    })
+    header = ["segments", "runs", "failed", "wall s", "enc fps", "peak MB", *stage_names]
+    rows = [header]
+    for segments, summary in results["sizes"].items():
+        if "wall" not in summary:
+            rows.append([str(segments), str(summary["runs"]), str(summary["failed"])])
+            continue
+        rows.append([
+            str(segments), str(summary["runs"]), str(summary["failed"]),
+            f"{summary['wall']:.2f}", f"{summary['encode_fps']:.1f}",
+            f"{summary['peak_rss_mb']:.0f}",
+            *(f"{summary['stages'].get(name, 0.0):.2f}" for name in stage_names),
+        ])
+    widths = [max(len(row[i]) for row in rows if i < len(row)) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def cli() -> None:
+    """Parse command-line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline offline against local service stand-ins.",
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[4, 8, 16], metavar="N",
+        help="Script sizes (segments) to benchmark (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3,
+        help="Runs per size; medians are reported (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05,
+        help="Mean seconds of latency per service call (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.0,
+        help="Probability that a service call fails (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0,
+        help="Probability that a service call is rate limited with a 429 "
+             "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--tts", choices=("azure", "elevenlabs"), default="azure",
+        help="TTS provider to simulate (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--llm-tps", type=float, default=50.0,
+        help="Simulated script generation speed in tokens/s (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--no-audio", action="store_true", help="Benchmark silent renders.",
+    )
+    parser.add_argument(
+        "--stream-script", action=argparse.BooleanOptionalAction, default=True,
+        help="Stream the script and fetch assets as segments arrive.",
+    )
+    parser.add_argument(
+        "--whole-script-tts", action="store_true",
+        help="Synthesize each video's narration in one TTS request.",
+    )
+    parser.add_argument("--engine", choices=("moviepy", "numpy"))
+    parser.add_argument("--backend", choices=("moviepy", "ffmpeg"))
+    parser.add_argument("--encoder-preset")
+    parser.add_argument("--memory-budget", type=int, metavar="MB")
+    parser.add_argument(
+        "--profile", action="append", dest="profiles", metavar="NAME",
+        help="Output profile to encode (repeatable).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", type=Path, default=Path("output") / "benchmark.json",
+        help="Where to write the JSON results (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--keep", type=Path, metavar="DIR",
+        help="Keep each run's script, assets, video and report under DIR.",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the pipeline's INFO logs.",
+    )
+    parser.add_argument(
+        "--imports", action="store_true",
+        help="Only time cold imports of the entry-point modules (uses --repeats).",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.imports:
+        results = import_benchmark(repeats=max(1, args.repeats))
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({"imports": results}, indent=2), encoding="utf-8")
+        if any(result["eager"] for result in results.values()):
+            raise SystemExit(1)
+        return
+    options = {
+        key: value
+        for key, value in (
+            ("engine", args.engine),
+            ("backend", args.backend),
+            ("encoder_preset", args.encoder_preset),
+            ("memory_budget_mb", args.memory_budget),
+            ("profiles", tuple(args.profiles) if args.profiles else None),
+        )
+        if value is not None
+    }
+    results = run_benchmark(
+        args.sizes,
+        repeats=max(1, args.repeats),
+        settings=FakeServiceSettings(
+            latency=args.latency,
+            failure_rate=args.failure_rate,
+            throttle_rate=args.throttle_rate,
+            llm_tokens_per_second=args.llm_tps,
+            seed=args.seed,
+        ),
+        tts_provider=args.tts,
+        use_audio=not args.no_audio,
+        stream_script=args.stream_script,
+        whole_script_tts=args.whole_script_tts,
+        options=options,
+        workdir=args.keep,
+        log_level="INFO" if args.verbose else "WARNING",
+    )
+    results["options"] = options
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(format_table(results))
+    logger.info("Benchmark results written to %s", args.output)
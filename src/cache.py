@@ -0,0 +1,218 @@
+"""Persistent, size-bounded on-disk cache.
+
+Entries live under ``CACHE_DIR/<name>/`` and are addressed by a SHA-256 key
+derived from whatever inputs determine their content.  Each key may hold a
+binary blob (``.bin``), a JSON document (``.json``), or both.  When the
+cache grows beyond its byte budget the least recently used files are
+evicted; reads refresh an entry's modification time so hot entries survive.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from src.config import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+_BLOB_SUFFIX = ".bin"
+_JSON_SUFFIX = ".json"
+
+
+def make_key(*parts: Any) -> str:
+    """Return a stable SHA-256 hex key for the JSON-serialisable *parts*."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def content_key(data: bytes) -> str:
+    """Return the SHA-256 hex digest of *data* (content addressing)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DiskCache:
+    """LRU-evicting blob + JSON store with hit/miss counters.
+
+    A *max_bytes* of zero disables the cache: every lookup misses and every
+    write is dropped.
+    """
+
+    def __init__(self, name: str, max_bytes: int, root: Path | None = None) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self.root = Path(root or CACHE_DIR) / name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size: int | None = None  # computed lazily on first write
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # -- paths ---------------------------------------------------------------
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    # -- reads ---------------------------------------------------------------
+
+    def _lookup(self, key: str, suffix: str) -> Path | None:
+        path = self._path(key, suffix)
+        if not self.enabled or not path.exists():
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return None
+        return path
+
+    def _record(self, hit: bool, record: bool = True) -> None:
+        if not record:
+            return
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_path(self, key: str, record: bool = True) -> Path | None:
+        """Return the on-disk path of the blob stored under *key*, if any.
+
+        Pass ``record=False`` for follow-up reads of an entry whose hit was
+        already counted (e.g. the blob half of a blob + JSON entry).
+        """
+        path = self._lookup(key, _BLOB_SUFFIX)
+        self._record(path is not None, record)
+        return path
+
+    def get_bytes(self, key: str, record: bool = True) -> bytes | None:
+        """Return the blob stored under *key*, or None on a miss."""
+        path = self._lookup(key, _BLOB_SUFFIX)
+        data = None
+        if path is not None:
+            try:
+                data = path.read_bytes()
+            except OSError as exc:
+                logger.debug("Cache read failed for %s: %s", path, exc)
+        self._record(data is not None, record)
+        return data
+
+    def get_json(
+        self, key: str, max_age: float | None = None, record: bool = True
+    ) -> Any | None:
+        """Return the JSON document under *key*, or None on a miss.
+
+        When *max_age* (seconds) is given, entries written longer ago than
+        that are treated as misses.
+        """
+        path = self._path(key, _JSON_SUFFIX)
+        value = None
+        if self.enabled and path.exists():
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                if max_age is None or time.time() - entry["written"] <= max_age:
+                    value = entry["value"]
+                    os.utime(path)
+            except (OSError, ValueError, KeyError) as exc:
+                logger.debug("Cache read failed for %s: %s", path, exc)
+        self._record(value is not None, record)
+        return value
+
+    # -- writes --------------------------------------------------------------
+
+    def _write(self, key: str, suffix: str, data: bytes) -> Path:
+        path = self._path(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self._grow(len(data))
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> Path | None:
+        """Store *data* under *key* and return its cache path."""
+        if not self.enabled:
+            return None
+        return self._write(key, _BLOB_SUFFIX, data)
+
+    def put_file(self, key: str, source: str | Path) -> Path | None:
+        """Copy the file at *source* into the cache under *key*."""
+        if not self.enabled:
+            return None
+        return self._write(key, _BLOB_SUFFIX, Path(source).read_bytes())
+
+    def put_json(self, key: str, value: Any) -> None:
+        """Store the JSON-serialisable *value* under *key*."""
+        if not self.enabled:
+            return
+        record = {"written": time.time(), "value": value}
+        self._write(key, _JSON_SUFFIX, json.dumps(record).encode("utf-8"))
+
+    def copy_to(self, key: str, dest: str | Path, record: bool = True) -> bool:
+        """Copy the blob under *key* to *dest*; return False on a miss."""
+        path = self.get_path(key, record)
+        if path is None:
+            return False
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, dest)
+        return True
+
+    # -- eviction ------------------------------------------------------------
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        if not self.root.exists():
+            return entries
+        for path in self.root.glob("*/*"):
+            if path.suffix not in (_BLOB_SUFFIX, _JSON_SUFFIX):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _grow(self, nbytes: int) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += nbytes
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used files until under budget (lock held)."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._size = total
+        logger.debug("Cache '%s' evicted down to %d bytes", self.name, total)
+
+    # -- reporting -----------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters for this cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
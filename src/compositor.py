@@ -0,0 +1,180 @@
+"""Single-pass NumPy frame compositor.
+
+An alternative to nesting ``CompositeVideoClip`` layers: each segment's
+letterboxed background is rendered once into a NumPy array, fades are a
+scalar multiply of that array, and only the subtitle sprite active at the
+current timestamp — found by binary search in the segment's
+:class:`~src.subtitles.CaptionTimeline` — is alpha-blended on top.  Frames
+are produced on demand by a ``VideoClip`` per segment so they stream
+straight to the encoder.
+
+A plan may be drawn at a fraction of the canvas (``scale``): the background
+is letterboxed and the subtitles rasterized at that size directly, so
+preview renders do proportionally less work per frame.
+"""
+
+import logging
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from moviepy.video.VideoClip import VideoClip
+from PIL import Image
+
+from src.assets import SegmentAssets
+from src.audio_track import audio_duration
+from src.config import (
+    DEFAULT_CLIP_DURATION,
+    FADE_DURATION,
+    SUBTITLE_BOTTOM_MARGIN,
+    SUBTITLE_CAPTION_WIDTH,
+    VIDEO_HEIGHT,
+    VIDEO_WIDTH,
+)
+from src.image_handler import letterbox
+from src.instrumentation import stage
+from src.subtitles import DEFAULT_STYLE, CaptionTimeline, render_sprite
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SegmentPlan:
+    """Pre-computed inputs needed to draw every frame of one segment."""
+
+    idx: int
+    background: np.ndarray
+    duration: float
+    captions: CaptionTimeline = field(default_factory=CaptionTimeline)
+    scale: float = 1.0  # fraction of the canvas the frames are drawn at
+
+
+def scaled_canvas(scale: float = 1.0) -> tuple[int, int]:
+    """Frame size when compositing at *scale*, rounded to even for yuv420p."""
+    if scale == 1.0:
+        return VIDEO_WIDTH, VIDEO_HEIGHT
+    return (
+        max(2, round(VIDEO_WIDTH * scale / 2) * 2),
+        max(2, round(VIDEO_HEIGHT * scale / 2) * 2),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+def _letterbox(image_path: Path, scale: float = 1.0) -> np.ndarray:
+    """Load the image as a canvas-sized array (prepared images load as-is)."""
+    with Image.open(image_path) as src:
+        canvas = letterbox(src, scaled_canvas(scale))
+    background = np.asarray(canvas)
+    background.flags.writeable = False
+    return background
+
+
+def plan_segment(assets: SegmentAssets, scale: float = 1.0) -> SegmentPlan:
+    """Build the render plan for one segment from its fetched assets.
+
+    Frames are drawn at *scale* times the canvas size.
+    """
+    duration = DEFAULT_CLIP_DURATION
+    if assets.audio_path is not None:
+        duration = audio_duration(assets.audio_path, assets.audio_span)
+
+    with stage("subtitles", segment=assets.idx):
+        if assets.word_timings:
+            captions = CaptionTimeline.from_word_timings(assets.word_timings)
+        else:
+            captions = CaptionTimeline(
+                [(0.0, duration, assets.narration)], SUBTITLE_CAPTION_WIDTH
+            )
+        # Rasterize up front so the encode loop only blends cached sprites.
+        for text in captions.texts:
+            _caption_layers(text, captions.max_width, scale)
+
+    logger.info(
+        "Segment %d planned (%.1fs) — prompt='%s'",
+        assets.idx, duration, assets.prompt[:50],
+    )
+    return SegmentPlan(
+        idx=assets.idx,
+        background=_letterbox(assets.image_path, scale),
+        duration=duration,
+        captions=captions,
+        scale=scale,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Frame drawing
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1024)
+def _caption_layers(
+    text: str, max_width: int | None, scale: float = 1.0
+) -> tuple[np.ndarray, np.ndarray, int, int]:
+    """Return premultiplied RGB, inverse alpha and the top-left position."""
+    style = DEFAULT_STYLE
+    if scale != 1.0:
+        style = replace(
+            style,
+            font_size=max(1, round(style.font_size * scale)),
+            stroke_width=round(style.stroke_width * scale),
+        )
+        max_width = max_width and max(1, round(max_width * scale))
+    sprite = render_sprite(text, style, max_width)
+    alpha = sprite[:, :, 3:4].astype(np.float32) / 255.0
+    premultiplied = sprite[:, :, :3].astype(np.float32) * alpha
+    h, w = sprite.shape[:2]
+    width, height = scaled_canvas(scale)
+    x = (width - w) // 2
+    y = height - round(SUBTITLE_BOTTOM_MARGIN * scale) - h
+    return premultiplied, 1.0 - alpha, x, y
+
+
+def _blend(
+    frame: np.ndarray, text: str, max_width: int | None, scale: float = 1.0
+) -> None:
+    """Alpha-blend the caption *text* onto *frame* in place, clipped to the canvas."""
+    premultiplied, inverse_alpha, x, y = _caption_layers(text, max_width, scale)
+    h, w = inverse_alpha.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    sy, sx = slice(y0 - y, y1 - y), slice(x0 - x, x1 - x)
+    region = frame[y0:y1, x0:x1]
+    region[:] = premultiplied[sy, sx] + region * inverse_alpha[sy, sx]
+
+
+def _fade_factor(t: float, duration: float) -> float:
+    """Combined fade-in/fade-out brightness multiplier at local time *t*."""
+    if FADE_DURATION <= 0:
+        return 1.0
+    return max(0.0, min(1.0, t / FADE_DURATION, (duration - t) / FADE_DURATION))
+
+
+def render_frame(plan: SegmentPlan, t: float) -> np.ndarray:
+    """Draw the frame of *plan* at segment-local time *t*."""
+    factor = _fade_factor(t, plan.duration)
+    active = plan.captions.active(t)
+
+    if factor >= 1.0 and not active:
+        return plan.background  # the common case: no per-frame work at all
+    if factor >= 1.0:
+        frame = plan.background.copy()
+    else:
+        frame = (plan.background * np.float32(factor)).astype(np.uint8)
+    for text in active:
+        _blend(frame, text, plan.captions.max_width, plan.scale)
+    return frame
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def segment_clip(plan: SegmentPlan) -> VideoClip:
+    """Return a silent ``VideoClip`` drawing *plan*'s frames on demand."""
+    return VideoClip(lambda t: render_frame(plan, t), duration=plan.duration)
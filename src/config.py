@@ -3,6 +3,10 @@
 All credentials and file paths used by the pipeline are defined here.
 Modules should import values from this module rather than calling
 ``os.getenv`` directly so that validation happens in one place.
+
+Importing this module only reads the environment (and ``.env``); entry
+points call :func:`init` to configure logging and create the default
+directories.
 """
 
 import logging
@@ -17,12 +21,8 @@ load_dotenv()
 # Logging
 # ---------------------------------------------------------------------------
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 logger = logging.getLogger(__name__)
 
@@ -31,18 +31,24 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 GOOGLE_API_KEY: str | None = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID: str | None = os.getenv("GOOGLE_CSE_ID")
+GOOGLE_CSE_URL: str = os.getenv("GOOGLE_CSE_URL", "https://www.googleapis.com/customsearch/v1")
 
 # ---------------------------------------------------------------------------
 # Azure TTS
 # ---------------------------------------------------------------------------
 AZURE_TTS_KEY: str | None = os.getenv("AZURE_TTS_KEY")
 AZURE_TTS_REGION: str | None = os.getenv("AZURE_TTS_REGION")
+AZURE_TTS_VOICE: str = "en-US-BrianMultilingualNeural"
+AZURE_TTS_OUTPUT_FORMAT: str = "Riff24Khz16BitMonoPcm"  # what ends up on disk
 
 # ---------------------------------------------------------------------------
 # ElevenLabs TTS (optional)
 # ---------------------------------------------------------------------------
 ELEVENLABS_API_KEY: str | None = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID: str = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
+ELEVENLABS_BASE_URL: str = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+ELEVENLABS_MODEL: str = "eleven_multilingual_v2"
+ELEVENLABS_OUTPUT_FORMAT: str = "mp3_44100_128"
 
 # ---------------------------------------------------------------------------
 # Azure OpenAI (script generation)
@@ -51,20 +57,123 @@ AZURE_OPENAI_API_KEY: str | None = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_API_VERSION: str | None = os.getenv("AZURE_OPENAI_API_VERSION")
 AZURE_OPENAI_ENDPOINT: str | None = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_DEPLOYMENT: str | None = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+# Stream the completion and start fetching each segment's assets as it arrives.
+SCRIPT_STREAMING: bool = os.getenv("SCRIPT_STREAMING", "true").lower() in ("1", "true", "yes")
+# Batch mode asks for this many scripts per chat completion and runs up to
+# LLM_CONCURRENCY completions at once within the deployment's token quota
+# (tokens per minute; 0 = unlimited).
+SCRIPTS_PER_COMPLETION: int = int(os.getenv("SCRIPTS_PER_COMPLETION", "5"))
+LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Seeded generation is reproducible, so its responses are cached on disk and
+# reruns make no requests; unseeded runs always ask for fresh scripts.
+SCRIPT_SEED: int | None = int(os.environ["SCRIPT_SEED"]) if os.getenv("SCRIPT_SEED") else None
 
 # ---------------------------------------------------------------------------
 # TTS provider selection
 # ---------------------------------------------------------------------------
 TTS_PROVIDER: str = os.getenv("TTS_PROVIDER", "azure").lower()
+# Synthesize the whole narration in one request and split it per segment.
+WHOLE_SCRIPT_TTS: bool = os.getenv("WHOLE_SCRIPT_TTS", "").lower() in ("1", "true", "yes")
+
+# ---------------------------------------------------------------------------
+# Asset fetching concurrency
+# ---------------------------------------------------------------------------
+ASSET_WORKERS: int = int(os.getenv("ASSET_WORKERS", "8"))
+IMAGE_CONCURRENCY: int = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+TTS_CONCURRENCY: int = int(os.getenv("TTS_CONCURRENCY", "4"))
+
+# ---------------------------------------------------------------------------
+# Shared HTTP session (connection pooling + retries)
+# ---------------------------------------------------------------------------
+HTTP_POOL_HOSTS: int = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+HTTP_POOL_PER_HOST: int = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+HTTP_MAX_RETRIES: int = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR: float = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_RETRY_BUDGET: int = int(os.getenv("HTTP_RETRY_BUDGET", "100"))  # -1 = unlimited
+
+# ---------------------------------------------------------------------------
+# Provider rate limits and quotas
+# ---------------------------------------------------------------------------
+# Every API call goes through src.rate_limit: ``per_minute`` is requests per
+# minute (tokens for azure_openai), ``concurrency`` caps calls in flight and
+# ``per_day`` is a daily request budget kept in the quota ledger (0 = none
+# for all three).  Google CSE's free tier allows 100 queries a day; the daily
+# budget is off unless GOOGLE_CSE_DAILY_QUOTA is set.
+GOOGLE_CSE_DAILY_QUOTA: int = int(os.getenv("GOOGLE_CSE_DAILY_QUOTA", "0"))
+GOOGLE_CSE_PER_MINUTE: int = int(os.getenv("GOOGLE_CSE_PER_MINUTE", "100"))
+PROVIDER_LIMITS: dict[str, dict] = {
+    "google_cse": {
+        "per_minute": GOOGLE_CSE_PER_MINUTE,
+        "concurrency": IMAGE_CONCURRENCY,
+        "per_day": GOOGLE_CSE_DAILY_QUOTA,
+    },
+    "azure_tts": {"concurrency": TTS_CONCURRENCY},
+    "elevenlabs_tts": {"concurrency": TTS_CONCURRENCY},
+    "azure_openai": {"per_minute": LLM_TOKENS_PER_MINUTE, "concurrency": LLM_CONCURRENCY},
+}
+# Share of each daily budget held back for jobs already in progress: once
+# only this much is left, new jobs wait for the quota to reset.
+QUOTA_RESERVE: float = float(os.getenv("QUOTA_RESERVE", "0.1"))
+# Daily quotas reset at midnight in this UTC offset (Google: Pacific time).
+QUOTA_RESET_UTC_OFFSET: float = float(os.getenv("QUOTA_RESET_UTC_OFFSET", "-8"))
+# Times a rate-limited (429) call is retried after the provider's Retry-After.
+RATE_LIMIT_RETRIES: int = int(os.getenv("RATE_LIMIT_RETRIES", "5"))
 
 # ---------------------------------------------------------------------------
 # Video rendering constants
 # ---------------------------------------------------------------------------
-VIDEO_WIDTH: int = 1080
-VIDEO_HEIGHT: int = 1080
-VIDEO_FPS: int = 24
+# The canvas every frame is composited on; output profiles scale from it.
+VIDEO_WIDTH: int = int(os.getenv("VIDEO_WIDTH", "1080"))
+VIDEO_HEIGHT: int = int(os.getenv("VIDEO_HEIGHT", "1080"))
+VIDEO_FPS: int = int(os.getenv("VIDEO_FPS", "24"))
 DEFAULT_CLIP_DURATION: float = 3.5  # seconds, used when audio is disabled
 FADE_DURATION: float = 0.5
+# Narration is assembled into one track before encoding: each source file is
+# normalized to this gated RMS loudness (never past the peak ceiling), and
+# every segment's audio ramps in and out over AUDIO_FADE_DURATION so cuts
+# between segments do not click.
+NARRATION_LOUDNESS_DBFS: float = float(os.getenv("NARRATION_LOUDNESS_DBFS", "-18"))
+NARRATION_PEAK_DBFS: float = float(os.getenv("NARRATION_PEAK_DBFS", "-1"))
+AUDIO_FADE_DURATION: float = 0.02
+RENDER_ENGINE: str = os.getenv("RENDER_ENGINE", "moviepy").lower()  # or "numpy"
+# Memory allowed for segment clips alive at once; segments are built as the
+# encoder reaches them and closed once evicted.
+RENDER_MEMORY_BUDGET_MB: int = int(os.getenv("RENDER_MEMORY_BUDGET_MB", "64"))
+# ``--preview`` composites at this fraction of the canvas, encodes the
+# "preview" profile with the "preview" preset, and never calls an API:
+# uncached images and narration are replaced by placeholders.
+PREVIEW_SCALE: float = float(os.getenv("PREVIEW_SCALE", "0.5"))
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+ENCODER_BACKEND: str = os.getenv("ENCODER_BACKEND", "moviepy").lower()  # or "ffmpeg"
+ENCODER_PRESET: str = os.getenv("ENCODER_PRESET", "default").lower()
+# Named x264 settings selectable per job (``--encoder-preset``).
+ENCODER_PRESETS: dict[str, dict] = {
+    "preview": {"preset": "ultrafast", "crf": 30},
+    "default": {"preset": "medium", "crf": 23},
+    "publish": {"preset": "slow", "crf": 18},
+}
+# Named output variants selectable with ``--profile`` (repeatable; several
+# profiles are encoded from one composite pass).  Omitted width/height/fps
+# mean the canvas values; ``fit`` is how a different aspect ratio is filled
+# (letterbox, crop or stretch); ``bitrate`` replaces CRF rate control;
+# ``preset``/``crf`` override the encoder preset for this output only.
+OUTPUT_PROFILE: str = os.getenv("OUTPUT_PROFILE", "square").lower()
+OUTPUT_PROFILES: dict[str, dict] = {
+    "square": {},
+    "shorts": {"width": 1080, "height": 1920, "fit": "letterbox"},
+    "shorts-hevc": {"width": 1080, "height": 1920, "fit": "letterbox", "codec": "libx265"},
+    "preview": {"width": 540, "height": 540, "fps": 12, "bitrate": "600k"},
+}
+# Optional overrides applied on top of the selected preset.
+ENCODER_CRF: str | None = os.getenv("ENCODER_CRF")
+ENCODER_TUNE: str = os.getenv("ENCODER_TUNE", "stillimage")
+ENCODER_THREADS: int = int(os.getenv("ENCODER_THREADS", "0"))  # 0 = ffmpeg decides
+# Encode each segment separately, reuse unchanged ones, and stream-copy join.
+INCREMENTAL_RENDER: bool = os.getenv("INCREMENTAL_RENDER", "").lower() in ("1", "true", "yes")
 
 # ---------------------------------------------------------------------------
 # Subtitle styling
@@ -75,7 +184,7 @@ SUBTITLE_STROKE_COLOR: str = "black"
 SUBTITLE_STROKE_WIDTH: int = 3
 SUBTITLE_CAPTION_WIDTH: int = 900
 SUBTITLE_BOTTOM_MARGIN: int = 60
-IMAGEMAGICK_BINARY: str | None = os.getenv("IMAGEMAGICK_BINARY")
+SUBTITLE_SPRITE_CACHE_SIZE: int = int(os.getenv("SUBTITLE_SPRITE_CACHE_SIZE", "2048"))
 SUBTITLE_FONT_PATH: str = os.getenv(
     "SUBTITLE_FONT_PATH",
     "C:\\Windows\\Fonts\\arialbd.ttf" if os.name == "nt"
@@ -86,13 +195,51 @@ SUBTITLE_FONT_PATH: str = os.getenv(
 # File paths
 # ---------------------------------------------------------------------------
 PROJECT_ROOT: Path = Path(__file__).resolve().parent.parent
-SCRIPT_PATH: Path = PROJECT_ROOT / "input" / "script.txt"
-IMAGE_DIR: Path = PROJECT_ROOT / "input" / "images"
-AUDIO_DIR: Path = PROJECT_ROOT / "audio"
-OUTPUT_PATH: Path = PROJECT_ROOT / "output" / "final_video.mp4"
+SCRIPT_PATH: Path = Path(os.getenv("SCRIPT_PATH", PROJECT_ROOT / "input" / "script.txt"))
+IMAGE_DIR: Path = Path(os.getenv("IMAGE_DIR", PROJECT_ROOT / "input" / "images"))
+AUDIO_DIR: Path = Path(os.getenv("AUDIO_DIR", PROJECT_ROOT / "audio"))
+OUTPUT_PATH: Path = Path(os.getenv("OUTPUT_PATH", PROJECT_ROOT / "output" / "final_video.mp4"))
+PREVIEW_PATH: Path = Path(os.getenv("PREVIEW_PATH", PROJECT_ROOT / "output" / "preview.mp4"))
+RUN_REPORT_PATH: Path = Path(
+    os.getenv("RUN_REPORT_PATH", PROJECT_ROOT / "output" / "run_report.json")
+)
+CACHE_DIR: Path = Path(os.getenv("CACHE_DIR", PROJECT_ROOT / ".cache"))
+WORKSPACE_DIR: Path = Path(os.getenv("WORKSPACE_DIR", PROJECT_ROOT / "workspace"))
+QUEUE_DIR: Path = Path(os.getenv("QUEUE_DIR", PROJECT_ROOT / "queue"))
+QUOTA_LEDGER_PATH: Path = Path(
+    os.getenv("QUOTA_LEDGER_PATH", PROJECT_ROOT / "output" / "quota_ledger.json")
+)
+
+# ---------------------------------------------------------------------------
+# Render farm
+# ---------------------------------------------------------------------------
+FARM_RENDER_WORKERS: int = int(os.getenv("FARM_RENDER_WORKERS", str(os.cpu_count() or 1)))
+FARM_NETWORK_WORKERS: int = int(os.getenv("FARM_NETWORK_WORKERS", "4"))
+FARM_MAX_ATTEMPTS: int = int(os.getenv("FARM_MAX_ATTEMPTS", "3"))
+
+# ---------------------------------------------------------------------------
+# Persistent caches (sizes in megabytes; 0 disables)
+# ---------------------------------------------------------------------------
+TTS_CACHE_MAX_MB: int = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+IMAGE_CACHE_MAX_MB: int = int(os.getenv("IMAGE_CACHE_MAX_MB", "1024"))
+SEGMENT_CACHE_MAX_MB: int = int(os.getenv("SEGMENT_CACHE_MAX_MB", "2048"))
+LLM_CACHE_MAX_MB: int = int(os.getenv("LLM_CACHE_MAX_MB", "64"))
+IMAGE_SEARCH_CACHE_TTL: float = float(
+    os.getenv("IMAGE_SEARCH_CACHE_TTL", str(7 * 24 * 3600))  # seconds
+)
+
+
+# ---------------------------------------------------------------------------
+# Initialization
+# ---------------------------------------------------------------------------
 
-# Ensure directories exist on import
-for _dir in (IMAGE_DIR, AUDIO_DIR, SCRIPT_PATH.parent, OUTPUT_PATH.parent):
-    _dir.mkdir(parents=True, exist_ok=True)
+def init() -> None:
+    """Configure logging and create the default directories.
 
-logger.debug("Configuration loaded — TTS provider: %s", TTS_PROVIDER)
+    Safe to call more than once; logging is left alone if the process has
+    already configured it.
+    """
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+    for directory in (IMAGE_DIR, AUDIO_DIR, SCRIPT_PATH.parent, OUTPUT_PATH.parent):
+        directory.mkdir(parents=True, exist_ok=True)
+    logger.debug("Configuration loaded — TTS provider: %s", TTS_PROVIDER)
@@ -0,0 +1,378 @@
+"""Video encoding backends, encoder settings and output profiles.
+
+``write_video`` either hands the clip to MoviePy's ``write_videofile`` or
+streams raw RGB frames straight into a single ffmpeg subprocess, which also
+muxes the assembled narration track (see :mod:`src.audio_track`).  Both
+backends honour the same named presets (``preview``/``default``/``publish``)
+and report the achieved encode speed.
+``concat_stream_copy`` joins separately encoded segments without
+re-encoding them.
+
+An :class:`OutputProfile` (``OUTPUT_PROFILES`` in config) describes one
+encoded variant — resolution, frame rate, codec, bitrate and how a
+different aspect ratio is filled.  The ffmpeg backend encodes several
+profiles from one stream of composited frames: ffmpeg splits the input and
+scales each copy for its own encoder, so extra variants cost encoding time
+only, never another composite pass.
+"""
+
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+
+from src.config import (
+    ENCODER_CRF,
+    ENCODER_PRESET,
+    ENCODER_PRESETS,
+    ENCODER_THREADS,
+    ENCODER_TUNE,
+    OUTPUT_PROFILES,
+    VIDEO_FPS,
+    VIDEO_HEIGHT,
+    VIDEO_WIDTH,
+)
+from src.instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+_AUDIO_CODEC = "aac"
+_AUDIO_BITRATE = "192k"
+_CODECS = ("libx264", "libx265")
+_FITS = ("letterbox", "crop", "stretch")
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    """Video encoder parameters for one encode."""
+
+    preset: str = "medium"
+    crf: int = 23
+    tune: str | None = None
+    threads: int = 0  # 0 lets ffmpeg pick
+    codec: str = "libx264"
+    bitrate: str | None = None  # average bitrate instead of CRF, e.g. "600k"
+
+    def video_args(self) -> list[str]:
+        """Return the ffmpeg arguments selecting these settings."""
+        args = ["-c:v", self.codec, "-preset", self.preset]
+        args += ["-b:v", self.bitrate] if self.bitrate else ["-crf", str(self.crf)]
+        if self.tune and self.codec == "libx264":  # x264 tunes only
+            args += ["-tune", self.tune]
+        if self.codec == "libx265":
+            args += ["-tag:v", "hvc1"]  # playable by Apple devices
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        return args
+
+
+@dataclass(frozen=True)
+class OutputProfile:
+    """One encoded variant of the composited video."""
+
+    name: str
+    width: int = VIDEO_WIDTH
+    height: int = VIDEO_HEIGHT
+    fps: int = VIDEO_FPS
+    codec: str = "libx264"
+    bitrate: str | None = None
+    fit: str = "letterbox"  # letterbox, crop or stretch
+    preset: str | None = None  # overrides the encoder preset's x264 preset
+    crf: int | None = None
+
+    def settings(self, base: EncoderSettings) -> EncoderSettings:
+        """Return *base* with this profile's codec and rate control applied."""
+        return replace(
+            base,
+            codec=self.codec,
+            bitrate=self.bitrate,
+            preset=self.preset or base.preset,
+            crf=base.crf if self.crf is None else self.crf,
+        )
+
+    def filter_chain(self, source_size: tuple[int, int], source_fps: int) -> str:
+        """ffmpeg filters turning canvas frames into this profile ("" if none)."""
+        filters = []
+        if self.fps != source_fps:
+            filters.append(f"fps={self.fps}")
+        if (self.width, self.height) != tuple(source_size):
+            size = f"{self.width}:{self.height}"
+            if self.fit == "crop":
+                filters += [f"scale={size}:force_original_aspect_ratio=increase:flags=lanczos",
+                            f"crop={size}"]
+            elif self.fit == "stretch":
+                filters.append(f"scale={size}:flags=lanczos")
+            else:
+                filters += [f"scale={size}:force_original_aspect_ratio=decrease:flags=lanczos",
+                            f"pad={size}:(ow-iw)/2:(oh-ih)/2"]
+            filters.append("setsar=1")
+        return ",".join(filters)
+
+
+def output_profile(name: str) -> OutputProfile:
+    """Return the named profile from ``OUTPUT_PROFILES``.
+
+    Raises:
+        ValueError: If *name* is unknown or its codec/fit is unsupported.
+    """
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(
+            f"Unknown output profile '{name}' "
+            f"(expected one of: {', '.join(OUTPUT_PROFILES)})"
+        )
+    profile = OutputProfile(name=name, **OUTPUT_PROFILES[name])
+    if profile.codec not in _CODECS:
+        raise ValueError(f"Profile '{name}': unsupported codec '{profile.codec}'")
+    if profile.fit not in _FITS:
+        raise ValueError(f"Profile '{name}': fit must be one of {', '.join(_FITS)}")
+    return profile
+
+
+def profile_outputs(
+    output_path: str | Path, names: list[str] | tuple[str, ...]
+) -> list[tuple[Path, OutputProfile]]:
+    """Pair each profile in *names* with its output file.
+
+    The first profile writes to *output_path*; the others are written next
+    to it as ``<stem>.<profile><suffix>``.
+    """
+    output_path = Path(output_path)
+    return [
+        (output_path if i == 0 else output_path.with_name(
+            f"{output_path.stem}.{name}{output_path.suffix}"
+        ), output_profile(name))
+        for i, name in enumerate(names)
+    ]
+
+
+def encoder_settings(
+    name: str = ENCODER_PRESET, threads: int | None = None
+) -> EncoderSettings:
+    """Return the named preset with any ``ENCODER_*`` env overrides applied.
+
+    *threads*, when given, overrides ``ENCODER_THREADS`` (e.g. to split the
+    cores between several concurrent renders).
+
+    Raises:
+        ValueError: If *name* is not a known preset.
+    """
+    if name not in ENCODER_PRESETS:
+        raise ValueError(
+            f"Unknown encoder preset '{name}' "
+            f"(expected one of: {', '.join(ENCODER_PRESETS)})"
+        )
+    base = ENCODER_PRESETS[name]
+    return EncoderSettings(
+        preset=base["preset"],
+        crf=int(ENCODER_CRF) if ENCODER_CRF else base["crf"],
+        tune=ENCODER_TUNE or None,
+        threads=ENCODER_THREADS if threads is None else threads,
+    )
+
+
+def ffmpeg_binary() -> str:
+    """Return the ffmpeg executable MoviePy uses (honours ``IMAGEIO_FFMPEG_EXE``)."""
+    from imageio_ffmpeg import get_ffmpeg_exe
+
+    return get_ffmpeg_exe()
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+def _write_concat_list(paths: list[Path], directory: str) -> str:
+    """Write an ffmpeg concat-demuxer list for *paths* and return its path."""
+    list_path = os.path.join(directory, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = str(Path(path).resolve()).replace("'", r"'\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def _output_graph(
+    profiles: list[OutputProfile], source_size: tuple[int, int], fps: int
+) -> tuple[list[str], list[str]]:
+    """Return ``-filter_complex`` arguments and the video map for each profile.
+
+    A single profile that needs no filtering maps the raw input directly;
+    otherwise the input is split once and each copy filtered for its profile.
+    """
+    chains = [profile.filter_chain(source_size, fps) for profile in profiles]
+    if len(profiles) == 1 and not chains[0]:
+        return [], ["0:v"]
+    graph = "[0:v]split=%d%s" % (len(chains), "".join(f"[s{i}]" for i in range(len(chains))))
+    for i, chain in enumerate(chains):
+        graph += f";[s{i}]{chain or 'null'}[v{i}]"
+    return ["-filter_complex", graph], [f"[v{i}]" for i in range(len(chains))]
+
+
+def encode_with_ffmpeg(
+    clip,
+    outputs: list[tuple[Path, OutputProfile]],
+    fps: int,
+    settings: EncoderSettings,
+    audio_path: Path | None = None,
+) -> dict:
+    """Stream *clip*'s frames into one ffmpeg process writing every output.
+
+    Each ``(path, profile)`` in *outputs* gets its own scaled video stream
+    and encoder; *audio_path* is muxed into all of them.  Returns encode
+    statistics (frames, seconds, fps).
+
+    Raises:
+        RuntimeError: If ffmpeg exits with an error.
+    """
+    width, height = clip.size
+    with tempfile.TemporaryDirectory(prefix="encode-") as tmp:
+        cmd = [
+            ffmpeg_binary(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        ]
+        if audio_path:
+            cmd += ["-i", str(audio_path)]
+        graph, video_maps = _output_graph([p for _, p in outputs], (width, height), fps)
+        cmd += graph
+        for (path, profile), video_map in zip(outputs, video_maps):
+            cmd += ["-map", video_map]
+            if audio_path:
+                cmd += ["-map", "1:a", "-c:a", _AUDIO_CODEC, "-b:a", _AUDIO_BITRATE]
+            cmd += profile.settings(settings).video_args()
+            cmd += ["-pix_fmt", "yuv420p", "-movflags", "+faststart", str(path)]
+        logger.debug("ffmpeg command: %s", " ".join(cmd))
+
+        stderr_path = os.path.join(tmp, "ffmpeg.log")
+        frames = 0
+        started = time.perf_counter()
+        with open(stderr_path, "wb") as stderr:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=stderr)
+            try:
+                for frame in clip.iter_frames(fps=fps, dtype="uint8"):
+                    proc.stdin.write(np.ascontiguousarray(frame).data)
+                    frames += 1
+            except BrokenPipeError:
+                pass  # ffmpeg died; its log explains why
+            finally:
+                proc.stdin.close()
+                proc.wait()
+        elapsed = time.perf_counter() - started
+
+        if proc.returncode != 0:
+            with open(stderr_path, encoding="utf-8", errors="replace") as f:
+                raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {f.read().strip()}")
+
+    return {"frames": frames, "seconds": elapsed, "fps": frames / elapsed if elapsed else 0.0}
+
+
+def concat_stream_copy(paths: list[Path], output_path: str | Path) -> None:
+    """Join identically encoded files into *output_path* without re-encoding.
+
+    Raises:
+        RuntimeError: If ffmpeg exits with an error.
+    """
+    with tempfile.TemporaryDirectory(prefix="concat-") as tmp:
+        cmd = [
+            ffmpeg_binary(), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", _write_concat_list(paths, tmp),
+            "-c", "copy", "-movflags", "+faststart", str(output_path),
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed ({result.returncode}): {result.stderr.strip()}")
+
+
+def encode_with_moviepy(
+    clip,
+    output_path: str | Path,
+    fps: int,
+    settings: EncoderSettings,
+    profile: OutputProfile | None = None,
+) -> dict:
+    """Encode *clip* through MoviePy's ``write_videofile`` with *settings*.
+
+    *profile*, if given, is applied with an ffmpeg ``-vf`` filter.
+    """
+    params = []
+    if profile is not None:
+        settings = profile.settings(settings)
+        chain = profile.filter_chain(clip.size, fps)
+        if chain:
+            params += ["-vf", chain]
+    if not settings.bitrate:
+        params += ["-crf", str(settings.crf)]
+    if settings.tune and settings.codec == "libx264":
+        params += ["-tune", settings.tune]
+    if settings.codec == "libx265":
+        params += ["-tag:v", "hvc1"]
+    if settings.codec != "libx264":
+        # MoviePy only requests yuv420p for libx264; others would get gbrp.
+        params += ["-pix_fmt", "yuv420p"]
+    started = time.perf_counter()
+    clip.write_videofile(
+        str(output_path),
+        fps=fps,
+        codec=settings.codec,
+        bitrate=settings.bitrate,
+        preset=settings.preset,
+        threads=settings.threads or None,
+        ffmpeg_params=params,
+        # Encode the narration at its own rate; MoviePy would otherwise
+        # resample it to 44.1 kHz by picking the nearest sample.
+        audio_fps=clip.audio.fps if clip.audio is not None else 44_100,
+    )
+    elapsed = time.perf_counter() - started
+    frames = int(clip.duration * fps)
+    return {"frames": frames, "seconds": elapsed, "fps": frames / elapsed if elapsed else 0.0}
+
+
+def render_fps(outputs: list[tuple[Path, OutputProfile]]) -> int:
+    """Frame rate to composite at so every output can be derived from it."""
+    return max(profile.fps for _, profile in outputs)
+
+
+def write_video(
+    clip,
+    outputs: list[tuple[Path, OutputProfile]],
+    fps: int,
+    backend: str,
+    settings: EncoderSettings,
+    audio_path: Path | None = None,
+) -> dict:
+    """Encode *clip* to every ``(path, profile)`` in *outputs* with *backend*.
+
+    Frames are composited once at *fps* (see :func:`render_fps`); the
+    ffmpeg backend derives every output from that single pass and muxes the
+    narration WAV at *audio_path*; MoviePy encodes ``clip.audio``.
+
+    Raises:
+        ValueError: If *backend* is not ``"moviepy"`` or ``"ffmpeg"``, or the
+            MoviePy backend is given more than one output.
+    """
+    if backend not in ("moviepy", "ffmpeg"):
+        raise ValueError(f"Unknown encoder backend '{backend}' (expected moviepy or ffmpeg)")
+    if backend == "moviepy" and len(outputs) != 1:
+        raise ValueError("The moviepy backend writes one output profile; use --backend ffmpeg")
+
+    names = [profile.name for _, profile in outputs]
+    # Frames are drawn lazily, so this stage includes per-frame compositing.
+    with stage("encode", backend=backend, preset=settings.preset, profiles=names) as attrs:
+        if backend == "ffmpeg":
+            stats = encode_with_ffmpeg(clip, outputs, fps, settings, audio_path)
+        else:
+            (path, profile), = outputs
+            stats = encode_with_moviepy(clip, path, fps, settings, profile)
+        attrs.update(frames=stats["frames"], fps=stats["fps"])
+
+    logger.info(
+        "Encoded %d frames in %.1fs (%.1f fps, %s backend, preset=%s, crf=%d, profiles=%s)",
+        stats["frames"], stats["seconds"], stats["fps"],
+        backend, settings.preset, settings.crf, ",".join(names),
+    )
+    return stats
@@ -0,0 +1,126 @@
+"""Shared pooled HTTP session for all outbound ``requests`` traffic.
+
+A single :class:`requests.Session` is reused across threads so CSE queries
+and image transfers keep their TCP/TLS connections alive.  Transient
+failures (connection errors and 5xx responses) are retried with
+exponential backoff and full jitter, bounded both per request and by a
+process-wide retry budget.  429s are not retried here: API calls hand them
+to :mod:`src.rate_limit`, which pauses the whole provider.  Connection
+reuse and retry counters are exposed through :func:`http_stats`.
+"""
+
+import logging
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from src.config import (
+    HTTP_BACKOFF_FACTOR,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_PER_HOST,
+    HTTP_RETRY_BUDGET,
+)
+
+logger = logging.getLogger(__name__)
+
+_RETRY_STATUSES = (500, 502, 503, 504)
+_BACKOFF_MAX = 30.0  # seconds
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_adapter: HTTPAdapter | None = None
+_retries_used = 0
+_retries_refused = 0
+
+
+class _BudgetedRetry(Retry):
+    """urllib3 ``Retry`` with full-jitter backoff and a shared retry budget."""
+
+    def increment(self, method=None, url=None, response=None, error=None,
+                  _pool=None, _stacktrace=None):
+        global _retries_used, _retries_refused
+        with _lock:
+            exhausted = HTTP_RETRY_BUDGET >= 0 and _retries_used >= HTTP_RETRY_BUDGET
+            if exhausted:
+                _retries_refused += 1
+            else:
+                _retries_used += 1
+        if exhausted:
+            logger.warning("HTTP retry budget exhausted; not retrying %s", url)
+            raise MaxRetryError(_pool, url, error)
+        logger.debug("Retrying %s %s (%s)", method, url, error or getattr(response, "status", ""))
+        return super().increment(
+            method=method, url=url, response=response, error=error,
+            _pool=_pool, _stacktrace=_stacktrace,
+        )
+
+    def get_backoff_time(self) -> float:
+        return random.uniform(0, min(_BACKOFF_MAX, super().get_backoff_time()))
+
+
+def _build_session() -> tuple[requests.Session, HTTPAdapter]:
+    retry = _BudgetedRetry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=_RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_PER_HOST,
+        pool_block=True,  # cap concurrent connections per host
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session, adapter
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session, _adapter
+    with _lock:
+        if _session is None:
+            _session, _adapter = _build_session()
+            logger.debug(
+                "HTTP session created (%d hosts × %d connections, %d retries)",
+                HTTP_POOL_HOSTS, HTTP_POOL_PER_HOST, HTTP_MAX_RETRIES,
+            )
+        return _session
+
+
+def http_stats() -> dict:
+    """Return connection-reuse and retry counters for the shared session.
+
+    Counters cover host pools that are still alive in the pool manager;
+    pools evicted after ``HTTP_POOL_HOSTS`` distinct hosts are dropped.
+    """
+    requests_sent = connections_opened = 0
+    with _lock:
+        if _adapter is not None:
+            pools = _adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": max(0, requests_sent - connections_opened),
+            "retries": _retries_used,
+            "retries_refused": _retries_refused,
+        }
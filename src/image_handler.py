@@ -2,36 +2,92 @@
 
 Fetches anime images matching script prompts, validates them with Pillow,
 and saves them to disk for the video renderer.
+
+Search results are memoized per query (with a TTL) and validated image
+bytes are stored content-addressed in a persistent cache, indexed by source
+URL and by prompt, so repeated prompts across shorts become local reads.
+
+Candidates are validated concurrently with streamed requests that read only
+the headers and enough bytes to parse the image header; the winning
+candidate's stream is then finished and handed to :func:`download_image`
+so it is never fetched twice.  All traffic goes through the shared pooled
+session in :mod:`src.http_session`, which also retries transient errors;
+searches are admitted by the ``google_cse`` limiter in
+:mod:`src.rate_limit`, which enforces the daily query quota.  Each query is
+searched once per TTL: download retries walk further down the cached
+result list rather than searching again.
+
+:func:`prepare_image` normalizes a downloaded image for rendering: it is
+decoded once (JPEGs in draft mode, so a 4K source is decoded at a fraction
+of its size), downscaled straight to its letterboxed size on the video
+canvas, and cached by source content, so renderers never touch the
+full-resolution original.
 """
 
+import io
 import logging
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
-from PIL import Image
+from PIL import Image, ImageFile
 
-from src.config import GOOGLE_API_KEY, GOOGLE_CSE_ID
+from src.cache import DiskCache, content_key, make_key
+from src.config import (
+    GOOGLE_API_KEY,
+    GOOGLE_CSE_ID,
+    GOOGLE_CSE_URL,
+    IMAGE_CACHE_MAX_MB,
+    IMAGE_SEARCH_CACHE_TTL,
+    VIDEO_HEIGHT,
+    VIDEO_WIDTH,
+)
+from src.http_session import get_session
+from src.instrumentation import count, stage
+from src.rate_limit import call
 
 logger = logging.getLogger(__name__)
 
-_GOOGLE_CSE_URL = "https://www.googleapis.com/customsearch/v1"
 _FALLBACK_QUERY = "anime background"
+_SEARCH_RESULTS = 10  # CSE's maximum; a query costs the same for any count
+_PROBE_BATCH = 5  # candidates validated concurrently
 _REQUEST_TIMEOUT = 10  # seconds
+_SNIFF_CHUNK = 8 * 1024  # bytes read per streamed chunk while sniffing
+_SNIFF_LIMIT = 256 * 1024  # give up if no image header within this many bytes
+_MIN_IMAGE_SIDE = 64  # pixels; rejects icons and tracking pixels
+_PREPARED_QUALITY = 95  # JPEG quality of normalized images
+_REDUCING_GAP = 3.0  # integer pre-reduction before the Lanczos pass
+
+_cache = DiskCache("images", IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+# Bytes of validated winners awaiting download_image(), keyed by URL.  Only
+# the most recent few are kept: a winner nobody downloads is dropped rather
+# than held for the life of the process (it is in the disk cache anyway).
+_PREFETCH_SLOTS = 16
+_prefetched: OrderedDict[str, bytes] = OrderedDict()
+_prefetched_lock = threading.Lock()
 
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def fetch_image_url(query: str, max_results: int = 5) -> str:
+def fetch_image_url(
+    query: str, max_results: int = _SEARCH_RESULTS, exclude: frozenset[str] = frozenset()
+) -> str:
     """Search Google CSE for an image matching *query* and return the first valid URL.
 
-    Falls back to a generic anime query if the specific search yields nothing.
+    Falls back to a generic anime query if the specific search yields
+    nothing.  Links in *exclude* (e.g. ones that already failed to
+    download) are skipped.
 
     Raises:
         EnvironmentError: If Google API credentials are not configured.
         ValueError: If no usable image is found after exhausting results.
+        QuotaExhausted: If the daily search quota is used up.
     """
     if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
         raise EnvironmentError(
@@ -39,43 +95,62 @@ def fetch_image_url(query: str, max_results: int = 5) -> str:
         )
 
     for search_query in (query, _FALLBACK_QUERY):
-        logger.info("Searching images for '%s' (max %d results)", search_query, max_results)
-        params = {
-            "key": GOOGLE_API_KEY,
-            "cx": GOOGLE_CSE_ID,
-            "q": search_query,
-            "searchType": "image",
-            "num": max_results,
-            "safe": "active",
-        }
-
-        try:
-            response = requests.get(_GOOGLE_CSE_URL, params=params, timeout=_REQUEST_TIMEOUT)
-            response.raise_for_status()
-        except requests.RequestException as exc:
-            logger.warning("Image search failed for '%s': %s", search_query, exc)
+        links = _search_links(search_query, max_results)
+        if links is None:
             continue
+        links = [link for link in links if link not in exclude]
 
-        items = response.json().get("items") or []
-        logger.debug("Received %d results for '%s'", len(items), search_query)
+        for link in links:
+            if _cached_blob_key(link) is not None:
+                logger.info("Valid image found (cached): %s", link)
+                return link
 
-        for idx, item in enumerate(items, 1):
-            link = item.get("link")
-            if not link:
-                continue
-            logger.debug("Validating result %d/%d: %s", idx, len(items), link)
-            try:
-                head = requests.get(link, timeout=_REQUEST_TIMEOUT)
-                if head.headers.get("Content-Type", "").startswith("image"):
-                    logger.info("Valid image found: %s", link)
-                    return link
-                logger.debug("Skipped non-image content: %s", head.headers.get("Content-Type"))
-            except requests.RequestException as exc:
-                logger.debug("Could not reach %s: %s", link, exc)
+        for start in range(0, len(links), _PROBE_BATCH):
+            winner = _select_candidate(links[start:start + _PROBE_BATCH])
+            if winner:
+                return winner
 
     raise ValueError(f"No usable image found for '{query}' or fallback query.")
 
 
+def fetch_image(prompt: str, save_path: str | Path) -> Path:
+    """Ensure an image for *prompt* exists at *save_path* and return the path.
+
+    Prompts seen in earlier runs are served from the persistent cache;
+    otherwise this searches with :func:`fetch_image_url`, downloads with
+    :func:`download_image` and remembers the result for next time.
+    """
+    save_path = Path(save_path)
+    with stage("image.fetch", prompt=prompt) as attrs:
+        if cached_image(prompt, save_path):
+            attrs["cached"] = True
+            return save_path
+
+        attrs["cached"] = False
+        url = fetch_image_url(prompt)
+        download_image(url, save_path, original_prompt=prompt)
+        _cache.put_json(make_key("prompt", prompt), content_key(save_path.read_bytes()))
+        return save_path
+
+
+def cached_image(prompt: str, save_path: str | Path) -> bool:
+    """Copy the image cached for *prompt* to *save_path*, if there is one.
+
+    Never touches the network; returns whether an image was written.
+    """
+    blob_key = _cache.get_json(make_key("prompt", prompt))
+    if blob_key and _cache.copy_to(blob_key, save_path, record=False):
+        if is_valid_image(save_path):
+            logger.info("Image cache hit for '%s' → %s", prompt, save_path)
+            return True
+    return False
+
+
+def image_cache_stats() -> dict:
+    """Return hit/miss/eviction counters for the image cache."""
+    return _cache.stats()
+
+
 def download_image(
     image_url: str,
     save_path: str | Path,
@@ -84,17 +159,35 @@ def download_image(
 ) -> None:
     """Download an image from *image_url* and save it to *save_path*.
 
-    On failure the function re-fetches a new URL using *original_prompt*
-    and retries up to *max_attempts* times.
+    On failure the next candidate for *original_prompt* is taken from the
+    cached search results, up to *max_attempts* times, so retries do not
+    spend search quota.
 
     Raises:
         RuntimeError: If all download attempts are exhausted.
     """
     current_url = image_url
+    tried = set()
     for attempt in range(1, max_attempts + 1):
+        with _prefetched_lock:
+            prefetched = _prefetched.pop(current_url, None)
+        if prefetched is not None:
+            Path(save_path).write_bytes(prefetched)
+            logger.info("Image for %s already downloaded → %s", current_url, save_path)
+            return
+
+        blob_key = _cached_blob_key(current_url)
+        if blob_key and _cache.copy_to(blob_key, save_path, record=False):
+            logger.info("Image for %s served from cache → %s", current_url, save_path)
+            return
+
         logger.info("Downloading image (attempt %d/%d): %s", attempt, max_attempts, current_url)
         try:
-            resp = requests.get(current_url, timeout=_REQUEST_TIMEOUT)
+            with stage("image.download", url=current_url) as attrs:
+                count("api.image_download")
+                resp = get_session().get(current_url, timeout=_REQUEST_TIMEOUT)
+                count("bytes_downloaded", len(resp.content))
+                attrs["status"] = resp.status_code
             content_type = resp.headers.get("Content-Type", "")
             if not content_type.startswith("image"):
                 raise ValueError(f"Response is not an image (Content-Type: {content_type})")
@@ -104,6 +197,7 @@ def download_image(
             if not is_valid_image(save_path):
                 raise ValueError("Downloaded file failed Pillow validation")
 
+            _store_image(current_url, resp.content)
             logger.info("Image saved to %s", save_path)
             return
 
@@ -117,11 +211,69 @@ def download_image(
                     f"'{original_prompt or current_url}'"
                 ) from exc
 
+            tried.add(current_url)
             retry_query = original_prompt or _FALLBACK_QUERY
-            current_url = fetch_image_url(retry_query, max_results=max_attempts + attempt)
+            current_url = fetch_image_url(retry_query, exclude=frozenset(tried))
+
+
+def letterbox(img: Image.Image, canvas_size: tuple[int, int] | None = None) -> Image.Image:
+    """Fit *img* inside the video canvas (or *canvas_size*), centred on black.
+
+    Call on a freshly opened image: JPEGs are then decoded in draft mode,
+    already reduced towards the target size.
+    """
+    canvas_size = canvas_size or (VIDEO_WIDTH, VIDEO_HEIGHT)
+    width, height = canvas_size
+    scale = min(width / img.width, height / img.height)
+    size = (
+        min(width, max(1, round(img.width * scale))),
+        min(height, max(1, round(img.height * scale))),
+    )
+    img.draft("RGB", size)
+    img = img.convert("RGB")
+    if img.size != size:
+        img = img.resize(size, Image.LANCZOS, reducing_gap=_REDUCING_GAP)
+    if size == canvas_size:
+        return img
+
+    canvas = Image.new("RGB", canvas_size, (0, 0, 0))
+    canvas.paste(img, ((width - img.width) // 2, (height - img.height) // 2))
+    return canvas
+
+
+def prepare_image(path: str | Path) -> Path:
+    """Replace the image at *path* with its letterboxed, canvas-sized JPEG.
+
+    Already-normalized images are left alone; others are served from the
+    cache when the same source was prepared before.
+    """
+    path = Path(path)
+    with stage("image.prepare") as attrs:
+        with Image.open(path) as img:
+            attrs["source"] = f"{img.width}x{img.height}"
+            normalized = img.format == "JPEG" and img.mode == "RGB"
+            if normalized and img.size == (VIDEO_WIDTH, VIDEO_HEIGHT):
+                attrs["cached"] = True
+                return path
+
+        raw = path.read_bytes()
+        key = make_key("prepared", content_key(raw), VIDEO_WIDTH, VIDEO_HEIGHT, _PREPARED_QUALITY)
+        if _cache.copy_to(key, path):
+            attrs["cached"] = True
+            return path
+
+        attrs["cached"] = False
+        with Image.open(io.BytesIO(raw)) as img:
+            prepared = letterbox(img)
+        out = io.BytesIO()
+        prepared.save(out, "JPEG", quality=_PREPARED_QUALITY, subsampling=0)
+        path.write_bytes(out.getvalue())
+        _cache.put_bytes(key, out.getvalue())
+        logger.debug("Prepared %s (%s → %dx%d)", path, attrs["source"], *prepared.size)
+        return path
 
 
-def is_valid_image(path: str | Path) -> bool:
+def is_valid_image(path: str | Path | io.BytesIO) -> bool:
     """Return True if *path* is a valid image file (per Pillow)."""
     try:
         with Image.open(path) as img:
@@ -130,3 +282,175 @@ def is_valid_image(path: str | Path) -> bool:
     except Exception as exc:
         logger.debug("Invalid image at %s: %s", path, exc)
         return False
+
+
+# ---------------------------------------------------------------------------
+# Candidate validation
+# ---------------------------------------------------------------------------
+
+def _probe_candidate(link: str) -> tuple[requests.Response, bytes] | None:
+    """Stream *link* just far enough to parse its image header.
+
+    Returns the still-open response plus the bytes read so far, or None if
+    the link is unreachable, not an image, or too small to be useful.
+    """
+    try:
+        resp = get_session().get(link, timeout=_REQUEST_TIMEOUT, stream=True)
+    except requests.RequestException as exc:
+        logger.debug("Could not reach %s: %s", link, exc)
+        return None
+
+    content_type = resp.headers.get("Content-Type", "")
+    if not resp.ok or not content_type.startswith("image"):
+        logger.debug("Skipped non-image content: %s (%s)", link, content_type)
+        resp.close()
+        return None
+
+    parser = ImageFile.Parser()
+    prefix = bytearray()
+    try:
+        for chunk in resp.iter_content(chunk_size=_SNIFF_CHUNK):
+            prefix.extend(chunk)
+            parser.feed(chunk)
+            if parser.image is not None or len(prefix) >= _SNIFF_LIMIT:
+                break
+    except Exception as exc:
+        logger.debug("Failed to sniff %s: %s", link, exc)
+        resp.close()
+        return None
+
+    header = parser.image
+    if header is None or min(header.size) < _MIN_IMAGE_SIDE:
+        logger.debug("Rejected %s: no usable image header", link)
+        resp.close()
+        return None
+
+    logger.debug("Sniffed %s: %s %dx%d", link, header.format, *header.size)
+    return resp, bytes(prefix)
+
+
+def _finish_download(resp: requests.Response, prefix: bytes) -> bytes | None:
+    """Read the rest of a probed response and return the full, valid body."""
+    try:
+        with stage("image.download", url=resp.url):
+            rest = b"".join(resp.iter_content(chunk_size=64 * 1024))
+            count("bytes_downloaded", len(rest))
+    except requests.RequestException as exc:
+        logger.debug("Failed to finish download of %s: %s", resp.url, exc)
+        return None
+    finally:
+        resp.close()
+    body = prefix + rest
+    return body if is_valid_image(io.BytesIO(body)) else None
+
+
+def _close_probe(future) -> None:
+    """Done-callback that releases the connection held by a losing probe."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    probe = future.result()
+    if probe is not None:
+        probe[0].close()
+
+
+def _select_candidate(links: list[str]) -> str | None:
+    """Validate *links* concurrently and return the first usable one in order.
+
+    The winner's body is downloaded once, cached, and parked for
+    :func:`download_image`; connections of the other candidates are closed.
+    """
+    if not links:
+        return None
+
+    pool = ThreadPoolExecutor(max_workers=len(links), thread_name_prefix="probe")
+    futures = [pool.submit(_probe_candidate, link) for link in links]
+    count("api.image_probe", len(links))
+    winner = None
+    try:
+        for link, future in zip(links, futures):
+            if winner is not None:
+                future.add_done_callback(_close_probe)
+                continue
+            probe = future.result()
+            if probe is None:
+                continue
+            # Probes run on pool threads; charge their bytes to this stage.
+            count("bytes_downloaded", len(probe[1]))
+            data = _finish_download(*probe)
+            if data is None:
+                continue
+            logger.info("Valid image found: %s", link)
+            _store_image(link, data)
+            with _prefetched_lock:
+                _prefetched[link] = data
+                _prefetched.move_to_end(link)
+                while len(_prefetched) > _PREFETCH_SLOTS:
+                    _prefetched.popitem(last=False)
+            winner = link
+    finally:
+        # Don't wait for slower losing probes; their callbacks close them.
+        pool.shutdown(wait=False)
+    return winner
+
+
+# ---------------------------------------------------------------------------
+# Cache helpers
+# ---------------------------------------------------------------------------
+
+def _search_links(query: str, max_results: int) -> list[str] | None:
+    """Return result links for *query*, from cache when fresh.
+
+    Returns None when the search request itself fails.
+    """
+    search_key = make_key("search", query, max_results)
+    links = _cache.get_json(search_key, max_age=IMAGE_SEARCH_CACHE_TTL)
+    if links is not None:
+        logger.info("Image search cache hit for '%s' (%d results)", query, len(links))
+        return links
+
+    logger.info("Searching images for '%s' (max %d results)", query, max_results)
+    params = {
+        "key": GOOGLE_API_KEY,
+        "cx": GOOGLE_CSE_ID,
+        "q": query,
+        "searchType": "image",
+        "num": max_results,
+        "safe": "active",
+    }
+
+    try:
+        with stage("image.search", query=query):
+            response = call("google_cse", _cse_request, params)
+    except requests.RequestException as exc:
+        logger.warning("Image search failed for '%s': %s", query, exc)
+        return None
+
+    items = response.json().get("items") or []
+    logger.debug("Received %d results for '%s'", len(items), query)
+    links = [item["link"] for item in items if item.get("link")]
+    _cache.put_json(search_key, links)
+    return links
+
+
+def _cse_request(params: dict) -> requests.Response:
+    count("api.google_cse")
+    response = get_session().get(GOOGLE_CSE_URL, params=params, timeout=_REQUEST_TIMEOUT)
+    count("bytes_downloaded", len(response.content))
+    response.raise_for_status()
+    return response
+
+
+def _cached_blob_key(url: str) -> str | None:
+    """Return the content key of the cached image downloaded from *url*."""
+    blob_key = _cache.get_json(make_key("url", url), record=False)
+    if blob_key and _cache.get_path(blob_key, record=False) is not None:
+        return blob_key
+    return None
+
+
+def _store_image(url: str, data: bytes) -> str:
+    """Store validated image *data* content-addressed and index it by *url*."""
+    blob_key = content_key(data)
+    _cache.put_bytes(blob_key, data)
+    _cache.put_json(make_key("url", url), blob_key)
+    return blob_key
@@ -0,0 +1,218 @@
+"""Per-stage timing and resource instrumentation.
+
+Wrap any unit of work in :func:`stage` to record its wall time, CPU time
+(of the calling thread), the process's peak RSS when it finished, and any
+attributes the stage attaches.  Process-wide counters (API calls by
+provider, bytes downloaded) are bumped with :func:`count`.  At the end of a
+run :func:`write_report` emits a JSON summary and :func:`write_trace` a
+Chrome trace-event file (open it in ``chrome://tracing`` or Perfetto).
+
+Counters are also attributed to every stage open on the calling thread, so
+a stage's record shows the bytes and API calls it made itself; work handed
+to other threads is counted in the stages those threads open.  Work handed
+to other processes is recorded there and folded back with :func:`merge`.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_events: list[dict] = []
+_counters: dict[str, int] = defaultdict(int)
+_local = threading.local()  # per-thread stack of open stages' counters
+_run_started = time.perf_counter()
+_run_started_wall = time.time()
+
+
+def _peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far, in megabytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def start_run() -> None:
+    """Discard everything recorded so far and restart the run clock."""
+    global _run_started, _run_started_wall
+    with _lock:
+        _events.clear()
+        _counters.clear()
+        _run_started = time.perf_counter()
+        _run_started_wall = time.time()
+
+
+@contextmanager
+def stage(name: str, **attrs: Any) -> Iterator[dict]:
+    """Record the enclosed block as stage *name*.
+
+    Yields a dict the caller may add attributes to (e.g. ``bytes``); they
+    are stored with the stage.  Exceptions are recorded and re-raised.
+    """
+    stack = _local.__dict__.setdefault("stack", [])
+    counters: dict[str, int] = defaultdict(int)
+    stack.append(counters)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        # Not necessarily the top: a stage held open by a suspended
+        # generator can outlive stages opened after it.
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is counters:
+                del stack[i]
+                break
+        event = {
+            "name": name,
+            "start": wall_start - _run_started,
+            "wall": wall,
+            "cpu": time.thread_time() - cpu_start,
+            "peak_rss_mb": _peak_rss_mb(),
+            "thread": threading.current_thread().name,
+            "tid": threading.get_ident(),
+            "status": status,
+            "attrs": attrs,
+            "counters": dict(counters),
+        }
+        with _lock:
+            _events.append(event)
+        logger.debug("Stage %s took %.3fs", name, wall)
+
+
+def events(name: str | None = None) -> list[dict]:
+    """Return a copy of the recorded stages, optionally only those named *name*."""
+    with _lock:
+        return [event for event in _events if name is None or event["name"] == name]
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Increment counter *name* process-wide and in this thread's open stages."""
+    with _lock:
+        _counters[name] += amount
+    for counters in getattr(_local, "stack", ()):
+        counters[name] += amount
+
+
+def merge(report: dict) -> None:
+    """Fold another process's :func:`summary` (with its ``events``) into this run.
+
+    Stage start times are shifted onto this run's clock and tagged with the
+    other process's ``pid`` so traces show them on their own track.
+    """
+    offset = report["started"] - _run_started_wall
+    with _lock:
+        for event in report.get("events", ()):
+            _events.append({**event, "start": event["start"] + offset, "pid": report["pid"]})
+        for name, amount in report["counters"].items():
+            _counters[name] += amount
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def summary() -> dict:
+    """Return per-stage aggregates, counters and run-level totals."""
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+
+    stages: dict[str, dict] = {}
+    for event in events:
+        agg = stages.setdefault(event["name"], {
+            "calls": 0, "wall": 0.0, "cpu": 0.0, "max_wall": 0.0,
+            "errors": 0, "counters": defaultdict(int),
+        })
+        agg["calls"] += 1
+        agg["wall"] += event["wall"]
+        agg["cpu"] += event["cpu"]
+        agg["max_wall"] = max(agg["max_wall"], event["wall"])
+        agg["errors"] += event["status"] == "error"
+        for name, amount in event["counters"].items():
+            agg["counters"][name] += amount
+
+    return {
+        "pid": os.getpid(),
+        "started": _run_started_wall,
+        "wall": time.perf_counter() - _run_started,
+        "cpu": time.process_time(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": stages,
+        "counters": counters,
+    }
+
+
+def write_report(path: str | Path, extra: dict | None = None) -> Path:
+    """Write the JSON run report (summary + every stage) to *path*."""
+    path = Path(path)
+    with _lock:
+        events = list(_events)
+    report = {**summary(), **(extra or {}), "events": events}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+    logger.info("Run report written to %s", path)
+    return path
+
+
+def write_trace(path: str | Path) -> Path:
+    """Write recorded stages as Chrome trace-event JSON to *path*."""
+    path = Path(path)
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+    trace = [
+        {
+            "name": event["name"],
+            "cat": event["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["wall"] * 1e6,
+            "pid": event.get("pid", pid),
+            "tid": event["tid"],
+            "args": {
+                **event["attrs"], **event["counters"],
+                "cpu_s": event["cpu"], "status": event["status"],
+            },
+        }
+        for event in events
+    ]
+    trace += [
+        {"name": "thread_name", "ph": "M", "pid": tpid, "tid": tid, "args": {"name": name}}
+        for (tpid, tid), name in {
+            (e.get("pid", pid), e["tid"]): e["thread"] for e in events
+        }.items()
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"traceEvents": trace, "otherData": {"counters": counters}}, default=str),
+        encoding="utf-8",
+    )
+    logger.info("Chrome trace written to %s", path)
+    return path
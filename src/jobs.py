@@ -0,0 +1,182 @@
+"""Batch job definitions shared by the in-process batch runner and the farm.
+
+A :class:`BatchJob` names one short, the workspace its assets live in, and
+the file it renders to.  :func:`prepare_job` runs the network-bound stages
+(script generation, parsing, asset fetching) for a job;
+:func:`generate_job_scripts` writes the scripts of a whole batch up front
+with a few multi-script completions instead.
+"""
+
+import logging
+import re
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from src.assets import SegmentAssets
+from src.config import (
+    OUTPUT_PATH,
+    SCRIPT_SEED,
+    SCRIPT_STREAMING,
+    SCRIPTS_PER_COMPLETION,
+    WHOLE_SCRIPT_TTS,
+)
+from src.rate_limit import wait_for_quota
+from src.script_generator import (
+    generate_anime_script,
+    generate_anime_scripts,
+    parse_script,
+    stream_anime_script,
+)
+from src.video_renderer import prepare_assets
+from src.workspace import Workspace, job_workspace
+
+logger = logging.getLogger(__name__)
+
+# A comment starts a line or follows whitespace, so paths may contain "#".
+_COMMENT = re.compile(r"(?:^|\s)#.*")
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    """One short in a batch: where its assets live and where it renders to."""
+
+    name: str
+    workspace: Workspace
+    output_path: Path
+    generate_script: bool = True
+    # Seed for this job's own script request; every job needs a different
+    # one, or all would share one cached completion.
+    seed: int | None = None
+
+
+def generated_jobs(
+    count: int,
+    output_dir: Path = OUTPUT_PATH.parent,
+    run: str | None = None,
+    seed: int | None = SCRIPT_SEED,
+) -> list[BatchJob]:
+    """Return *count* jobs that each generate a fresh script.
+
+    Jobs are named ``short_<run>_001`` … so every run (by default, its start
+    time) gets its own workspaces, outputs and queue entries.  With a
+    *seed*, job *n* (from 0) is seeded with ``seed + n``.
+    """
+    run = run or time.strftime("%Y%m%d-%H%M%S")
+    jobs = []
+    for n in range(count):
+        name = f"short_{run}_{n + 1:03d}"
+        jobs.append(BatchJob(
+            name=name,
+            workspace=job_workspace(name),
+            output_path=output_dir / f"{name}.mp4",
+            seed=None if seed is None else seed + n,
+        ))
+    return jobs
+
+
+def manifest_jobs(manifest: Path, output_dir: Path = OUTPUT_PATH.parent) -> list[BatchJob]:
+    """Return one job per script path listed in *manifest*.
+
+    Blank lines and ``#`` comments are ignored; relative paths are resolved
+    against the manifest's directory.  Each job is named after its script's
+    path relative to the manifest (``a/script.txt`` → ``a-script``), with a
+    numeric suffix if two scripts would still share a name.
+
+    Raises:
+        FileNotFoundError: If the manifest or a listed script is missing.
+    """
+    manifest = Path(manifest)
+    jobs = []
+    names: set[str] = set()
+    for line in manifest.read_text(encoding="utf-8").splitlines():
+        line = _COMMENT.sub("", line).strip()
+        if not line:
+            continue
+        script = Path(line)
+        if not script.is_absolute():
+            script = manifest.parent / script
+        if not script.exists():
+            raise FileNotFoundError(f"Manifest script not found: {script}")
+        name = _manifest_name(script, manifest.parent, names)
+        names.add(name)
+        jobs.append(BatchJob(
+            name=name,
+            workspace=job_workspace(name, script_path=script),
+            output_path=output_dir / f"{name}.mp4",
+            generate_script=False,
+        ))
+    return jobs
+
+
+def _manifest_name(script: Path, root: Path, taken: set[str]) -> str:
+    """A job name for *script* that is not in *taken*."""
+    try:
+        relative = script.resolve().relative_to(root.resolve())
+    except ValueError:
+        relative = Path(script.name)  # listed outside the manifest's directory
+    base = "-".join(relative.with_suffix("").parts)
+    name, n = base, 1
+    while name in taken:
+        n += 1
+        name = f"{base}-{n}"
+    return name
+
+
+def generate_job_scripts(
+    jobs: list[BatchJob], per_completion: int = SCRIPTS_PER_COMPLETION
+) -> list[BatchJob]:
+    """Generate the scripts of all *jobs* that need one, *per_completion* per request.
+
+    Returns the jobs with ``generate_script`` cleared so they use the
+    written scripts.  With *per_completion* of 1 or less, *jobs* are
+    returned unchanged and each generates (and streams) its own script.
+
+    Raises:
+        RuntimeError: If some scripts could not be generated.
+    """
+    pending = [job for job in jobs if job.generate_script]
+    if per_completion <= 1 or not pending:
+        return jobs
+    generate_anime_scripts([job.workspace.script_path for job in pending], per_completion)
+    return [replace(job, generate_script=False) for job in jobs]
+
+
+def _then(items: Iterable, callback: Callable[[], None]) -> Iterator:
+    """Yield *items*, then call *callback* once they are exhausted."""
+    yield from items
+    callback()
+
+
+def prepare_job(
+    job: BatchJob,
+    use_audio: bool,
+    stream_script: bool = SCRIPT_STREAMING,
+    whole_script_tts: bool = WHOLE_SCRIPT_TTS,
+    on_script: Callable[[], None] | None = None,
+) -> list[SegmentAssets]:
+    """Run the script and asset stages for *job* (network-bound).
+
+    With *stream_script*, assets are fetched while the script is generated;
+    with *whole_script_tts*, the narration is one TTS request.  *on_script*
+    is called once a generated script has been completely written.  Waits
+    first while a daily API quota is down to the reserve kept for jobs in
+    progress.
+    """
+    wait_for_quota()
+    job.workspace.clean()
+    if job.generate_script and stream_script:
+        segments = stream_anime_script(job.workspace.script_path, job.seed)
+        if on_script is not None:
+            segments = _then(segments, on_script)
+    else:
+        if job.generate_script:
+            generate_anime_script(job.workspace.script_path, job.seed)
+            if on_script is not None:
+                on_script()
+        segments = parse_script(job.workspace.script_path)
+    return prepare_assets(
+        segments, use_audio=use_audio, workspace=job.workspace,
+        whole_script_tts=whole_script_tts,
+    )
@@ -0,0 +1,101 @@
+"""Lazy, memory-bounded concatenation of segment clips.
+
+Building every segment up front (decoded images, subtitle sprites) holds
+the whole video in memory before the first frame is encoded.
+:func:`lazy_concatenate` instead takes each segment's duration and a
+builder, and materializes a segment only when the encoder first asks for
+one of its frames.  At most ``max_live`` segments are alive at once;
+the least recently used one is closed (releasing its image buffers) when
+another is needed.  Narration is not built per segment at all; it arrives
+as one assembled track (see :mod:`src.audio_track`).
+"""
+
+import bisect
+import logging
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+from moviepy.video.VideoClip import VideoClip
+
+from src.config import VIDEO_HEIGHT, VIDEO_WIDTH
+
+logger = logging.getLogger(__name__)
+
+# Canvas-sized buffers a live segment typically holds (image, composite
+# layers, subtitle sprites).
+_CANVASES_PER_SEGMENT = 4
+
+
+def segments_within_budget(
+    budget_mb: int, size: tuple[int, int] = (VIDEO_WIDTH, VIDEO_HEIGHT)
+) -> int:
+    """How many segments of frame *size* may be live within *budget_mb* megabytes."""
+    segment_bytes = size[0] * size[1] * 3 * _CANVASES_PER_SEGMENT
+    return max(1, budget_mb * 1024 * 1024 // segment_bytes)
+
+
+class _SegmentWindow:
+    """Builds segments on demand and closes the least recently used."""
+
+    def __init__(self, build: Callable[[int], object], max_live: int, kind: str) -> None:
+        self._build = build
+        self._max_live = max(1, max_live)
+        self._kind = kind
+        self._live: OrderedDict[int, object] = OrderedDict()
+
+    def get(self, i: int):
+        if i in self._live:
+            self._live.move_to_end(i)
+            return self._live[i]
+        while len(self._live) >= self._max_live:
+            old, clip = self._live.popitem(last=False)
+            _close(clip)
+            logger.debug("Closed %s segment %d", self._kind, old)
+        logger.debug("Materializing %s segment %d", self._kind, i)
+        clip = self._live[i] = self._build(i)
+        return clip
+
+    def close(self) -> None:
+        while self._live:
+            _close(self._live.popitem()[1])
+
+
+def _close(clip) -> None:
+    if clip is not None and hasattr(clip, "close"):
+        clip.close()
+
+
+def _starts(durations: list[float]) -> list[float]:
+    starts, total = [], 0.0
+    for duration in durations:
+        starts.append(total)
+        total += duration
+    return starts
+
+
+def lazy_concatenate(
+    durations: list[float],
+    build: Callable[[int], VideoClip],
+    max_live: int = 1,
+    size: tuple[int, int] = (VIDEO_WIDTH, VIDEO_HEIGHT),
+) -> VideoClip:
+    """Return one clip playing segments ``build(0)``, ``build(1)``, … in order.
+
+    Segment *i* lasts ``durations[i]`` seconds and is built the first time
+    one of its frames is drawn; every segment must draw frames of *size*.
+    """
+    starts = _starts(durations)
+    window = _SegmentWindow(build, max_live, "video")
+
+    def make_frame(t: float) -> np.ndarray:
+        i = max(0, bisect.bisect_right(starts, t) - 1)
+        return window.get(i).get_frame(t - starts[i])
+
+    # Sized by hand: passing make_frame to the constructor would draw (and
+    # so materialize) the first segment just to measure it.
+    clip = VideoClip(duration=sum(durations))
+    clip.make_frame = make_frame
+    clip.size = tuple(size)
+    clip.close = window.close
+    return clip
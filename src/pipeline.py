@@ -3,70 +3,221 @@
 Coordinates the end-to-end flow: clean workspace → generate script →
 parse segments → render video.  Also exposes the ``cli()`` function used
 by ``main.py``.
+
+Batch mode (:func:`run_batch`) renders many shorts in one process: each job
+gets its own workspace and output file, API clients and the HTTP session
+stay warm across jobs, and assets for job N+1 are fetched while job N is
+being encoded.
+
+Preview mode (``--preview``) renders a quick low-resolution draft to
+``PREVIEW_PATH`` from cached or placeholder assets, optionally with one
+still per segment (``--stills``), so script edits can be reviewed in
+seconds.
 """
 
 import argparse
 import logging
-import shutil
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
-from src.config import AUDIO_DIR, IMAGE_DIR, OUTPUT_PATH, SCRIPT_PATH
-from src.script_generator import generate_anime_script, parse_script
-from src.video_renderer import create_video
+from src.audio_generator import tts_cache_stats
+from src.config import (
+    ENCODER_BACKEND,
+    ENCODER_PRESET,
+    ENCODER_PRESETS,
+    FARM_NETWORK_WORKERS,
+    FARM_RENDER_WORKERS,
+    INCREMENTAL_RENDER,
+    OUTPUT_PATH,
+    OUTPUT_PROFILE,
+    OUTPUT_PROFILES,
+    PREVIEW_PATH,
+    RENDER_ENGINE,
+    RENDER_MEMORY_BUDGET_MB,
+    RUN_REPORT_PATH,
+    SCRIPT_PATH,
+    SCRIPT_STREAMING,
+    SCRIPTS_PER_COMPLETION,
+    WHOLE_SCRIPT_TTS,
+    init,
+)
+from src.http_session import http_stats
+from src.image_handler import image_cache_stats
+from src.instrumentation import start_run, summary, write_report, write_trace
+from src.jobs import BatchJob, generate_job_scripts, generated_jobs, manifest_jobs, prepare_job
+from src.preview import write_stills
+from src.rate_limit import rate_limit_stats
+from src.render_farm import enqueue, is_queued, run_farm
+from src.script_generator import (
+    generate_anime_script,
+    llm_cache_stats,
+    parse_script,
+    stream_anime_script,
+)
+from src.video_renderer import RenderOptions, prepare_assets, preview_options, render_assets
+from src.workspace import DEFAULT_WORKSPACE
 
 logger = logging.getLogger(__name__)
 
 
-# ---------------------------------------------------------------------------
-# Workspace helpers
-# ---------------------------------------------------------------------------
+def _log_stats(use_audio: bool) -> None:
+    """Log cache, network and per-stage counters accumulated in this process."""
+    logger.info("Image cache: %s", image_cache_stats())
+    logger.info("HTTP: %s", http_stats())
+    logger.info("LLM cache: %s", llm_cache_stats())
+    logger.info("Rate limits: %s", rate_limit_stats())
+    if use_audio:
+        logger.info("TTS cache: %s", tts_cache_stats())
+    for name, agg in summary()["stages"].items():
+        logger.info(
+            "Stage %-16s %4d× wall %7.2fs  cpu %7.2fs  max %6.2fs",
+            name, agg["calls"], agg["wall"], agg["cpu"], agg["max_wall"],
+        )
 
-def _clean_generated_dirs() -> None:
-    """Remove and recreate asset directories to avoid stale media."""
-    for directory in (IMAGE_DIR, AUDIO_DIR):
-        if directory.exists():
-            shutil.rmtree(directory)
-            logger.info("Cleared %s", directory)
-        directory.mkdir(parents=True, exist_ok=True)
+
+def _write_run_report(report_path: Path, trace_path: Path | None) -> None:
+    """Write the JSON run report and, if requested, a Chrome trace."""
+    write_report(report_path, extra={
+        "caches": {
+            "images": image_cache_stats(),
+            "tts": tts_cache_stats(),
+            "llm": llm_cache_stats(),
+        },
+        "http": http_stats(),
+        "rate_limits": rate_limit_stats(),
+    })
+    if trace_path is not None:
+        write_trace(trace_path)
 
 
 # ---------------------------------------------------------------------------
 # Pipeline
 # ---------------------------------------------------------------------------
 
-def run_pipeline(*, use_audio: bool = True, regenerate_script: bool = True) -> Path:
+def run_pipeline(
+    *,
+    use_audio: bool = True,
+    regenerate_script: bool = True,
+    stream_script: bool = SCRIPT_STREAMING,
+    whole_script_tts: bool = WHOLE_SCRIPT_TTS,
+    options: RenderOptions | None = None,
+    preview: bool = False,
+    stills_path: Path | None = None,
+) -> Path:
     """Execute the full video generation pipeline.
 
     Args:
         use_audio: When False, skip TTS and render a silent video.
         regenerate_script: When False, reuse the existing script file.
+        stream_script: Fetch each segment's assets as soon as the streamed
+            script produces it, instead of after the whole script.
+        whole_script_tts: Synthesize the whole narration in one TTS request
+            and split it per segment.
+        options: Render engine, encoder backend and preset selection.
+        preview: Render a low-resolution draft of the existing script to
+            ``PREVIEW_PATH`` using only cached assets and placeholders (see
+            :func:`preview_options`); implies reusing the script.
+        stills_path: Also write one still per segment here, as a contact
+            sheet or (``.gif``) an animation.
 
     Returns:
         Path to the rendered video.
     """
+    output_path = OUTPUT_PATH
+    if preview:
+        # A draft reviews the script being edited and never calls an API.
+        regenerate_script = False
+        options = preview_options(options)
+        output_path = PREVIEW_PATH
     logger.info(
-        "Starting pipeline (audio=%s, regenerate_script=%s)",
-        use_audio, regenerate_script,
+        "Starting pipeline (audio=%s, regenerate_script=%s, preview=%s)",
+        use_audio, regenerate_script, preview,
     )
 
-    _clean_generated_dirs()
+    if not regenerate_script and not SCRIPT_PATH.exists():
+        logger.error(
+            "%s used but %s does not exist",
+            "--preview" if preview else "--skip-script", SCRIPT_PATH,
+        )
+        sys.exit(1)
+
+    DEFAULT_WORKSPACE.clean()
 
-    if regenerate_script:
-        generate_anime_script()
+    if regenerate_script and stream_script:
+        segments = stream_anime_script()
     else:
-        if not SCRIPT_PATH.exists():
-            logger.error("--skip-script used but %s does not exist", SCRIPT_PATH)
-            sys.exit(1)
-        logger.info("Reusing existing script at %s", SCRIPT_PATH)
+        if regenerate_script:
+            generate_anime_script()
+        else:
+            logger.info("Reusing existing script at %s", SCRIPT_PATH)
+        segments = parse_script(SCRIPT_PATH)
 
-    segments = parse_script(SCRIPT_PATH)
-    output = create_video(segments, OUTPUT_PATH, use_audio=use_audio)
+    assets = prepare_assets(
+        segments, use_audio=use_audio, whole_script_tts=whole_script_tts, offline=preview,
+    )
+    output = render_assets(assets, output_path, options)
+    if stills_path is not None:
+        write_stills(assets, stills_path)
 
+    _log_stats(use_audio)
     logger.info("Pipeline complete → %s", output)
     return output
 
 
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+def run_batch(
+    jobs: list[BatchJob],
+    *,
+    use_audio: bool = True,
+    stream_script: bool = SCRIPT_STREAMING,
+    whole_script_tts: bool = WHOLE_SCRIPT_TTS,
+    options: RenderOptions | None = None,
+) -> list[Path]:
+    """Render every job in *jobs* within this process.
+
+    Asset fetching for the next job overlaps with encoding of the current
+    one.  A failing job is logged and skipped so the rest of the batch
+    still renders.
+
+    Returns:
+        Paths of the videos that rendered successfully, in job order.
+    """
+    logger.info("Starting batch of %d jobs (audio=%s)", len(jobs), use_audio)
+    outputs: list[Path] = []
+    failed: list[str] = []
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") as prefetch:
+        upcoming: Future | None = None
+        if jobs:
+            upcoming = prefetch.submit(
+                prepare_job, jobs[0], use_audio, stream_script, whole_script_tts
+            )
+        for i, job in enumerate(jobs):
+            current = upcoming
+            upcoming = None
+            if i + 1 < len(jobs):
+                upcoming = prefetch.submit(
+                    prepare_job, jobs[i + 1], use_audio, stream_script, whole_script_tts
+                )
+            try:
+                assets = current.result()
+                outputs.append(render_assets(assets, job.output_path, options))
+            except Exception:
+                logger.exception("Job %s failed", job.name)
+                failed.append(job.name)
+
+    _log_stats(use_audio)
+    logger.info(
+        "Batch complete: %d rendered, %d failed%s",
+        len(outputs), len(failed), f" ({', '.join(failed)})" if failed else "",
+    )
+    return outputs
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -86,9 +237,184 @@ def cli() -> None:
         action="store_true",
         help="Reuse the existing script instead of generating a new one.",
     )
+    parser.add_argument(
+        "--stream-script",
+        action=argparse.BooleanOptionalAction,
+        default=SCRIPT_STREAMING,
+        help="Stream the script from the LLM and start fetching each segment's "
+             "assets as soon as it is complete.",
+    )
+    parser.add_argument(
+        "--whole-script-tts",
+        action=argparse.BooleanOptionalAction,
+        default=WHOLE_SCRIPT_TTS,
+        help="Synthesize the whole narration in one TTS request and split it "
+             "per segment.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("moviepy", "numpy"),
+        default=RENDER_ENGINE,
+        help="Frame render engine (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("moviepy", "ffmpeg"),
+        default=ENCODER_BACKEND,
+        help="Encoder backend; ffmpeg streams raw frames to one ffmpeg process "
+             "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--encoder-preset",
+        choices=tuple(ENCODER_PRESETS),
+        default=ENCODER_PRESET,
+        help="x264 speed/size trade-off (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        dest="profiles",
+        choices=tuple(OUTPUT_PROFILES),
+        help="Output profile; repeat to export several from one render "
+             "(ffmpeg backend).  The first is written to the output path, "
+             f"others beside it (default: {OUTPUT_PROFILE}).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=INCREMENTAL_RENDER,
+        help="Encode segments separately, reuse unchanged ones from the "
+             "segment cache, and join them with a stream copy.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=RENDER_MEMORY_BUDGET_MB,
+        metavar="MB",
+        help="Memory for segment clips alive at once while encoding "
+             "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="Render a fast low-resolution draft of the existing script to "
+             "the preview path using only cached assets (placeholders "
+             "otherwise); implies --skip-script and overrides the render "
+             "options above.",
+    )
+    parser.add_argument(
+        "--stills",
+        type=Path,
+        metavar="FILE",
+        help="Also write one still per segment: a contact sheet (.jpg/.png) "
+             "or an animated .gif.",
+    )
+    batch = parser.add_mutually_exclusive_group()
+    batch.add_argument(
+        "--count",
+        type=int,
+        metavar="N",
+        help="Batch mode: generate and render N shorts in this process.",
+    )
+    batch.add_argument(
+        "--manifest",
+        type=Path,
+        metavar="FILE",
+        help="Batch mode: render every script path listed in FILE.",
+    )
+    parser.add_argument(
+        "--scripts-per-completion",
+        type=int,
+        default=SCRIPTS_PER_COMPLETION,
+        metavar="K",
+        help="Batch mode: generate all scripts up front, K per LLM request "
+             "(1 = each job streams its own; default: %(default)s).",
+    )
+    parser.add_argument(
+        "--farm",
+        action="store_true",
+        help="Queue batch jobs durably and render them on a process pool; "
+             "without --count/--manifest, drain the existing queue.",
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=FARM_RENDER_WORKERS,
+        help="Farm render processes (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--network-workers",
+        type=int,
+        default=FARM_NETWORK_WORKERS,
+        help="Farm script/asset threads (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=RUN_REPORT_PATH,
+        metavar="FILE",
+        help="Where to write the JSON run report (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="Also write per-stage timings as a Chrome trace-event file.",
+    )
     args = parser.parse_args()
+    init()
+    profiles = tuple(dict.fromkeys(args.profiles or [OUTPUT_PROFILE]))
+    if len(profiles) > 1 and args.backend != "ffmpeg" and not args.preview:
+        parser.error("several --profile values need --backend ffmpeg")
+    if (args.preview or args.stills) and (args.count or args.manifest or args.farm):
+        parser.error("--preview and --stills render a single short")
+    if args.count is not None and args.count < 1:
+        parser.error("--count must be at least 1")
+    if args.skip_script and args.count:
+        parser.error("--count generates every script; use --manifest to render existing ones")
 
-    run_pipeline(
-        use_audio=not args.no_audio,
-        regenerate_script=not args.skip_script,
+    options = RenderOptions(
+        engine=args.engine,
+        backend=args.backend,
+        encoder_preset=args.encoder_preset,
+        incremental=args.incremental,
+        memory_budget_mb=args.memory_budget,
+        profiles=profiles,
     )
+    use_audio = not args.no_audio
+
+    jobs = None
+    if args.count is not None:
+        jobs = generated_jobs(args.count)
+    elif args.manifest:
+        jobs = manifest_jobs(args.manifest)
+
+    start_run()
+    try:
+        if args.farm:
+            if jobs:
+                # Jobs already in the queue keep the scripts they have.
+                jobs = [job for job in jobs if not is_queued(job.name)]
+                jobs = generate_job_scripts(jobs, args.scripts_per_completion)
+                enqueue(jobs, use_audio=use_audio, options=options)
+            run_farm(args.render_workers, args.network_workers)
+        elif jobs:
+            run_batch(
+                generate_job_scripts(jobs, args.scripts_per_completion),
+                use_audio=use_audio,
+                stream_script=args.stream_script,
+                whole_script_tts=args.whole_script_tts,
+                options=options,
+            )
+        else:
+            run_pipeline(
+                use_audio=use_audio,
+                regenerate_script=not args.skip_script,
+                stream_script=args.stream_script,
+                whole_script_tts=args.whole_script_tts,
+                options=options,
+                preview=args.preview,
+                stills_path=args.stills,
+            )
+    finally:
+        _write_run_report(args.report, args.trace)
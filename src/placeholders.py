@@ -0,0 +1,72 @@
+"""Stand-in assets for offline preview renders.
+
+``--preview`` never calls an API: segments whose image or narration is not
+in the persistent caches get a placeholder instead.  Images become a
+canvas-sized card showing the search prompt; narration becomes silence as
+long as the line would take to speak, with evenly paced word timings so
+karaoke subtitles and segment lengths still look representative.
+"""
+
+import logging
+import textwrap
+import wave
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.config import SUBTITLE_FONT_PATH, VIDEO_HEIGHT, VIDEO_WIDTH
+
+logger = logging.getLogger(__name__)
+
+_BACKGROUND = (28, 30, 44)
+_TEXT_COLOR = (200, 200, 210)
+_FONT_SIZE = 48
+_WRAP_CHARS = 32
+_SAMPLE_RATE = 24_000
+_WORDS_PER_SECOND = 2.5  # typical narration pace
+_LEAD_SECONDS = 0.25     # silence before the first and after the last word
+_MIN_SECONDS = 1.0
+
+
+def placeholder_image(prompt: str, path: str | Path) -> Path:
+    """Write a canvas-sized JPEG card showing *prompt* to *path*."""
+    try:
+        font = ImageFont.truetype(SUBTITLE_FONT_PATH, _FONT_SIZE)
+    except OSError:
+        font = ImageFont.load_default()
+    image = Image.new("RGB", (VIDEO_WIDTH, VIDEO_HEIGHT), _BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    text = textwrap.fill(f"[{prompt}]", _WRAP_CHARS)
+    left, top, right, bottom = draw.multiline_textbbox((0, 0), text, font=font, align="center")
+    draw.multiline_text(
+        ((VIDEO_WIDTH - (right - left)) // 2 - left, (VIDEO_HEIGHT - (bottom - top)) // 3 - top),
+        text, font=font, fill=_TEXT_COLOR, align="center",
+    )
+    image.save(path, "JPEG", quality=85)
+    logger.info("Placeholder image for '%s' → %s", prompt, path)
+    return Path(path)
+
+
+def placeholder_narration(text: str, path: str | Path) -> list[dict]:
+    """Write silence as long as *text* takes to speak and return its word timings.
+
+    Timings have the usual ``{word, start, duration}`` (milliseconds) shape,
+    with each word's share of the time proportional to its length.
+    """
+    words = text.split()
+    speech = len(words) / _WORDS_PER_SECOND
+    duration = max(_MIN_SECONDS, speech + 2 * _LEAD_SECONDS)
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(_SAMPLE_RATE)
+        out.writeframes(b"\0\0" * round(duration * _SAMPLE_RATE))
+
+    total = sum(len(word) + 1 for word in words)
+    timings, start = [], _LEAD_SECONDS * 1000
+    for word in words:
+        length = speech * 1000 * (len(word) + 1) / total
+        timings.append({"word": word, "start": start, "duration": length})
+        start += length
+    logger.info("Placeholder narration (%.1fs, %d words) → %s", duration, len(words), path)
+    return timings
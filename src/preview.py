@@ -0,0 +1,83 @@
+"""One still per segment for reviewing drafts.
+
+A contact sheet (JPEG/PNG grid) or an animated GIF lets an editor skim a
+draft's images and captions without playing the video.  Each still is the
+middle frame of its segment, drawn by the NumPy compositor directly at the
+requested scale.
+"""
+
+import logging
+import math
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from src.assets import SegmentAssets
+from src.audio_track import decode_cache
+from src.compositor import plan_segment, render_frame
+from src.config import PREVIEW_SCALE
+from src.instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+_MAX_COLUMNS = 4
+_GAP = 8                      # pixels between and around sheet tiles
+_SHEET_BACKGROUND = (16, 16, 16)
+_GIF_FRAME_MS = 1000
+
+
+def segment_stills(assets: list[SegmentAssets], scale: float = PREVIEW_SCALE) -> list[Image.Image]:
+    """Draw the middle frame of every segment in *assets* at *scale*."""
+    stills = []
+    with decode_cache():  # segments may share one narration track
+        for item in assets:
+            plan = plan_segment(item, scale)
+            stills.append(Image.fromarray(render_frame(plan, plan.duration / 2)))
+    return stills
+
+
+def contact_sheet(stills: list[Image.Image]) -> Image.Image:
+    """Tile *stills* (all one size) into a numbered grid."""
+    width, height = stills[0].size
+    columns = min(_MAX_COLUMNS, len(stills))
+    rows = math.ceil(len(stills) / columns)
+    sheet = Image.new(
+        "RGB",
+        (columns * (width + _GAP) + _GAP, rows * (height + _GAP) + _GAP),
+        _SHEET_BACKGROUND,
+    )
+    draw = ImageDraw.Draw(sheet)
+    for i, still in enumerate(stills):
+        x = _GAP + (i % columns) * (width + _GAP)
+        y = _GAP + (i // columns) * (height + _GAP)
+        sheet.paste(still, (x, y))
+        draw.text((x + 6, y + 4), str(i + 1), fill="white", stroke_width=2, stroke_fill="black")
+    return sheet
+
+
+def write_stills(
+    assets: list[SegmentAssets], path: str | Path, scale: float = PREVIEW_SCALE
+) -> Path:
+    """Write one still per segment to *path*.
+
+    A ``.gif`` suffix writes an animated GIF showing each still for a
+    second; any other image suffix writes a contact sheet.
+
+    Raises:
+        ValueError: If *assets* is empty.
+    """
+    if not assets:
+        raise ValueError("No segments to draw stills for")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with stage("stills", segments=len(assets), format=path.suffix.lower()):
+        stills = segment_stills(assets, scale)
+        if path.suffix.lower() == ".gif":
+            stills[0].save(
+                path, save_all=True, append_images=stills[1:],
+                duration=_GIF_FRAME_MS, loop=0,
+            )
+        else:
+            contact_sheet(stills).save(path)
+    logger.info("Stills for %d segments → %s", len(stills), path)
+    return path
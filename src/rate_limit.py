@@ -0,0 +1,469 @@
+"""Client-side rate limiting, quotas and 429 handling for metered APIs.
+
+Every call to Google CSE, a TTS provider or Azure OpenAI goes through
+:func:`call` (or :func:`held_call` for responses read after the call
+returns, such as streams), which admits it through that provider's
+:class:`ProviderLimiter`:
+
+* a :class:`TokenBucket` spreads calls over the per-minute allowance, so a
+  burst of workers waits locally instead of being rejected with 429s;
+* a concurrency cap bounds calls in flight;
+* waiting calls are admitted in priority order (lowest first), so a farm
+  finishes the jobs it started, oldest first, before serving newer ones;
+* a 429 pauses the whole provider for its ``Retry-After`` (or an
+  exponential backoff) before the call is retried, instead of every worker
+  retrying on its own;
+* each call is charged to a persistent daily :class:`QuotaLedger`.
+
+New jobs call :func:`wait_for_quota` before starting: once a daily budget
+is down to ``QUOTA_RESERVE`` they wait for it to reset, leaving the rest to
+jobs already in progress.  Priorities are per thread (:func:`priority`).
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator, Mapping
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one farm process per ledger
+    fcntl = None
+
+from src.config import (
+    PROVIDER_LIMITS,
+    QUOTA_LEDGER_PATH,
+    QUOTA_RESERVE,
+    QUOTA_RESET_UTC_OFFSET,
+    RATE_LIMIT_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+_BACKOFF_BASE = 1.0   # seconds; doubled per retry when no Retry-After is given
+_BACKOFF_MAX = 60.0
+_QUOTA_POLL = 300.0   # seconds between quota checks while paused
+
+
+class RateLimited(RuntimeError):
+    """A provider rejected a call for exceeding its rate limit."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExhausted(RuntimeError):
+    """A provider's daily request budget is used up."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at *rate* per second.
+
+    *capacity* bounds the burst (default: one minute of *rate*, i.e. a
+    per-minute quota).  :meth:`acquire` blocks until the requested amount
+    is available; :meth:`debit` settles usage that is only known afterwards
+    and may drive the balance negative, delaying later callers.  A *rate*
+    of zero disables the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate * 60
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """Take *amount* tokens if available and return 0, else the seconds until they are.
+
+        Requests larger than the capacity wait for a full bucket.
+        """
+        if not self.enabled:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float) -> float:
+        """Take *amount* tokens, waiting for them if needed; return the seconds waited."""
+        waited = 0.0
+        while (delay := self.try_acquire(amount)) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    def debit(self, amount: float) -> None:
+        """Charge *amount* more tokens (or refund a negative amount) without waiting."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+# ---------------------------------------------------------------------------
+# Daily quotas
+# ---------------------------------------------------------------------------
+
+class QuotaLedger:
+    """Requests made per provider on the current quota day, persisted as JSON.
+
+    The quota day starts at midnight in *utc_offset* hours.  Every charge
+    re-reads and atomically rewrites the file under an exclusive lock on a
+    ``.lock`` file beside it, so processes sharing the ledger never lose
+    each other's charges.
+    """
+
+    def __init__(self, path: Path, utc_offset: float = 0.0) -> None:
+        self.path = Path(path)
+        self._offset = timedelta(hours=utc_offset)
+        self._lock = threading.Lock()
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc) + self._offset
+
+    def _load(self) -> dict[str, int]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("day") != self._now().date().isoformat():
+            return {}  # a new quota day
+        return data.get("used", {})
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the ledger against other threads and processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(f"{self.path.name}.lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def used(self, provider: str) -> int:
+        """Return the requests charged to *provider* today."""
+        return self._load().get(provider, 0)
+
+    def charge(self, provider: str, budget: int = 0) -> int:
+        """Record one request to *provider* and return today's count.
+
+        Raises:
+            QuotaExhausted: If *budget* (when non-zero) is already used up.
+        """
+        with self._exclusive():
+            used = self._load()
+            count = used.get(provider, 0)
+            if budget and count >= budget:
+                raise QuotaExhausted(
+                    f"{provider} daily quota of {budget} requests is used up; "
+                    f"it resets in {self.resets_in() / 3600:.1f}h"
+                )
+            used[provider] = count + 1
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps({"day": self._now().date().isoformat(), "used": used}),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.path)
+            return count + 1
+
+    def resets_in(self) -> float:
+        """Return the seconds until the next quota day starts."""
+        now = self._now()
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (midnight - now).total_seconds()
+
+
+_ledger = QuotaLedger(QUOTA_LEDGER_PATH, QUOTA_RESET_UTC_OFFSET)
+
+
+# ---------------------------------------------------------------------------
+# Admission
+# ---------------------------------------------------------------------------
+
+_local = threading.local()
+
+
+@contextmanager
+def priority(value: float) -> Iterator[None]:
+    """Admit this thread's API calls with *value* (lower is served first)."""
+    previous = current_priority()
+    _local.priority = value
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def current_priority() -> float:
+    """Return the admission priority of this thread's API calls."""
+    return getattr(_local, "priority", 0.0)
+
+
+class ProviderLimiter:
+    """Admission control for one provider's API calls.
+
+    A call is admitted once it is the most urgent waiter, a concurrency
+    slot and the per-minute allowance are free, and no Retry-After pause is
+    in effect; it is then charged to the daily quota.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: float = 0,
+        concurrency: int = 0,
+        per_day: int = 0,
+        ledger: QuotaLedger | None = None,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.per_day = per_day
+        self.bucket = TokenBucket(per_minute / 60)
+        self.calls = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._ledger = ledger
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[float, int]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+
+    @contextmanager
+    def slot(self, cost: float = 1, charge: bool = True) -> Iterator[None]:
+        """Hold an admitted call for the duration of the block.
+
+        *cost* is charged to the per-minute allowance and, unless *charge*
+        is false (a retry of a call already charged), one request to the
+        daily quota.
+
+        Raises:
+            QuotaExhausted: If the daily budget is used up.
+        """
+        self._admit(cost, current_priority(), charge)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def _admit(self, cost: float, rank: float, charge: bool) -> None:
+        started = time.monotonic()
+        entry = (rank, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    delay = None  # not our turn: wait to be notified
+                    if self._waiting[0] == entry and (
+                        not self.concurrency or self._active < self.concurrency
+                    ):
+                        delay = self._paused_until - time.monotonic()
+                        if delay <= 0:
+                            delay = self.bucket.try_acquire(cost)
+                            if delay <= 0:
+                                break
+                    self._cond.wait(delay)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            self._active += 1
+            self.calls += 1
+            self.waited += time.monotonic() - started
+        # The ledger takes a file lock; don't hold up other callers meanwhile.
+        if charge and self._ledger is not None and self.per_day:
+            try:
+                self._ledger.charge(self.name, self.per_day)
+            except QuotaExhausted:
+                with self._cond:
+                    self._active -= 1
+                    self.calls -= 1
+                    self._cond.notify_all()
+                raise
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every call to this provider for *seconds*."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.throttled += 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        stats = {
+            "calls": self.calls, "throttled": self.throttled, "waited_s": round(self.waited, 3),
+        }
+        if self.per_day and self._ledger is not None:
+            stats["used_today"] = self._ledger.used(self.name)
+            stats["daily_quota"] = self.per_day
+        return stats
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(provider: str) -> ProviderLimiter:
+    """Return the process-wide limiter for *provider* (see ``PROVIDER_LIMITS``).
+
+    Providers without configured limits get an unlimited limiter.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            spec = PROVIDER_LIMITS.get(provider, {})
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                per_minute=spec.get("per_minute", 0),
+                concurrency=spec.get("concurrency", 0),
+                per_day=spec.get("per_day", 0),
+                ledger=_ledger,
+            )
+        return _limiters[provider]
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def retry_after(exc: BaseException | None) -> float | None:
+    """Return how long a rate-limited call was asked to wait.
+
+    Returns 0.0 for a rate limit without a usable hint, or None if *exc*
+    (or any exception it was raised from) is not a rate limit: a
+    :class:`RateLimited`, or an HTTP error with status 429 from requests,
+    the OpenAI SDK or the ElevenLabs SDK.
+    """
+    while exc is not None:
+        if isinstance(exc, RateLimited):
+            return exc.retry_after or 0.0
+        response = getattr(exc, "response", None)
+        status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+        if status == 429:
+            return _parse_retry_after(
+                getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+            )
+        exc = exc.__cause__
+    return None
+
+
+def _parse_retry_after(headers: Mapping[str, str]) -> float:
+    headers = {key.lower(): value for key, value in dict(headers).items()}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            when = parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def call(provider: str, fn: Callable[..., Any], *args: Any, cost: float = 1, **kwargs: Any) -> Any:
+    """Call ``fn(*args, **kwargs)`` as a request to *provider*.
+
+    The call is admitted by the provider's limiter (*cost* against its
+    per-minute allowance) and, when rate limited, retried up to
+    ``RATE_LIMIT_RETRIES`` times after pausing the provider.  The daily
+    quota is charged once, however many attempts the call takes.
+
+    Raises:
+        QuotaExhausted: If the provider's daily budget is used up.
+    """
+    with held_call(provider, fn, *args, cost=cost, **kwargs) as result:
+        return result
+
+
+@contextmanager
+def held_call(
+    provider: str, fn: Callable[..., Any], *args: Any, cost: float = 1, **kwargs: Any
+) -> Iterator[Any]:
+    """Like :func:`call`, but keep the call admitted until the block exits.
+
+    For responses that are still being read after *fn* returns, such as a
+    streamed completion: the provider's concurrency slot is held until the
+    stream has been consumed.  Only *fn* itself is retried on a rate limit.
+
+    Raises:
+        QuotaExhausted: If the provider's daily budget is used up.
+    """
+    limit = limiter(provider)
+    for attempt in itertools.count():
+        with limit.slot(cost, charge=attempt == 0):
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                delay = retry_after(exc)
+                if delay is None or attempt >= RATE_LIMIT_RETRIES:
+                    raise
+            else:
+                yield result
+                return
+        delay = delay or min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1)
+        logger.warning(
+            "%s rate limited; pausing it for %.1fs (retry %d/%d)",
+            provider, delay, attempt + 1, RATE_LIMIT_RETRIES,
+        )
+        limit.pause(delay)
+
+
+def quota_pause() -> tuple[str, float] | None:
+    """Return ``(provider, seconds until reset)`` if a daily budget is down to its reserve."""
+    for provider, spec in PROVIDER_LIMITS.items():
+        budget = spec.get("per_day", 0)
+        if budget and _ledger.used(provider) >= budget * (1 - QUOTA_RESERVE):
+            return provider, _ledger.resets_in()
+    return None
+
+
+def wait_for_quota() -> None:
+    """Block a new job while any daily budget is down to its reserve."""
+    while (paused := quota_pause()) is not None:
+        provider, seconds = paused
+        logger.warning(
+            "%s daily quota is nearly used up; holding new jobs until it resets in %.0f min",
+            provider, seconds / 60,
+        )
+        time.sleep(min(seconds + 1, _QUOTA_POLL))
+
+
+def rate_limit_stats() -> dict:
+    """Return per-provider call, throttle and wait counters for this process."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limit.name: limit.stats() for limit in limiters}
@@ -0,0 +1,355 @@
+"""Local multi-process render farm with a durable job queue.
+
+Jobs are JSON files that move between ``QUEUE_DIR/{pending,running,done,
+failed}``; claiming a job is an atomic rename, so several farm processes
+can share one queue directory.  Each job passes through two stage queues:
+
+* **prepare** — script generation and asset fetching, network-bound, run
+  on a thread pool (``FARM_NETWORK_WORKERS``);
+* **render** — composition and encoding, CPU-bound, run on a process pool
+  (``FARM_RENDER_WORKERS``) with the encoder threads split between workers.
+
+Prepared assets are checkpointed into the job file, so a job whose farm
+process crashed is moved back to ``pending`` on the next start and resumes
+from its last completed stage.
+
+API calls of jobs being prepared are admitted in the order the jobs were
+queued (see :mod:`src.rate_limit`), and no new job is claimed while a daily
+API quota is down to its reserve: the farm finishes what it started, then
+waits for the quota to reset.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from pathlib import Path
+
+from src.assets import SegmentAssets
+from src.config import (
+    FARM_MAX_ATTEMPTS,
+    FARM_NETWORK_WORKERS,
+    FARM_RENDER_WORKERS,
+    QUEUE_DIR,
+    init,
+)
+from src.instrumentation import events, merge, start_run, summary
+from src.jobs import BatchJob, prepare_job
+from src.rate_limit import priority, quota_pause, wait_for_quota
+from src.video_renderer import RenderOptions, render_assets
+from src.workspace import Workspace
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Queue storage
+# ---------------------------------------------------------------------------
+
+def _state_dir(state: str) -> Path:
+    directory = QUEUE_DIR / state
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def _save(record: dict, state: str) -> None:
+    path = _state_dir(state) / f"{record['name']}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _move(record: dict, src: str, dst: str) -> None:
+    """Persist *record* into *dst* and drop its copy in *src*."""
+    _save(record, dst)
+    (_state_dir(src) / f"{record['name']}.json").unlink(missing_ok=True)
+
+
+def _pid_alive(pid: int | None) -> bool:
+    # os.kill(pid, 0) terminates the process on Windows, so there every
+    # running job is treated as orphaned: only one farm per queue directory.
+    if not pid or os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _recover_orphans() -> int:
+    """Return jobs left in ``running`` by dead farm processes to ``pending``."""
+    recovered = 0
+    for path in sorted(_state_dir("running").glob("*.json")):
+        record = json.loads(path.read_text(encoding="utf-8"))
+        if _pid_alive(record.get("owner")):
+            continue
+        record["owner"] = None
+        _move(record, "running", "pending")
+        recovered += 1
+        logger.warning("Recovered orphaned job %s (stage=%s)", record["name"], record["stage"])
+    return recovered
+
+
+def _claim() -> dict | None:
+    """Atomically move the next pending job to ``running`` and return it."""
+    running = _state_dir("running")
+    for path in sorted(_state_dir("pending").glob("*.json")):
+        target = running / path.name
+        try:
+            os.replace(path, target)
+        except FileNotFoundError:
+            continue  # another farm process claimed it first
+        record = json.loads(target.read_text(encoding="utf-8"))
+        record["owner"] = os.getpid()
+        _save(record, "running")
+        return record
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Job records
+# ---------------------------------------------------------------------------
+
+def is_queued(name: str) -> bool:
+    """Return True if a job called *name* is pending or running."""
+    return any((_state_dir(state) / f"{name}.json").exists() for state in ("pending", "running"))
+
+
+def enqueue(
+    jobs: list[BatchJob],
+    use_audio: bool = True,
+    options: RenderOptions | None = None,
+) -> int:
+    """Write *jobs* to the pending queue and return how many were added.
+
+    Jobs whose name is pending or running are skipped; a finished or failed
+    job of the same name is replaced.
+    """
+    options = options or RenderOptions()
+    added = 0
+    for job in jobs:
+        if is_queued(job.name):
+            logger.warning("Job %s is already queued; skipping", job.name)
+            continue
+        for state in ("done", "failed"):
+            (_state_dir(state) / f"{job.name}.json").unlink(missing_ok=True)
+        _save({
+            "name": job.name,
+            "script_path": str(job.workspace.script_path),
+            "image_dir": str(job.workspace.image_dir),
+            "audio_dir": str(job.workspace.audio_dir),
+            "output_path": str(job.output_path),
+            "generate_script": job.generate_script,
+            "script_generated": False,
+            "seed": job.seed,
+            "use_audio": use_audio,
+            "queued_at": time.time(),
+            "options": asdict(options),
+            "stage": "queued",
+            "assets": None,
+            "attempts": 0,
+            "owner": None,
+        }, "pending")
+        added += 1
+    logger.info("Enqueued %d jobs in %s", added, QUEUE_DIR)
+    return added
+
+
+def _job(record: dict) -> BatchJob:
+    return BatchJob(
+        name=record["name"],
+        workspace=Workspace(
+            script_path=Path(record["script_path"]),
+            image_dir=Path(record["image_dir"]),
+            audio_dir=Path(record["audio_dir"]),
+        ),
+        output_path=Path(record["output_path"]),
+        # A script this job generated on an earlier attempt is reused on resume.
+        generate_script=record["generate_script"] and not record.get("script_generated"),
+        seed=record.get("seed"),
+    )
+
+
+def _dump_assets(assets: list[SegmentAssets]) -> list[dict]:
+    return [
+        {**asdict(item),
+         "image_path": str(item.image_path),
+         "audio_path": str(item.audio_path) if item.audio_path else None}
+        for item in assets
+    ]
+
+
+def _load_assets(data: list[dict]) -> list[SegmentAssets]:
+    return [
+        SegmentAssets(**{
+            **item,
+            "image_path": Path(item["image_path"]),
+            "audio_path": Path(item["audio_path"]) if item["audio_path"] else None,
+            "audio_span": tuple(item["audio_span"]) if item.get("audio_span") else None,
+        })
+        for item in data
+    ]
+
+
+def _assets_on_disk(record: dict) -> bool:
+    """True if the job's checkpointed assets still exist (safe to resume)."""
+    if not record.get("assets"):
+        return False
+    return all(
+        Path(item["image_path"]).exists()
+        and (item["audio_path"] is None or Path(item["audio_path"]).exists())
+        for item in record["assets"]
+    )
+
+
+# ---------------------------------------------------------------------------
+# Stage workers
+# ---------------------------------------------------------------------------
+
+def _prepare_stage(record: dict) -> dict:
+    """Network stage (thread): script + assets, checkpointed to the queue."""
+    if record["stage"] == "prepared" and _assets_on_disk(record):
+        logger.info("Job %s resumes with checkpointed assets", record["name"])
+        return record
+
+    def script_written() -> None:
+        record["script_generated"] = True
+        _save(record, "running")
+
+    # Older jobs first when providers are contended.
+    with priority(record.get("queued_at", 0.0)):
+        assets = prepare_job(_job(record), record["use_audio"], on_script=script_written)
+    record["assets"] = _dump_assets(assets)
+    record["stage"] = "prepared"
+    _save(record, "running")
+    return record
+
+
+def _render_stage(record: dict) -> tuple[str, dict]:
+    """CPU stage (worker process): compose and encode one prepared job.
+
+    Returns the output path and the worker's stage report for the job, which
+    the scheduler merges into the farm's own.
+    """
+    fields = dict(record["options"])
+    if "profiles" in fields:  # JSON round-trips the tuple as a list
+        fields["profiles"] = tuple(fields["profiles"])
+    options = RenderOptions(**fields)
+    start_run()
+    output = render_assets(_load_assets(record["assets"]), record["output_path"], options)
+    return str(output), {**summary(), "events": events()}
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+def _fail(record: dict, exc: BaseException) -> bool:
+    """Requeue *record* after a failure; return True if it failed for good."""
+    record["attempts"] += 1
+    record["error"] = f"{type(exc).__name__}: {exc}"
+    record["owner"] = None
+    if record["attempts"] >= FARM_MAX_ATTEMPTS:
+        logger.error("Job %s failed permanently: %s", record["name"], record["error"])
+        _move(record, "running", "failed")
+        return True
+    logger.warning(
+        "Job %s failed (attempt %d/%d), requeued: %s",
+        record["name"], record["attempts"], FARM_MAX_ATTEMPTS, record["error"],
+    )
+    _move(record, "running", "pending")
+    return False
+
+
+def run_farm(
+    render_workers: int = FARM_RENDER_WORKERS,
+    network_workers: int = FARM_NETWORK_WORKERS,
+) -> dict:
+    """Process the queue until it is empty and return per-state counts.
+
+    Encoder threads are divided between the render processes so that
+    ``render_workers`` concurrent encodes do not oversubscribe the CPU.
+    """
+    render_workers = max(1, render_workers)
+    network_workers = max(1, network_workers)
+    threads_per_render = max(1, (os.cpu_count() or 1) // render_workers)
+    _recover_orphans()
+    logger.info(
+        "Render farm started: %d render processes × %d threads, %d network workers",
+        render_workers, threads_per_render, network_workers,
+    )
+
+    counts = {"done": 0, "failed": 0, "requeued": 0}
+    preparing: dict[Future, dict] = {}
+    rendering: dict[Future, dict] = {}
+    cpu = ProcessPoolExecutor(max_workers=render_workers, initializer=init)
+    try:
+        with ThreadPoolExecutor(network_workers, thread_name_prefix="farm-net") as net:
+            while True:
+                # Keep the network stage busy without preparing far ahead of
+                # what the render stage can absorb; start nothing new while a
+                # quota is down to the reserve for jobs in flight.
+                paused = quota_pause()
+                while (not paused
+                       and len(preparing) < network_workers
+                       and len(preparing) + len(rendering) < network_workers + render_workers):
+                    record = _claim()
+                    if record is None:
+                        break
+                    if record["options"].get("encoder_threads") is None:
+                        record["options"]["encoder_threads"] = threads_per_render
+                    preparing[net.submit(_prepare_stage, record)] = record
+
+                if not preparing and not rendering:
+                    if paused and any(_state_dir("pending").glob("*.json")):
+                        wait_for_quota()
+                        continue
+                    break
+
+                done, _ = wait([*preparing, *rendering], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in preparing:
+                        record = preparing.pop(future)
+                        try:
+                            record = future.result()
+                        except Exception as exc:
+                            counts["failed" if _fail(record, exc) else "requeued"] += 1
+                            continue
+                        rendering[cpu.submit(_render_stage, record)] = record
+                        continue
+
+                    record = rendering.pop(future, None)
+                    if record is None:
+                        continue  # already requeued after a pool crash
+                    try:
+                        output, report = future.result()
+                    except BrokenProcessPool as exc:
+                        # A worker died mid-encode; the whole pool is unusable.
+                        cpu.shutdown(wait=False, cancel_futures=True)
+                        cpu = ProcessPoolExecutor(max_workers=render_workers, initializer=init)
+                        for broken in (record, *rendering.values()):
+                            counts["failed" if _fail(broken, exc) else "requeued"] += 1
+                        rendering.clear()
+                        continue
+                    except Exception as exc:
+                        counts["failed" if _fail(record, exc) else "requeued"] += 1
+                        continue
+                    merge(report)
+                    record.update(stage="done", output=output, owner=None)
+                    _move(record, "running", "done")
+                    counts["done"] += 1
+                    logger.info("Job %s rendered → %s", record["name"], output)
+    finally:
+        cpu.shutdown(wait=True, cancel_futures=True)
+
+    logger.info("Render farm finished: %s", counts)
+    return counts
@@ -3,21 +3,43 @@
 Generates a ~60-second 'Did You Know?' anime trivia script, writes it to
 disk, and provides a parser that converts the file into (prompt, narration)
 segment pairs consumed by the video renderer.
+
+:func:`stream_anime_script` streams the completion instead and yields each
+segment as soon as its narration line is complete, so asset fetching can
+start while the model is still writing the rest of the script.
+
+:func:`generate_anime_scripts` serves batches: each completion asks for
+several scripts and is split, and completions run concurrently within the
+deployment's token quota (the ``azure_openai`` limiter in
+:mod:`src.rate_limit`).  Seeded completions are cached on disk, keyed on
+deployment, prompts, sampling parameters and seed.
 """
 
 import logging
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
 
-from openai import AzureOpenAI
-
+from src.cache import DiskCache, make_key
 from src.config import (
     AZURE_OPENAI_API_KEY,
     AZURE_OPENAI_API_VERSION,
     AZURE_OPENAI_ENDPOINT,
     AZURE_OPENAI_DEPLOYMENT,
+    LLM_CACHE_MAX_MB,
+    LLM_CONCURRENCY,
     SCRIPT_PATH,
+    SCRIPT_SEED,
+    SCRIPTS_PER_COMPLETION,
 )
+from src.instrumentation import count, stage
+from src.rate_limit import call, held_call, limiter
+
+if TYPE_CHECKING:  # the SDK is imported when the client is first needed
+    from openai import AzureOpenAI
 
 logger = logging.getLogger(__name__)
 
@@ -57,18 +79,35 @@ USER_PROMPT = (
     "Keep it 10–12 lines total, no intro/outro."
 )
 
+BATCH_USER_PROMPT = (
+    USER_PROMPT
+    + " Write {count} such scripts, each about a different fact, and put a "
+    "line containing only '=== SCRIPT n ===' before script n."
+)
+
+_MAX_TOKENS = 4096
+_SAMPLING = {"temperature": 1.0, "top_p": 1.0}
+_TOKENS_PER_SCRIPT = 400      # completion estimate charged to the token quota
+_CHARS_PER_TOKEN = 4
+_MAX_BATCH_ROUNDS = 3         # re-requests for scripts missing from a reply
+
+# The line separating scripts in a multi-script completion.
+_SCRIPT_SEPARATOR = re.compile(r"^[ \t]*=+[ \t]*SCRIPT\b[^\n]*$", re.MULTILINE | re.IGNORECASE)
+
 # Prefixes the GPT model sometimes injects before image prompts.
 _STRIP_PREFIXES = ("Scene:", "Final shot:", "Opening:", "Shot:")
 
+# An [image tag] followed by narration on the same line.
+_INLINE_TAG = re.compile(r"(\[[^\]]+\])\s+(?!\n)")
+
 
 # ---------------------------------------------------------------------------
 # Generation
 # ---------------------------------------------------------------------------
 
-def generate_anime_script() -> Path:
-    """Call Azure OpenAI to generate a script and write it to *SCRIPT_PATH*.
-
-    Returns the path to the written script file.
+@lru_cache(maxsize=1)
+def _get_client() -> "AzureOpenAI":
+    """Return a long-lived Azure OpenAI client, validating credentials once.
 
     Raises:
         EnvironmentError: If required Azure OpenAI env vars are missing.
@@ -85,34 +124,274 @@ def generate_anime_script() -> Path:
             f"Missing required Azure OpenAI env vars: {', '.join(missing)}"
         )
 
-    logger.info("Generating anime script via Azure OpenAI (%s)…", AZURE_OPENAI_DEPLOYMENT)
+    with stage("import", module="openai"):
+        from openai import AzureOpenAI
 
-    client = AzureOpenAI(
+    return AzureOpenAI(
         api_key=AZURE_OPENAI_API_KEY,
         api_version=AZURE_OPENAI_API_VERSION,
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
     )
 
-    response = client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": USER_PROMPT},
-        ],
-        max_tokens=4096,
-        temperature=1.0,
-        top_p=1.0,
+
+_cache = DiskCache("llm", LLM_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _messages(user_prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _request_completion(
+    client: "AzureOpenAI",
+    messages: list[dict],
+    stream: bool = False,
+    seed: int | None = None,
+):
+    count("api.azure_openai")
+    return client.chat.completions.create(
+        messages=messages,
+        max_tokens=_MAX_TOKENS,
+        **_SAMPLING,
         model=AZURE_OPENAI_DEPLOYMENT,
+        stream=stream,
+        **({"seed": seed} if seed is not None else {}),
+    )
+
+
+def _cache_key(messages: list[dict], seed: int) -> str:
+    return make_key(AZURE_OPENAI_DEPLOYMENT, messages, _MAX_TOKENS, _SAMPLING, seed)
+
+
+def _cached(messages: list[dict], seed: int | None) -> str | None:
+    """Return the cached completion for a seeded request, if any."""
+    if seed is None:
+        return None
+    return _cache.get_json(_cache_key(messages, seed))
+
+
+def _estimate_tokens(messages: list[dict], scripts: int) -> int:
+    """Tokens a request is expected to use, charged before its real usage is known."""
+    return (
+        sum(len(message["content"]) for message in messages) // _CHARS_PER_TOKEN
+        + _TOKENS_PER_SCRIPT * scripts
     )
 
-    script_text = response.choices[0].message.content.strip()
+
+def _complete(messages: list[dict], seed: int | None, scripts: int = 1) -> str:
+    """Return the completion text for *messages*, from the cache when seeded.
+
+    A multi-script reply cut off by the token limit loses its last,
+    incomplete script.
+    """
+    text = _cached(messages, seed)
+    if text is not None:
+        logger.info("Completion served from the LLM cache (seed %d)", seed)
+        return text
+
+    client = _get_client()
+    estimate = _estimate_tokens(messages, scripts)
+    with stage("script.generate", deployment=AZURE_OPENAI_DEPLOYMENT, scripts=scripts) as attrs:
+        response = call(
+            "azure_openai", _request_completion, client, messages, seed=seed, cost=estimate
+        )
+        if response.usage is not None:
+            attrs["prompt_tokens"] = response.usage.prompt_tokens
+            attrs["completion_tokens"] = response.usage.completion_tokens
+            limiter("azure_openai").bucket.debit(response.usage.total_tokens - estimate)
+
+    text = response.choices[0].message.content
+    if scripts > 1 and response.choices[0].finish_reason == "length":
+        starts = [match.start() for match in _SCRIPT_SEPARATOR.finditer(text)]
+        logger.warning("Completion hit the token limit; dropping its last script")
+        text = text[:starts[-1]] if starts else ""
+    if seed is not None:
+        _cache.put_json(_cache_key(messages, seed), text)
+    return text
+
+
+def _write_script(script_text: str, script_path: Path | str) -> Path:
+    """Normalise the model's output and write it to *script_path*."""
     # Ensure each [image tag] is on its own line.
-    script_text = re.sub(r"(\[[^\]]+\])\s+(?!\n)", r"\1\n", script_text)
+    script_text = _INLINE_TAG.sub(r"\1\n", script_text.strip())
+
+    script_path = Path(script_path)
+    script_path.parent.mkdir(parents=True, exist_ok=True)
+    script_path.write_text(script_text, encoding="utf-8")
+
+    logger.info("Script saved to %s", script_path)
+    return script_path
+
+
+def generate_anime_script(
+    script_path: Path | str = SCRIPT_PATH, seed: int | None = SCRIPT_SEED
+) -> Path:
+    """Call Azure OpenAI to generate a script and write it to *script_path*.
+
+    With a *seed*, the response is reused from the LLM cache when present.
+    Returns the path to the written script file.
+
+    Raises:
+        EnvironmentError: If required Azure OpenAI env vars are missing.
+    """
+    logger.info("Generating anime script via Azure OpenAI (%s)…", AZURE_OPENAI_DEPLOYMENT)
+    return _write_script(_complete(_messages(USER_PROMPT), seed), script_path)
+
+
+def stream_anime_script(
+    script_path: Path | str = SCRIPT_PATH, seed: int | None = SCRIPT_SEED
+) -> Iterator[tuple[str, str]]:
+    """Stream a script from Azure OpenAI, yielding segments as they complete.
+
+    Yields the same ``(image_prompt, narration_text)`` tuples that
+    :func:`parse_script` would return for the finished script, each as soon
+    as its narration line has been received.  The full script is written to
+    *script_path* when the stream ends.  With a *seed*, a cached response
+    is replayed instead of streaming.
+
+    Raises:
+        EnvironmentError: If required Azure OpenAI env vars are missing.
+        ValueError: If the script ends with an image prompt but no narration.
+    """
+    messages = _messages(USER_PROMPT)
+    parser = ScriptStreamParser()
+    cached = _cached(messages, seed)
+    if cached is not None:
+        logger.info("Script served from the LLM cache (seed %d)", seed)
+        yield from parser.feed(cached)
+        _write_script(cached, script_path)
+        yield from parser.close()
+        return
+
+    client = _get_client()
+    logger.info("Streaming anime script via Azure OpenAI (%s)…", AZURE_OPENAI_DEPLOYMENT)
+
+    chunks: list[str] = []
+    with stage("script.generate", deployment=AZURE_OPENAI_DEPLOYMENT, streamed=True) as attrs:
+        started = time.perf_counter()
+        # The concurrency slot stays taken until the last token is read.
+        with held_call(
+            "azure_openai", _request_completion, client, messages, stream=True, seed=seed,
+            cost=_estimate_tokens(messages, 1),
+        ) as stream:
+            try:
+                for chunk in stream:
+                    # Azure sends content-filter results as chunks without choices.
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    chunks.append(chunk.choices[0].delta.content)
+                    for segment in parser.feed(chunks[-1]):
+                        attrs.setdefault("first_segment_s", time.perf_counter() - started)
+                        logger.info("Segment %d streamed: '%s'", parser.segments, segment[0])
+                        yield segment
+            finally:
+                stream.close()
+
+        _write_script("".join(chunks), script_path)
+        if seed is not None:
+            _cache.put_json(_cache_key(messages, seed), "".join(chunks))
+        yield from parser.close()
+        attrs["segments"] = parser.segments
+
+
+def split_scripts(text: str) -> list[str]:
+    """Split a multi-script completion into its well-formed scripts.
+
+    Parts that are not alternating ``[image prompt]`` / narration lines (a
+    preamble, or a script cut short) are dropped.
+    """
+    scripts = []
+    for part in _SCRIPT_SEPARATOR.split(text):
+        lines = [
+            line.strip()
+            for line in _INLINE_TAG.sub(r"\1\n", part).splitlines()
+            if line.strip()
+        ]
+        if lines and len(lines) % 2 == 0 and all(
+            line.startswith("[") for line in lines[::2]
+        ):
+            scripts.append("\n".join(lines))
+    return scripts
+
+
+def _generate_batch(scripts: int, seed: int | None) -> list[str]:
+    """Request *scripts* scripts in one completion and return those received."""
+    prompt = BATCH_USER_PROMPT.format(count=scripts) if scripts > 1 else USER_PROMPT
+    received = split_scripts(_complete(_messages(prompt), seed, scripts))
+    if len(received) < scripts:
+        logger.warning("Completion returned %d of %d scripts", len(received), scripts)
+    return received[:scripts]
+
+
+def generate_anime_scripts(
+    script_paths: list[Path],
+    per_completion: int = SCRIPTS_PER_COMPLETION,
+    concurrency: int = LLM_CONCURRENCY,
+    seed: int | None = SCRIPT_SEED,
+) -> list[Path]:
+    """Generate one script for each of *script_paths* in batched completions.
+
+    Each completion asks for up to *per_completion* scripts; up to
+    *concurrency* completions run at once, within ``LLM_TOKENS_PER_MINUTE``.
+    Scripts missing from a reply (malformed, cut off, or a failed request)
+    are asked for again, for up to three rounds.  With a *seed*, request *i*
+    of the batch is sent with seed ``seed + i`` and cached, so rerunning the
+    same batch makes no requests.
 
-    SCRIPT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    SCRIPT_PATH.write_text(script_text, encoding="utf-8")
+    Returns *script_paths*.
 
-    logger.info("Script saved to %s", SCRIPT_PATH)
-    return SCRIPT_PATH
+    Raises:
+        EnvironmentError: If required Azure OpenAI env vars are missing.
+        RuntimeError: If scripts are still missing after the last round.
+    """
+    per_completion = max(1, per_completion)
+    pending = list(script_paths)
+    requests = 0
+    for _ in range(_MAX_BATCH_ROUNDS):
+        if not pending:
+            break
+        groups = [pending[i:i + per_completion] for i in range(0, len(pending), per_completion)]
+        logger.info(
+            "Generating %d scripts in %d completions (%d at a time)…",
+            len(pending), len(groups), min(concurrency, len(groups)),
+        )
+        workers = max(1, min(concurrency, len(groups)))
+        with ThreadPoolExecutor(workers, thread_name_prefix="llm") as pool:
+            futures = [
+                pool.submit(
+                    _generate_batch, len(group), None if seed is None else seed + requests + i
+                )
+                for i, group in enumerate(groups)
+            ]
+        requests += len(groups)
+
+        missing: list[Path] = []
+        for group, future in zip(groups, futures):
+            try:
+                scripts = future.result()
+            except EnvironmentError:
+                raise
+            except Exception as exc:
+                logger.warning("Script completion failed: %s", exc)
+                scripts = []
+            for path, script in zip(group, scripts):
+                _write_script(script, path)
+            missing += group[len(scripts):]
+        pending = missing
+
+    if pending:
+        raise RuntimeError(
+            f"{len(pending)} of {len(script_paths)} scripts still missing after "
+            f"{_MAX_BATCH_ROUNDS} rounds"
+        )
+    return list(script_paths)
+
+
+def llm_cache_stats() -> dict:
+    """Return hit/miss/eviction counters for the LLM response cache."""
+    return _cache.stats()
 
 
 # ---------------------------------------------------------------------------
@@ -128,6 +407,54 @@ def _clean_image_prompt(raw: str) -> str:
     return raw
 
 
+class ScriptStreamParser:
+    """Incremental :func:`parse_script` for a script arriving in chunks.
+
+    :meth:`feed` returns the ``(image_prompt, narration_text)`` pairs
+    completed by each chunk; a line is complete once its newline arrives,
+    and the last line once :meth:`close` is called.
+    """
+
+    def __init__(self) -> None:
+        self.segments = 0
+        self._buffer = ""
+        self._prompt: str | None = None
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        """Add *text* and return the segments it completed."""
+        *lines, self._buffer = (self._buffer + text).split("\n")
+        return self._consume(lines)
+
+    def close(self) -> list[tuple[str, str]]:
+        """Flush the final line and return any segment it completed.
+
+        Raises:
+            ValueError: If an image prompt is left without narration.
+        """
+        segments = self._consume([self._buffer])
+        self._buffer = ""
+        if self._prompt is not None:
+            raise ValueError(
+                f"Script ended after image prompt '{self._prompt}' with no narration line."
+            )
+        return segments
+
+    def _consume(self, lines: list[str]) -> list[tuple[str, str]]:
+        segments = []
+        for line in lines:
+            for part in _INLINE_TAG.sub(r"\1\n", line).splitlines():
+                part = part.strip()
+                if not part:
+                    continue
+                if self._prompt is None:
+                    self._prompt = _clean_image_prompt(part)
+                else:
+                    segments.append((self._prompt, part))
+                    self._prompt = None
+        self.segments += len(segments)
+        return segments
+
+
 def parse_script(script_path: Path | str) -> list[tuple[str, str]]:
     """Parse an alternating [image prompt] / narration script file.
 
@@ -138,21 +465,23 @@ def parse_script(script_path: Path | str) -> list[tuple[str, str]]:
         ValueError: If the script has an odd number of non-empty lines.
     """
     path = Path(script_path)
-    lines = [
-        line.strip()
-        for line in path.read_text(encoding="utf-8").splitlines()
-        if line.strip()
-    ]
+    with stage("script.parse") as attrs:
+        lines = [
+            line.strip()
+            for line in path.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
 
-    if len(lines) % 2 != 0:
-        raise ValueError(
-            f"Script must have an even number of lines (got {len(lines)}). "
-            "Each [image prompt] must be followed by a narration line."
-        )
+        if len(lines) % 2 != 0:
+            raise ValueError(
+                f"Script must have an even number of lines (got {len(lines)}). "
+                "Each [image prompt] must be followed by a narration line."
+            )
 
-    segments = [
-        (_clean_image_prompt(lines[i]), lines[i + 1])
-        for i in range(0, len(lines), 2)
-    ]
+        segments = [
+            (_clean_image_prompt(lines[i]), lines[i + 1])
+            for i in range(0, len(lines), 2)
+        ]
+        attrs["segments"] = len(segments)
     logger.info("Parsed %d segments from %s", len(segments), path.name)
     return segments
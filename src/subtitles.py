@@ -1,43 +1,117 @@
 """Subtitle clip generation for MoviePy.
 
 Creates styled subtitle overlays — either a single static caption when no
-word timings are available, or individual per-word clips synchronised to
-TTS audio boundaries for a karaoke-style effect.
+word timings are available, or a karaoke-style caption showing each word
+during its TTS audio boundary.
+
+Word timings are held in a :class:`CaptionTimeline`: parallel start/end
+lists sorted by start, each entry pointing at one of the distinct texts
+(and so one memoized sprite).  The word shown at a timestamp is found by
+binary search, so a frame's caption lookup costs the same for a ten-word
+segment as for a compilation with thousands of words.  Both the MoviePy
+caption clip and the NumPy compositor draw from it.
+
+Text is rasterized in-process with Pillow into RGBA sprites that are
+memoized by (text, style), so repeated words cost a dictionary lookup
+instead of an ImageMagick subprocess.
 """
 
+import bisect
 import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+from typing import Iterable
 
-from moviepy.config import change_settings
-from moviepy.editor import CompositeVideoClip, TextClip
+import numpy as np
+from moviepy.video.VideoClip import ImageClip, VideoClip
+from PIL import Image, ImageDraw, ImageFont
 
 from src.config import (
-    IMAGEMAGICK_BINARY,
     SUBTITLE_BOTTOM_MARGIN,
     SUBTITLE_CAPTION_WIDTH,
     SUBTITLE_COLOR,
     SUBTITLE_FONT_PATH,
     SUBTITLE_FONT_SIZE,
+    SUBTITLE_SPRITE_CACHE_SIZE,
     SUBTITLE_STROKE_COLOR,
     SUBTITLE_STROKE_WIDTH,
+    VIDEO_HEIGHT,
 )
 
 logger = logging.getLogger(__name__)
 
-# Configure ImageMagick path if provided (needed on Windows).
-if IMAGEMAGICK_BINARY:
-    change_settings({"IMAGEMAGICK_BINARY": IMAGEMAGICK_BINARY})
+
+@dataclass(frozen=True)
+class SubtitleStyle:
+    """Everything that affects how a piece of subtitle text is rasterized."""
+
+    font_path: str = SUBTITLE_FONT_PATH
+    font_size: int = SUBTITLE_FONT_SIZE
+    color: str = SUBTITLE_COLOR
+    stroke_color: str = SUBTITLE_STROKE_COLOR
+    stroke_width: int = SUBTITLE_STROKE_WIDTH
+
+
+DEFAULT_STYLE = SubtitleStyle()
+
+
+class CaptionTimeline:
+    """A segment's captions, indexed for lookup by timestamp.
+
+    ``starts[i]`` and ``ends[i]`` (seconds) bound caption *i*, which shows
+    ``texts[sprites[i]]``; every caption is wrapped to *max_width* (None
+    crops tightly).  The running maximum of the ends lets :meth:`active`
+    stop walking back as soon as no earlier caption can still be showing.
+    """
+
+    def __init__(
+        self,
+        captions: Iterable[tuple[float, float, str]] = (),
+        max_width: int | None = None,
+    ) -> None:
+        ordered = sorted(captions, key=lambda caption: caption[0])
+        index: dict[str, int] = {}
+        self.starts: list[float] = [start for start, _, _ in ordered]
+        self.ends: list[float] = [end for _, end, _ in ordered]
+        self.sprites: list[int] = [index.setdefault(text, len(index)) for _, _, text in ordered]
+        self.texts: list[str] = list(index)
+        self.max_width = max_width
+        self._reach = list(accumulate(self.ends, max))
+
+    @classmethod
+    def from_word_timings(cls, timings: list[dict]) -> "CaptionTimeline":
+        """Index TTS word timings (``{word, start, duration}`` in ms)."""
+        return cls(
+            (info["start"] / 1000, (info["start"] + info["duration"]) / 1000, info["word"])
+            for info in timings
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def active(self, t: float) -> list[str]:
+        """Texts of the captions showing at *t*, earliest start first."""
+        shown = []
+        i = bisect.bisect_right(self.starts, t) - 1
+        while i >= 0 and self._reach[i] > t:
+            if self.ends[i] > t:
+                shown.append(self.texts[self.sprites[i]])
+            i -= 1
+        shown.reverse()
+        return shown
 
 
 def styled_subtitle(
     text: str,
     duration: float,
     word_timings: list[dict] | None = None,
-) -> TextClip | CompositeVideoClip:
+) -> ImageClip | VideoClip:
     """Build a subtitle clip for a single video segment.
 
-    When *word_timings* is provided (from Azure TTS), each word is rendered
-    as an independent clip timed to its spoken interval.  Otherwise a single
-    static caption is used for the entire *duration*.
+    When *word_timings* is provided (from TTS), each word is shown during
+    its spoken interval.  Otherwise a single static caption is used for the
+    entire *duration*.
     """
     timings = word_timings or []
 
@@ -46,54 +120,123 @@ def styled_subtitle(
     return _word_level_caption(timings, duration)
 
 
+# ---------------------------------------------------------------------------
+# Sprite rendering
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=8)
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load (and memoize) the TrueType font at *path*."""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError as exc:
+        raise EnvironmentError(
+            f"Subtitle font not found at '{path}'; set SUBTITLE_FONT_PATH."
+        ) from exc
+
+
+def _wrap(text: str, font: ImageFont.FreeTypeFont, max_width: int, stroke: int) -> str:
+    """Greedily wrap *text* so each line fits within *max_width* pixels."""
+    lines: list[str] = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if current and font.getlength(candidate) + 2 * stroke > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=SUBTITLE_SPRITE_CACHE_SIZE)
+def render_sprite(
+    text: str,
+    style: SubtitleStyle = DEFAULT_STYLE,
+    max_width: int | None = None,
+) -> np.ndarray:
+    """Rasterize *text* into a read-only ``(h, w, 4)`` uint8 RGBA array.
+
+    With *max_width*, text is word-wrapped and centred on a canvas of
+    exactly that width (like a caption box); otherwise the sprite is
+    cropped tightly around the text.
+    """
+    font = _load_font(style.font_path, style.font_size)
+    if max_width:
+        text = _wrap(text, font, max_width, style.stroke_width)
+
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = (
+        int(round(v)) for v in measure.multiline_textbbox(
+            (0, 0), text, font=font, stroke_width=style.stroke_width, align="center"
+        )
+    )
+    text_w, text_h = max(1, right - left), max(1, bottom - top)
+    width = max(max_width or 0, text_w)
+
+    image = Image.new("RGBA", (width, text_h), (0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text(
+        ((width - text_w) // 2 - left, -top),
+        text,
+        font=font,
+        fill=style.color,
+        stroke_width=style.stroke_width,
+        stroke_fill=style.stroke_color,
+        align="center",
+    )
+    sprite = np.asarray(image)
+    sprite.flags.writeable = False  # shared between all callers
+    return sprite
+
+
+@lru_cache(maxsize=SUBTITLE_SPRITE_CACHE_SIZE)
+def _sprite_clip(
+    text: str,
+    style: SubtitleStyle = DEFAULT_STYLE,
+    max_width: int | None = None,
+) -> ImageClip:
+    """Return a memoized, untimed ``ImageClip`` (with alpha mask) for *text*."""
+    return ImageClip(render_sprite(text, style, max_width), transparent=True)
+
+
+def _bottom_y(height: int) -> int:
+    """Vertical position that rests a sprite of *height* on the bottom margin."""
+    return VIDEO_HEIGHT - SUBTITLE_BOTTOM_MARGIN - height
+
+
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _static_caption(text: str, duration: float) -> TextClip:
+def _static_caption(text: str, duration: float) -> ImageClip:
     """Render a single caption spanning the full *duration*."""
     logger.debug("Static subtitle: '%s' (%.1fs)", text[:40], duration)
+    clip = _sprite_clip(text, DEFAULT_STYLE, SUBTITLE_CAPTION_WIDTH)
     return (
-        TextClip(
-            txt=text,
-            fontsize=SUBTITLE_FONT_SIZE,
-            font=SUBTITLE_FONT_PATH,
-            color=SUBTITLE_COLOR,
-            stroke_color=SUBTITLE_STROKE_COLOR,
-            stroke_width=SUBTITLE_STROKE_WIDTH,
-            method="caption",
-            size=(SUBTITLE_CAPTION_WIDTH, None),
-        )
-        .set_duration(duration)
-        .set_position(("center", "bottom"))
-        .margin(bottom=SUBTITLE_BOTTOM_MARGIN)
+        clip.set_duration(duration)
+        .set_position(("center", _bottom_y(clip.h)))
     )
 
 
-def _word_level_caption(
-    timings: list[dict], duration: float
-) -> CompositeVideoClip:
-    """Render one clip per word, timed to TTS word boundaries."""
+_BLANK = ImageClip(np.zeros((1, 1, 4), dtype=np.uint8), transparent=True)
+
+
+def _word_level_caption(timings: list[dict], duration: float) -> VideoClip:
+    """Render one clip drawing the word spoken at each moment.
+
+    The word is looked up in a :class:`CaptionTimeline`, so each frame
+    blits a single sprite however many words the segment has; where word
+    intervals overlap, the most recently started word is shown.
+    """
     logger.debug("Word-level subtitles: %d words over %.1fs", len(timings), duration)
-    word_clips = []
-    for info in timings:
-        clip = (
-            TextClip(
-                txt=info["word"],
-                fontsize=SUBTITLE_FONT_SIZE,
-                font=SUBTITLE_FONT_PATH,
-                color=SUBTITLE_COLOR,
-                stroke_color=SUBTITLE_STROKE_COLOR,
-                stroke_width=SUBTITLE_STROKE_WIDTH,
-            )
-            .set_start(info["start"] / 1000)   # ms → seconds
-            .set_duration(info["duration"] / 1000)
-            .set_position(("center", "bottom"))
-        )
-        word_clips.append(clip)
+    timeline = CaptionTimeline.from_word_timings(timings)
 
-    return (
-        CompositeVideoClip(word_clips)
-        .set_duration(duration)
-        .margin(bottom=SUBTITLE_BOTTOM_MARGIN)
-    )
+    def sprite(t: float) -> ImageClip:
+        active = timeline.active(t)
+        return _sprite_clip(active[-1], DEFAULT_STYLE) if active else _BLANK
+
+    clip = VideoClip(lambda t: sprite(t).img, duration=duration)
+    clip.mask = VideoClip(lambda t: sprite(t).mask.img, ismask=True, duration=duration)
+    return clip.set_position(lambda t: ("center", _bottom_y(sprite(t).h)))
@@ -0,0 +1,177 @@
+"""Azure Speech TTS provider.
+
+Loaded through the registry in :mod:`src.audio_generator` on the first
+synthesis that misses the TTS cache, so runs served from cache never import
+the Speech SDK.
+
+Each worker thread keeps one synthesizer with an open connection, so only
+its first request pays for connection setup; audio is written to disk chunk
+by chunk as it streams in, and word timings come from word-boundary events.
+"""
+
+import logging
+import threading
+import wave
+from functools import lru_cache
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import azure.cognitiveservices.speech as speechsdk
+
+from src.config import AZURE_TTS_KEY, AZURE_TTS_REGION, AZURE_TTS_VOICE
+from src.rate_limit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_RATE = 24_000
+_CHUNK = 32 * 1024  # bytes per AudioDataStream read
+_COMPLETION_TIMEOUT = 10  # seconds to wait for trailing events
+
+
+# ---------------------------------------------------------------------------
+# Provider interface
+# ---------------------------------------------------------------------------
+
+def synthesize(text: str, path: str) -> list[dict]:
+    """Speak *text* into *path* and return its word timings (ms)."""
+    timings, _ = _speak(text, path)
+    return timings
+
+
+def synthesize_lines(texts: list[str], path: str) -> tuple[list[dict], list[float]]:
+    """Speak *texts* as one narration into *path*.
+
+    Returns the word timings and the offsets (ms) at which each text after
+    the first begins, reported by an SSML bookmark placed before it.
+    """
+    return _speak(ssml(texts), path, is_ssml=True)
+
+
+# ---------------------------------------------------------------------------
+# Synthesis
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1)
+def _speech_config() -> speechsdk.SpeechConfig:
+    """Build the Azure speech config once, validating credentials.
+
+    Raises:
+        EnvironmentError: If Azure TTS credentials are missing.
+    """
+    if not AZURE_TTS_KEY or not AZURE_TTS_REGION:
+        raise EnvironmentError(
+            "AZURE_TTS_KEY and AZURE_TTS_REGION must be set for Azure TTS."
+        )
+
+    speech_config = speechsdk.SpeechConfig(
+        subscription=AZURE_TTS_KEY, region=AZURE_TTS_REGION
+    )
+    speech_config.speech_synthesis_voice_name = AZURE_TTS_VOICE
+    # Headerless PCM streams cleanly; the WAV header is written locally.
+    speech_config.set_speech_synthesis_output_format(
+        speechsdk.SpeechSynthesisOutputFormat.Raw24Khz16BitMonoPcm
+    )
+    return speech_config
+
+
+def ssml(texts: list[str]) -> str:
+    """Return SSML speaking *texts* in order, with bookmark ``i`` before text ``i``."""
+    body = "".join(
+        (f'<bookmark mark="{i}"/>' if i else "") + escape(text) + " "
+        for i, text in enumerate(texts)
+    )
+    return (
+        '<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">'
+        f'<voice name="{AZURE_TTS_VOICE}">{body.strip()}</voice></speak>'
+    )
+
+
+class _Session:
+    """A synthesizer with an open connection, reused by one thread."""
+
+    def __init__(self) -> None:
+        self.synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=_speech_config(), audio_config=None
+        )
+        self.word_timings: list[dict] = []
+        self.bookmarks: list[float] = []
+        self.done = threading.Event()
+        self.synthesizer.synthesis_word_boundary.connect(self._on_word_boundary)
+        self.synthesizer.bookmark_reached.connect(self._on_bookmark)
+        self.synthesizer.synthesis_completed.connect(lambda evt: self.done.set())
+        self.synthesizer.synthesis_canceled.connect(lambda evt: self.done.set())
+        # Open the websocket now rather than on the first request.
+        self.connection = speechsdk.Connection.from_speech_synthesizer(self.synthesizer)
+        self.connection.open(True)
+
+    def _on_word_boundary(self, evt) -> None:
+        self.word_timings.append({
+            "word": evt.text,
+            "start": evt.audio_offset / 10_000,  # ticks → milliseconds
+            "duration": (
+                evt.duration.total_seconds() * 1000 if evt.duration else 0
+            ),
+        })
+
+    def _on_bookmark(self, evt) -> None:
+        self.bookmarks.append(evt.audio_offset / 10_000)  # ticks → milliseconds
+
+
+_local = threading.local()
+
+
+def _session() -> _Session:
+    """Return this thread's Azure session, creating it on first use."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = _Session()
+    return session
+
+
+def _speak(text: str, path: str, is_ssml: bool = False) -> tuple[list[dict], list[float]]:
+    """Synthesize speech with Azure Cognitive Services, streaming to *path*.
+
+    *text* is plain text, or an SSML document when *is_ssml* is set.
+    Returns the word timings and the audio offsets (ms) of any SSML
+    bookmarks.
+
+    Raises:
+        EnvironmentError: If Azure TTS credentials are missing.
+        RateLimited: If Azure throttled the request.
+        RuntimeError: If synthesis fails.
+    """
+    session = _session()
+    session.word_timings = []
+    session.bookmarks = []
+    session.done.clear()
+
+    if is_ssml:
+        result = session.synthesizer.start_speaking_ssml_async(text).get()
+    else:
+        result = session.synthesizer.start_speaking_text_async(text).get()
+    stream = speechsdk.AudioDataStream(result)
+    buffer = bytes(_CHUNK)
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(_SAMPLE_RATE)
+        while (size := stream.read_data(buffer)) > 0:
+            out.writeframes(buffer[:size])
+
+    if stream.status != speechsdk.StreamStatus.AllData:
+        details = stream.cancellation_details
+        _local.session = None  # don't reuse a possibly broken connection
+        Path(path).unlink(missing_ok=True)
+        message = (
+            f"Azure TTS failed: {details.reason if details else stream.status}"
+            + (f" ({details.error_details})" if details and details.error_details else "")
+        )
+        if details and details.error_code == speechsdk.CancellationErrorCode.TooManyRequests:
+            raise RateLimited(message)
+        raise RuntimeError(message)
+
+    # Word-boundary events may trail the last audio chunk slightly.
+    session.done.wait(_COMPLETION_TIMEOUT)
+    word_timings = session.word_timings
+    logger.info("Azure TTS complete (%d words) → %s", len(word_timings), path)
+    return word_timings, session.bookmarks
@@ -0,0 +1,118 @@
+"""ElevenLabs TTS provider.
+
+Loaded through the registry in :mod:`src.audio_generator` on the first
+synthesis that misses the TTS cache, so runs served from cache never import
+the ElevenLabs SDK.
+
+Uses the timestamped streaming endpoint through one long-lived client:
+audio is written as it arrives and character timestamps are grouped into
+word timings.
+"""
+
+import base64
+import logging
+from functools import lru_cache
+
+from elevenlabs.client import ElevenLabs
+
+from src.config import (
+    ELEVENLABS_API_KEY,
+    ELEVENLABS_BASE_URL,
+    ELEVENLABS_MODEL,
+    ELEVENLABS_OUTPUT_FORMAT,
+    ELEVENLABS_VOICE_ID,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Provider interface
+# ---------------------------------------------------------------------------
+
+def synthesize(text: str, path: str) -> list[dict]:
+    """Speak *text* into *path* and return its word timings (ms).
+
+    Raises:
+        EnvironmentError: If the ElevenLabs API key is missing.
+        RuntimeError: If the API call fails.
+    """
+    client = _client()
+    characters: list[str] = []
+    starts: list[float] = []
+    ends: list[float] = []
+    try:
+        chunks = client.text_to_speech.stream_with_timestamps(
+            voice_id=ELEVENLABS_VOICE_ID,
+            output_format=ELEVENLABS_OUTPUT_FORMAT,
+            text=text,
+            model_id=ELEVENLABS_MODEL,
+        )
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                if chunk.audio_base_64:
+                    f.write(base64.b64decode(chunk.audio_base_64))
+                alignment = chunk.alignment
+                if alignment and alignment.characters:
+                    # Times should be absolute; if a chunk restarts at zero,
+                    # shift it past what came before.
+                    offset = 0.0
+                    if ends and alignment.character_start_times_seconds[0] < ends[-1] - 0.05:
+                        offset = ends[-1]
+                    characters += alignment.characters
+                    starts += [t + offset for t in alignment.character_start_times_seconds]
+                    ends += [t + offset for t in alignment.character_end_times_seconds]
+    except Exception as exc:
+        raise RuntimeError(f"ElevenLabs TTS failed: {exc}") from exc
+
+    word_timings = words_from_characters(characters, starts, ends)
+    logger.info("ElevenLabs TTS complete (%d words) → %s", len(word_timings), path)
+    return word_timings
+
+
+def synthesize_lines(texts: list[str], path: str) -> tuple[list[dict], list[float]]:
+    """Speak *texts* as one narration into *path*.
+
+    ElevenLabs has no bookmarks, so the line offsets are always empty and
+    callers split the track by word count.
+    """
+    return synthesize(" ".join(texts), path), []
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1)
+def _client() -> ElevenLabs:
+    """Return a long-lived ElevenLabs client.
+
+    Raises:
+        EnvironmentError: If the ElevenLabs API key is missing.
+    """
+    if not ELEVENLABS_API_KEY:
+        raise EnvironmentError("ELEVENLABS_API_KEY must be set.")
+    return ElevenLabs(api_key=ELEVENLABS_API_KEY, base_url=ELEVENLABS_BASE_URL)
+
+
+def words_from_characters(
+    characters: list[str], starts: list[float], ends: list[float]
+) -> list[dict]:
+    """Group character timestamps (seconds) into word timings (ms)."""
+    word_timings: list[dict] = []
+    word, word_start, word_end = "", 0.0, 0.0
+    # A trailing space flushes the last word.
+    for char, start, end in zip([*characters, " "], [*starts, 0.0], [*ends, 0.0]):
+        if not char.isspace():
+            if not word:
+                word_start = start
+            word += char
+            word_end = end
+        elif word:
+            word_timings.append({
+                "word": word,
+                "start": word_start * 1000,
+                "duration": (word_end - word_start) * 1000,
+            })
+            word = ""
+    return word_timings
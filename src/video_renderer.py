@@ -1,133 +1,430 @@
 """Video composition and export.
 
-Loads images, generates audio, overlays subtitles, and concatenates all
-segments into a single vertical short video.
+Composes pre-fetched images and narration, overlays subtitles, and
+concatenates all segments into a single vertical short video.
+
+Frames are composited once on the ``VIDEO_WIDTH`` × ``VIDEO_HEIGHT``
+canvas and encoded to every requested output profile (see
+:class:`src.encoder.OutputProfile`) from that one pass.
+
+In incremental mode every segment is fingerprinted from its inputs and the
+render configuration, encoded on its own into a persistent segment cache,
+and the final video is assembled with a stream-copy concat — so editing
+one narration line re-encodes only that segment.
+
+Narration is assembled into one sample-aligned PCM track before encoding —
+each file decoded once, whether it is a segment's own or a whole-script
+track it plays a span of — and muxed (ffmpeg) or attached (MoviePy) as a
+single input (see :mod:`src.audio_track`).
+
+Segment clips are built lazily as the encoder reaches them and closed once
+it moves on, keeping at most as many alive as ``memory_budget_mb`` allows
+(see :mod:`src.lazy_clip`).
 """
 
 import logging
+import tempfile
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
+from typing import Iterable
 
-from moviepy.editor import (
-    AudioFileClip,
-    ColorClip,
-    CompositeVideoClip,
-    ImageClip,
-    concatenate_videoclips,
-)
+import numpy as np
+from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+from moviepy.video.fx.fadein import fadein
+from moviepy.video.fx.fadeout import fadeout
+from moviepy.video.fx.resize import resize
+from moviepy.video.VideoClip import ColorClip, ImageClip, VideoClip
 
-from src.audio_generator import generate_tts
+from src.assets import SegmentAssets, fetch_all_assets
+from src.audio_track import (
+    assemble_narration,
+    audio_duration,
+    decode_cache,
+    loudness_gain,
+    narration_clip,
+    track_samples,
+    write_pcm,
+)
+from src.cache import DiskCache, content_key, make_key
+from src.compositor import plan_segment, scaled_canvas, segment_clip
 from src.config import (
-    AUDIO_DIR,
+    AUDIO_FADE_DURATION,
     DEFAULT_CLIP_DURATION,
+    ENCODER_BACKEND,
+    ENCODER_PRESET,
     FADE_DURATION,
-    IMAGE_DIR,
-    VIDEO_FPS,
+    INCREMENTAL_RENDER,
+    NARRATION_LOUDNESS_DBFS,
+    NARRATION_PEAK_DBFS,
+    OUTPUT_PROFILE,
+    PREVIEW_SCALE,
+    RENDER_ENGINE,
+    RENDER_MEMORY_BUDGET_MB,
+    SEGMENT_CACHE_MAX_MB,
+    SUBTITLE_BOTTOM_MARGIN,
+    SUBTITLE_CAPTION_WIDTH,
     VIDEO_HEIGHT,
     VIDEO_WIDTH,
+    WHOLE_SCRIPT_TTS,
+)
+from src.encoder import (
+    EncoderSettings,
+    OutputProfile,
+    concat_stream_copy,
+    encoder_settings,
+    profile_outputs,
+    render_fps,
+    write_video,
 )
-from src.image_handler import download_image, fetch_image_url, is_valid_image
-from src.subtitles import styled_subtitle
+from src.instrumentation import stage
+from src.lazy_clip import lazy_concatenate, segments_within_budget
+from src.subtitles import DEFAULT_STYLE, styled_subtitle
+from src.workspace import DEFAULT_WORKSPACE, Workspace
 
 logger = logging.getLogger(__name__)
 
+# Bump when segment rendering changes in a way fingerprints cannot see.
+_SEGMENT_FORMAT_VERSION = 3
+
+_segment_cache = DiskCache("segments", SEGMENT_CACHE_MAX_MB * 1024 * 1024)
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    """How frames are produced and encoded for one render."""
+
+    engine: str = RENDER_ENGINE            # "moviepy" or "numpy"
+    backend: str = ENCODER_BACKEND         # "moviepy" or "ffmpeg"
+    encoder_preset: str = ENCODER_PRESET   # key of ENCODER_PRESETS
+    encoder_threads: int | None = None     # None = ENCODER_THREADS
+    incremental: bool = INCREMENTAL_RENDER # per-segment cache + stream-copy join
+    memory_budget_mb: int = RENDER_MEMORY_BUDGET_MB  # for live segment clips
+    # Keys of OUTPUT_PROFILES; the first is written to the output path.
+    profiles: tuple[str, ...] = (OUTPUT_PROFILE,)
+    scale: float = 1.0  # composite at this fraction of the canvas
+
+
+def preview_options(options: RenderOptions | None = None) -> RenderOptions:
+    """*options* adjusted for a quick draft render (``--preview``).
+
+    Frames are composited by the NumPy engine at ``PREVIEW_SCALE`` and
+    encoded once, by ffmpeg, into the "preview" profile with the fastest
+    x264 preset.
+    """
+    return replace(
+        options or RenderOptions(),
+        engine="numpy",
+        backend="ffmpeg",
+        encoder_preset="preview",
+        incremental=False,
+        profiles=("preview",),
+        scale=PREVIEW_SCALE,
+    )
+
 
 # ---------------------------------------------------------------------------
 # Clip assembly
 # ---------------------------------------------------------------------------
 
-def _build_segment_clip(
-    idx: int,
-    prompt: str,
-    narration: str,
-    use_audio: bool,
-) -> CompositeVideoClip:
-    """Build a single video segment from an image prompt and narration text.
-
-    Steps:
-        1. Generate TTS audio (if enabled) and capture word timings.
-        2. Fetch / validate the image for this segment.
-        3. Compose the image on a black background with fade transitions.
-        4. Overlay styled subtitles.
-    """
-    image_path = IMAGE_DIR / f"step{idx}.jpg"
-    audio_path = AUDIO_DIR / f"step{idx}.mp3"
+def _segment_duration(assets: SegmentAssets) -> float:
+    """Length of a segment: its narration, or a fixed duration when silent."""
+    if assets.audio_path is None:
+        return DEFAULT_CLIP_DURATION
+    return audio_duration(assets.audio_path, assets.audio_span)
 
-    # --- Audio ---
-    word_timings: list[dict] = []
-    audio = None
-    duration = DEFAULT_CLIP_DURATION
 
-    if use_audio:
-        word_timings = generate_tts(narration, str(audio_path)) or []
-        audio = AudioFileClip(str(audio_path))
-        duration = audio.duration
+def _build_segment_clip(assets: SegmentAssets, duration: float) -> CompositeVideoClip:
+    """Compose a single (silent) video segment from its pre-fetched assets.
 
+    Steps:
+        1. Fade the canvas-sized image in and out (images that were not
+           prepared are first fitted onto a black background).
+        2. Overlay styled subtitles.
+    """
     # --- Image ---
-    if not image_path.exists() or not is_valid_image(image_path):
-        url = fetch_image_url(prompt)
-        download_image(url, image_path, original_prompt=prompt)
-
-    img = ImageClip(str(image_path)).set_duration(duration)
-    if audio:
-        img = img.set_audio(audio)
+    img = ImageClip(str(assets.image_path)).set_duration(duration)
 
-    # Scale to fit the square canvas while preserving aspect ratio.
-    if img.w > img.h:
-        img = img.resize(width=VIDEO_WIDTH)
+    if tuple(img.size) == (VIDEO_WIDTH, VIDEO_HEIGHT):
+        # Prepared by image_handler: already letterboxed, nothing to composite.
+        base = img
     else:
-        img = img.resize(height=VIDEO_HEIGHT)
-
-    background = ColorClip(
-        (VIDEO_WIDTH, VIDEO_HEIGHT), color=(0, 0, 0), duration=duration
-    )
-    base = (
-        CompositeVideoClip([background, img.set_position("center")])
-        .fadein(FADE_DURATION)
-        .fadeout(FADE_DURATION)
-    )
+        # Scale to fit the square canvas while preserving aspect ratio.
+        if img.w > img.h:
+            img = resize(img, width=VIDEO_WIDTH)
+        else:
+            img = resize(img, height=VIDEO_HEIGHT)
+        background = ColorClip(
+            (VIDEO_WIDTH, VIDEO_HEIGHT), color=(0, 0, 0), duration=duration
+        )
+        base = CompositeVideoClip([background, img.set_position("center")])
+    base = fadeout(fadein(base, FADE_DURATION), FADE_DURATION)
 
     # --- Subtitles ---
-    subtitle = styled_subtitle(narration, duration, word_timings)
+    with stage("subtitles", segment=assets.idx):
+        subtitle = styled_subtitle(assets.narration, duration, assets.word_timings)
     final = CompositeVideoClip([base, subtitle])
 
-    if audio:
-        final = final.set_audio(audio)
-
     logger.info(
-        "Segment %d ready (%.1fs) — prompt='%s'", idx, duration, prompt[:50]
+        "Segment %d ready (%.1fs) — prompt='%s'",
+        assets.idx, duration, assets.prompt[:50],
     )
     return final
 
 
-def _load_all_clips(
-    segments: list[tuple[str, str]], use_audio: bool
-) -> list[CompositeVideoClip]:
-    """Build a clip for every segment in the script."""
-    return [
-        _build_segment_clip(idx, prompt, narration, use_audio)
-        for idx, (prompt, narration) in enumerate(segments, 1)
-    ]
+def _narration(
+    assets: list[SegmentAssets], durations: list[float], with_audio: bool = False
+) -> np.ndarray | None:
+    """The narration of *assets* as one PCM track.
+
+    Returns None when no segment has narration, unless *with_audio* asks for
+    a silent track.
+    """
+    if not with_audio and all(item.audio_path is None for item in assets):
+        return None
+    with stage("narration", segments=len(assets)) as attrs:
+        samples = assemble_narration(
+            [(item.audio_path, item.audio_span) for item in assets], durations
+        )
+        attrs["samples"] = len(samples)
+        return samples
+
+
+def _compose(
+    assets: list[SegmentAssets],
+    options: RenderOptions,
+    durations: list[float],
+    narration: np.ndarray | None = None,
+) -> VideoClip:
+    """Assemble the full-length clip with the selected render engine.
+
+    Only durations are computed here; each segment's clip is built when the
+    encoder reaches it.  *narration* is attached as the clip's audio.
+    Release the result with :func:`_release`.
+    """
+    engine = options.engine
+    if engine not in ("moviepy", "numpy"):
+        raise ValueError(f"Unknown render engine '{engine}' (expected moviepy or numpy)")
+    with stage("compose", engine=engine, segments=len(assets), scale=options.scale) as attrs:
+        size = scaled_canvas(options.scale)
+        max_live = segments_within_budget(options.memory_budget_mb, size)
+        attrs["max_live"] = max_live
+
+        if engine == "numpy":
+            def build(i: int) -> VideoClip:
+                return segment_clip(plan_segment(assets[i], options.scale))
+        else:
+            def build(i: int) -> VideoClip:
+                clip = _build_segment_clip(assets[i], durations[i])
+                return clip if options.scale == 1.0 else resize(clip, newsize=size)
+
+        clip = lazy_concatenate(durations, build, max_live, size)
+        if narration is not None:
+            clip = clip.set_audio(narration_clip(narration))
+        return clip
+
+
+def _release(clip: VideoClip) -> None:
+    """Close the segments still alive behind *clip*."""
+    clip.close()
+
+
+def _encode(
+    assets: list[SegmentAssets],
+    outputs: list[tuple[Path, OutputProfile]],
+    fps: int,
+    options: RenderOptions,
+    settings: EncoderSettings,
+    with_audio: bool = False,
+) -> None:
+    """Compose *assets* and encode them, with their narration, to *outputs*.
+
+    The ffmpeg backend muxes the narration from a WAV written once from the
+    assembled track; MoviePy encodes it from memory as the clip's audio.
+    With *with_audio* a silent track is encoded even when no segment has
+    narration, so separately encoded parts share the same streams.
+    """
+    durations = [_segment_duration(item) for item in assets]
+    narration = _narration(assets, durations, with_audio)
+    ffmpeg = options.backend == "ffmpeg"
+    clip = _compose(assets, options, durations, None if ffmpeg else narration)
+    try:
+        with tempfile.TemporaryDirectory(prefix="narration-") as tmp:
+            audio = None
+            if ffmpeg and narration is not None:
+                audio = write_pcm(narration, Path(tmp) / "narration.wav")
+            write_video(clip, outputs, fps, options.backend, settings, audio)
+    finally:
+        _release(clip)
+
+
+# ---------------------------------------------------------------------------
+# Incremental rendering
+# ---------------------------------------------------------------------------
+
+def _segment_fingerprint(
+    assets: SegmentAssets,
+    options: RenderOptions,
+    settings: EncoderSettings,
+    profile: OutputProfile,
+    fps: int,
+    with_audio: bool,
+) -> str:
+    """Key a segment on every input that affects its encoded bytes."""
+    audio_hash = "silence" if with_audio else None
+    if assets.audio_span is not None:
+        audio_hash = content_key(track_samples(assets.audio_path, assets.audio_span).tobytes())
+    elif assets.audio_path is not None:
+        audio_hash = content_key(assets.audio_path.read_bytes())
+    if assets.audio_path is not None:
+        # A shared track's gain depends on all of it, not just this span.
+        audio_hash = (audio_hash, round(loudness_gain(assets.audio_path), 6))
+    return make_key(
+        _SEGMENT_FORMAT_VERSION,
+        assets.prompt,
+        assets.narration,
+        assets.word_timings,
+        content_key(assets.image_path.read_bytes()),
+        audio_hash,
+        asdict(DEFAULT_STYLE),
+        SUBTITLE_CAPTION_WIDTH,
+        SUBTITLE_BOTTOM_MARGIN,
+        options.engine,
+        options.backend,
+        options.scale,
+        # Thread count does not change the output, only the speed.
+        {**asdict(settings), "threads": None},
+        asdict(profile),
+        VIDEO_WIDTH, VIDEO_HEIGHT, fps, FADE_DURATION, DEFAULT_CLIP_DURATION,
+        NARRATION_LOUDNESS_DBFS, NARRATION_PEAK_DBFS, AUDIO_FADE_DURATION,
+    )
+
+
+def _render_incremental(
+    assets: list[SegmentAssets],
+    outputs: list[tuple[Path, OutputProfile]],
+    options: RenderOptions,
+    settings: EncoderSettings,
+) -> None:
+    """Encode only segments whose fingerprint changed, then stream-copy join.
+
+    Each segment is cached per output profile; the profiles a segment is
+    missing are encoded together from one composite pass.
+    """
+    fps = render_fps(outputs)
+    parts: list[list[Path]] = [[] for _ in outputs]
+    reused = 0
+    # Silent segments of a narrated video get a silent track so the parts
+    # can be joined without re-encoding.
+    with_audio = any(item.audio_path is not None for item in assets)
+    with tempfile.TemporaryDirectory(prefix="segments-") as tmp:
+        for item in assets:
+            keys = [
+                _segment_fingerprint(
+                    item, options, profile.settings(settings), profile, fps, with_audio
+                )
+                for _, profile in outputs
+            ]
+            segment_parts = [
+                Path(tmp) / f"segment{item.idx}.{profile.name}.mp4" for _, profile in outputs
+            ]
+            # Hits are copied out of the cache at once: caching the segments
+            # encoded later may evict them before the join.
+            missing = [
+                i for i, (key, part) in enumerate(zip(keys, segment_parts))
+                if not _segment_cache.copy_to(key, part)
+            ]
+            if missing:
+                targets = [(segment_parts[i], outputs[i][1]) for i in missing]
+                _encode([item], targets, fps, options, settings, with_audio)
+                for i in missing:
+                    _segment_cache.put_file(keys[i], segment_parts[i])
+            else:
+                reused += 1
+                logger.info("Segment %d unchanged — reusing cached encode", item.idx)
+            for i, part in enumerate(segment_parts):
+                parts[i].append(part)
+
+        for (path, _), profile_parts in zip(outputs, parts):
+            concat_stream_copy(profile_parts, path)
+    logger.info(
+        "Incremental render: %d/%d segments reused, %d re-encoded",
+        reused, len(assets), len(assets) - reused,
+    )
 
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
+def prepare_assets(
+    segments: Iterable[tuple[str, str]],
+    use_audio: bool = True,
+    workspace: Workspace = DEFAULT_WORKSPACE,
+    whole_script_tts: bool = WHOLE_SCRIPT_TTS,
+    offline: bool = False,
+) -> list[SegmentAssets]:
+    """Fetch every segment's image and narration into *workspace*.
+
+    *segments* may be a lazy iterator; fetching starts as each one arrives.
+    With *whole_script_tts* the narration is synthesized in one request.
+    With *offline* only cached assets (or placeholders) are used.
+    """
+    with stage(
+        "assets", audio=use_audio, whole_script_tts=whole_script_tts, offline=offline
+    ) as attrs:
+        assets = fetch_all_assets(
+            segments, use_audio=use_audio, workspace=workspace,
+            whole_script_tts=whole_script_tts, offline=offline,
+        )
+        attrs["segments"] = len(assets)
+        return assets
+
+
+def render_assets(
+    assets: list[SegmentAssets],
+    output_path: str | Path,
+    options: RenderOptions | None = None,
+) -> Path:
+    """Compose and encode already-fetched *assets* into *output_path*.
+
+    *options* selects the frame engine (``"moviepy"`` nested composite
+    clips or the ``"numpy"`` single-pass compositor), the encoder backend
+    (MoviePy's writer or a direct ffmpeg pipe), the encoder preset and the
+    output profiles.  The first profile is written to *output_path*, any
+    others next to it (see :func:`src.encoder.profile_outputs`).
+
+    Returns the output path for convenience.
+    """
+    options = options or RenderOptions()
+    settings = encoder_settings(options.encoder_preset, options.encoder_threads)
+    outputs = profile_outputs(output_path, options.profiles)
+    logger.info("Rendering %d segments (%s) → %s", len(assets), options, output_path)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with decode_cache():
+        if options.incremental:
+            _render_incremental(assets, outputs, options, settings)
+        else:
+            _encode(assets, outputs, render_fps(outputs), options, settings)
+    for path, profile in outputs:
+        logger.info("Video saved to %s (%s)", path, profile.name)
+    return Path(output_path)
+
+
 def create_video(
-    segments: list[tuple[str, str]],
+    segments: Iterable[tuple[str, str]],
     output_path: str | Path,
     use_audio: bool = True,
+    options: RenderOptions | None = None,
+    workspace: Workspace = DEFAULT_WORKSPACE,
+    whole_script_tts: bool = WHOLE_SCRIPT_TTS,
 ) -> Path:
     """Render all *segments* into a single video file at *output_path*.
 
-    Returns the output path for convenience.
+    Fetches assets with :func:`prepare_assets`, then encodes them with
+    :func:`render_assets`.  Returns the output path for convenience.
     """
-    logger.info(
-        "Rendering %d segments (audio=%s) → %s",
-        len(segments), use_audio, output_path,
+    assets = prepare_assets(
+        segments, use_audio=use_audio, workspace=workspace,
+        whole_script_tts=whole_script_tts,
     )
-    clips = _load_all_clips(segments, use_audio)
-    final = concatenate_videoclips(clips, method="compose")
-    final.write_videofile(str(output_path), fps=VIDEO_FPS)
-    logger.info("Video saved to %s", output_path)
-    return Path(output_path)
+    return render_assets(assets, output_path, options)
@@ -0,0 +1,52 @@
+"""Per-job working directories for generated assets.
+
+A single run uses the default workspace (``input/images`` and ``audio``);
+batch runs give every job its own directory under ``WORKSPACE_DIR`` so jobs
+can prepare assets side by side without clobbering each other.
+"""
+
+import logging
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.config import AUDIO_DIR, IMAGE_DIR, SCRIPT_PATH, WORKSPACE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Workspace:
+    """Where one job's script, images and narration live."""
+
+    script_path: Path
+    image_dir: Path
+    audio_dir: Path
+
+    def clean(self) -> None:
+        """Remove and recreate asset directories to avoid stale media."""
+        for directory in (self.image_dir, self.audio_dir):
+            if directory.exists():
+                shutil.rmtree(directory)
+                logger.info("Cleared %s", directory)
+            directory.mkdir(parents=True, exist_ok=True)
+        self.script_path.parent.mkdir(parents=True, exist_ok=True)
+
+
+DEFAULT_WORKSPACE = Workspace(
+    script_path=SCRIPT_PATH, image_dir=IMAGE_DIR, audio_dir=AUDIO_DIR
+)
+
+
+def job_workspace(name: str, script_path: Path | None = None) -> Workspace:
+    """Return the workspace for batch job *name* under ``WORKSPACE_DIR``.
+
+    *script_path* points at an existing script (manifest jobs); otherwise
+    the job's generated script is written inside its own directory.
+    """
+    root = WORKSPACE_DIR / name
+    return Workspace(
+        script_path=Path(script_path) if script_path else root / "script.txt",
+        image_dir=root / "images",
+        audio_dir=root / "audio",
+    )
@@ -0,0 +1,198 @@
+"""Tests for src.rate_limit: token bucket, quota ledger and admission order."""
+
+import multiprocessing
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from src import rate_limit
+from src.rate_limit import ProviderLimiter, QuotaExhausted, QuotaLedger, TokenBucket
+
+
+class FakeClock:
+    """Stands in for ``time.monotonic``; advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake)
+    return fake
+
+
+def at_utc(monkeypatch: pytest.MonkeyPatch, *when: int) -> None:
+    """Make the ledger's clock read the UTC time *when* (year, month, day, ...)."""
+    fixed = datetime(*when, tzinfo=timezone.utc)
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return fixed.astimezone(tz) if tz is not None else fixed.replace(tzinfo=None)
+
+    monkeypatch.setattr(rate_limit, "datetime", FixedDatetime)
+
+
+# ---------------------------------------------------------------------------
+# TokenBucket
+# ---------------------------------------------------------------------------
+
+def test_bucket_allows_a_burst_up_to_capacity_then_refills(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert [bucket.try_acquire(1) for _ in range(4)] == [0, 0, 0, 0]
+    assert bucket.try_acquire(1) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert bucket.try_acquire(1) == 0
+
+
+def test_bucket_never_refills_past_capacity(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=1, capacity=2)
+    clock.advance(3600)
+    assert bucket.try_acquire(2) == 0
+    assert bucket.try_acquire(1) == pytest.approx(1)
+
+
+def test_bucket_request_above_capacity_waits_for_a_full_bucket(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.try_acquire(2)
+    assert bucket.try_acquire(10) == pytest.approx(2)
+
+
+def test_bucket_debit_delays_later_callers(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.debit(4)  # actual usage turned out larger than estimated
+    assert bucket.try_acquire(1) == pytest.approx(3)
+    bucket.debit(-3)  # refunds are capped at the capacity
+    assert bucket.try_acquire(1) == 0
+
+
+def test_bucket_with_zero_rate_is_unlimited(clock: FakeClock) -> None:
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire(1_000) == 0 for _ in range(100))
+
+
+# ---------------------------------------------------------------------------
+# QuotaLedger
+# ---------------------------------------------------------------------------
+
+def test_ledger_counts_until_the_budget_is_used_up(tmp_path, monkeypatch) -> None:
+    at_utc(monkeypatch, 2024, 5, 1, 12)
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    assert [ledger.charge("google_cse", budget=3) for _ in range(3)] == [1, 2, 3]
+    with pytest.raises(QuotaExhausted):
+        ledger.charge("google_cse", budget=3)
+    assert ledger.used("google_cse") == 3
+    assert ledger.used("azure_tts") == 0
+    assert QuotaLedger(tmp_path / "ledger.json").used("google_cse") == 3
+
+
+def test_ledger_starts_a_new_day_at_utc_midnight(tmp_path, monkeypatch) -> None:
+    at_utc(monkeypatch, 2024, 5, 1, 23, 59)
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    ledger.charge("google_cse")
+    assert ledger.resets_in() == 60
+    at_utc(monkeypatch, 2024, 5, 2, 0, 1)
+    assert ledger.used("google_cse") == 0
+    assert ledger.charge("google_cse") == 1
+
+
+def test_ledger_day_follows_utc_offset(tmp_path, monkeypatch) -> None:
+    # Pacific time (UTC-8): 07:00 UTC is still 23:00 the previous day.
+    at_utc(monkeypatch, 2024, 5, 2, 7)
+    ledger = QuotaLedger(tmp_path / "ledger.json", utc_offset=-8)
+    ledger.charge("google_cse")
+    assert ledger.resets_in() == 3600
+    at_utc(monkeypatch, 2024, 5, 2, 7, 59)
+    assert ledger.used("google_cse") == 1
+    at_utc(monkeypatch, 2024, 5, 2, 8, 1)
+    assert ledger.used("google_cse") == 0
+
+
+def _charge_many(path: str, times: int) -> None:
+    ledger = QuotaLedger(path)
+    for _ in range(times):
+        ledger.charge("google_cse")
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason="ledger is per process without fcntl")
+def test_ledger_shared_between_processes_loses_no_charges(tmp_path) -> None:
+    path = str(tmp_path / "ledger.json")
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_charge_many, args=(path, 50)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert QuotaLedger(path).used("google_cse") == 100
+
+
+# ---------------------------------------------------------------------------
+# ProviderLimiter
+# ---------------------------------------------------------------------------
+
+def _wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_limiter_admits_waiting_calls_in_priority_order() -> None:
+    limit = ProviderLimiter("test", concurrency=1)
+    admitted: list[int] = []
+
+    def caller(rank: int) -> None:
+        with rate_limit.priority(rank), limit.slot():
+            admitted.append(rank)
+
+    with limit.slot():  # keep the only slot busy while the callers queue up
+        threads = []
+        for rank in (3, 1, 2):
+            threads.append(threading.Thread(target=caller, args=(rank,)))
+            threads[-1].start()
+            _wait_until(lambda: len(limit._waiting) == len(threads))
+    for thread in threads:
+        thread.join(5)
+    assert admitted == [1, 2, 3]
+
+
+def test_limiter_gives_the_slot_back_when_the_quota_is_used_up(tmp_path) -> None:
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    limit = ProviderLimiter("test", concurrency=1, per_day=1, ledger=ledger)
+    with limit.slot():
+        pass
+    with pytest.raises(QuotaExhausted):
+        with limit.slot():
+            pass
+    assert limit._active == 0
+    with limit.slot(charge=False):  # retries of a charged call still get in
+        pass
+
+
+def test_call_charges_the_quota_once_across_retries(tmp_path, monkeypatch) -> None:
+    ledger = QuotaLedger(tmp_path / "ledger.json")
+    limit = ProviderLimiter("test", per_day=10, ledger=ledger)
+    monkeypatch.setitem(rate_limit._limiters, "test", limit)
+    attempts = iter([rate_limit.RateLimited("slow down", 0), None])
+
+    def request() -> str:
+        exc = next(attempts)
+        if exc is not None:
+            raise exc
+        return "ok"
+
+    monkeypatch.setattr(limit, "pause", lambda seconds: None)
+    assert rate_limit.call("test", request) == "ok"
+    assert limit.calls == 2
+    assert ledger.used("test") == 1